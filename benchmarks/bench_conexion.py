@@ -0,0 +1,77 @@
+# benchmarks/bench_conexion.py
+"""
+Mide el coste por operación de abrir una conexión nueva en cada llamada
+(el esquema antiguo de los controladores: sqlite3.connect + foreign_keys,
+sin perfil de PRAGMAs ni instrumentación) frente a reutilizar la conexión
+persistente del hilo (obtener_conexion).
+
+Uso:
+    python -m benchmarks.bench_conexion [--iteraciones N]
+"""
+import argparse
+import contextlib
+import io
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from model import conexion
+
+
+def _consulta(conn):
+    conn.execute("SELECT COUNT(*) FROM Aparato WHERE tipo = ?;", ("Remo",)).fetchone()
+
+
+def _conexion_antigua():
+    """Lo que hacía crear_conexion() antes de la conexión persistente (sin el print)."""
+    conn = sqlite3.connect(conexion.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+def medir_conexion_por_llamada(iteraciones: int) -> float:
+    """Segundos totales abriendo y cerrando una conexión en cada operación."""
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        conn = _conexion_antigua()
+        try:
+            _consulta(conn)
+        finally:
+            conn.close()
+    return time.perf_counter() - inicio
+
+
+def medir_conexion_persistente(iteraciones: int) -> float:
+    """Segundos totales reutilizando la conexión persistente del hilo."""
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        _consulta(conexion.obtener_conexion())
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conexion.DB_PATH = Path(tmp) / "bench_conexion.db"
+        with contextlib.redirect_stdout(io.StringIO()):
+            conexion.crear_tablas()
+
+        t_antiguo = medir_conexion_por_llamada(args.iteraciones)
+        t_nuevo = medir_conexion_persistente(args.iteraciones)
+        conexion.cerrar_conexiones()
+
+    n = args.iteraciones
+    print(f"Iteraciones: {n}")
+    print(f"  Conexión por llamada : {t_antiguo / n * 1e6:8.1f} µs/op")
+    print(f"  Conexión persistente : {t_nuevo / n * 1e6:8.1f} µs/op")
+    if t_nuevo > 0:
+        print(f"  Mejora               : x{t_antiguo / t_nuevo:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# benchmarks/bench_controladores.py
+"""
+Mide el tiempo de las funciones públicas de los controladores sobre una BD
+(normalmente generada con benchmarks.generar_datos) y compara con una línea base.
+
+Las funciones que escriben se ejecutan dentro de una transacción que se
+deshace al terminar, así que la BD no cambia entre repeticiones (el tiempo
+no incluye el fsync del COMMIT).
+
+Uso:
+    python -m benchmarks.bench_controladores --db bench.db
+    python -m benchmarks.bench_controladores --db bench.db --salida resultados.json
+    python -m benchmarks.bench_controladores --db bench.db --baseline base.json [--tolerancia 0.2]
+    python -m benchmarks.bench_controladores --db bench.db --guardar-baseline base.json
+
+Un caso solo se omite si no se puede medir aquí (faltan datos para sus
+parámetros o una dependencia opcional como reportlab). Cualquier otro error
+es un fallo: se muestra y el proceso termina con código 1.
+Con --baseline, también termina con código 1 si alguna función es más lenta
+que la línea base en más de la tolerancia indicada.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from model import conexion
+
+
+# Dependencias opcionales: si faltan, los casos que las usan se omiten
+DEPENDENCIAS_OPCIONALES = ("reportlab",)
+
+
+class _Revertir(Exception):
+    """Se lanza para deshacer la transacción de un caso que escribe."""
+
+
+def _contexto(conn) -> dict:
+    """Elige parámetros representativos a partir de los datos de la BD."""
+    ctx = {}
+    fila = conn.execute(
+        "SELECT fecha, COUNT(*) AS n FROM Sesion GROUP BY fecha ORDER BY n DESC LIMIT 1;"
+    ).fetchone()
+    ctx["fecha"] = fila["fecha"] if fila else date.today().isoformat()
+
+    fila = conn.execute("SELECT tipo, COUNT(*) AS n FROM Aparato GROUP BY tipo ORDER BY n DESC LIMIT 1;").fetchone()
+    ctx["tipo"] = fila["tipo"] if fila else "Cinta de correr"
+    ctx["tipos"] = [f[0] for f in conn.execute("SELECT DISTINCT tipo FROM Aparato ORDER BY tipo;")]
+
+    fila = conn.execute("SELECT aparato_id FROM Aparato WHERE tipo = ? LIMIT 1;", (ctx["tipo"],)).fetchone()
+    ctx["aparato_id"] = fila["aparato_id"] if fila else 1
+
+    n_clientes = conn.execute("SELECT COUNT(*) FROM Cliente;").fetchone()[0]
+    fila = conn.execute(
+        "SELECT cliente_id, dni, nombre, apellido FROM Cliente LIMIT 1 OFFSET ?;", (n_clientes // 2,)
+    ).fetchone()
+    ctx["cliente_id"] = fila["cliente_id"] if fila else 1
+    ctx["dni"] = fila["dni"] if fila else "00000000T"
+    # Búsqueda típica del buscador: prefijos de nombre y apellido
+    ctx["busqueda"] = f"{fila['nombre'][:3]} {fila['apellido'][:4]}" if fila else "gar"
+    # Clave de paginación a mitad de la tabla (la página cuesta lo mismo que la primera)
+    ctx["clave_cliente"] = (fila["apellido"], fila["nombre"], fila["cliente_id"]) if fila else None
+
+    fila = conn.execute(
+        "SELECT periodo_anyo, periodo_mes FROM Recibo ORDER BY periodo_anyo DESC, periodo_mes DESC LIMIT 1;"
+    ).fetchone()
+    hoy = date.today()
+    ctx["anyo"], ctx["mes"] = (fila[0], fila[1]) if fila else (hoy.year, hoy.month)
+
+    fila = conn.execute("SELECT recibo_id FROM Recibo WHERE estado = 'pendiente' LIMIT 1;").fetchone()
+    ctx["recibo_pendiente"] = fila[0] if fila else None
+
+    fila = conn.execute("SELECT sesion_id FROM Sesion WHERE fecha = ? LIMIT 1;", (ctx["fecha"],)).fetchone()
+    ctx["sesion_id"] = fila[0] if fila else None
+
+    # Un slot laborable con hueco para crear_sesion
+    ctx["fecha_libre"] = "2099-01-05"  # lunes sin sesiones
+    ctx["hora"] = "18:00"
+    ctx["n_clientes"] = n_clientes
+    return ctx
+
+
+def _casos(ctx):
+    """
+    Lista de (nombre, modulo, funcion, args, escribe).
+    Los PDF se escriben en ctx["carpeta"].
+    """
+    c = ctx
+    return [
+        ("listar_clientes", "controller.cliente_controller", "listar_clientes", (), False),
+        ("obtener_cliente_por_id", "controller.cliente_controller", "obtener_cliente_por_id", (c["cliente_id"],), False),
+        ("obtener_cliente_por_dni", "controller.cliente_controller", "obtener_cliente_por_dni", (c["dni"],), False),
+        ("buscar_clientes", "controller.cliente_controller", "buscar_clientes", (c["busqueda"], 50), False),
+        ("listar_clientes_pagina", "controller.cliente_controller", "listar_clientes_pagina",
+         (c["clave_cliente"], 100), False),
+        ("crear_cliente", "controller.cliente_controller", "crear_cliente",
+         ("99999999R", "Prueba", "Rendimiento", "p@r.es", "600000000", "2024-01-01"), True),
+        ("actualizar_cliente", "controller.cliente_controller", "actualizar_cliente",
+         (c["cliente_id"], c["dni"], "Prueba", "Rendimiento", "p@r.es", "600000000", "2024-01-01"), True),
+        ("listar_aparatos", "controller.aparato_controller", "listar_aparatos", (), False),
+        ("obtener_aparato_por_id", "controller.aparato_controller", "obtener_aparato_por_id", (c["aparato_id"],), False),
+        ("obtener_tipos_aparatos", "controller.sesion_controller", "obtener_tipos_aparatos", (), False),
+        ("obtener_slots_disponibles", "controller.sesion_controller", "obtener_slots_disponibles",
+         (c["fecha"], c["tipo"]), False),
+        ("obtener_slots_disponibles_todos", "controller.sesion_controller", "obtener_slots_disponibles",
+         (c["fecha"], c["tipos"]), False),
+        ("asignar_aparato_disponible", "controller.sesion_controller", "asignar_aparato_disponible",
+         (c["tipo"], c["fecha"], c["hora"]), False),
+        ("hay_sesion_en_slot", "controller.sesion_controller", "hay_sesion_en_slot",
+         (c["aparato_id"], c["fecha"], c["hora"]), False),
+        ("crear_sesion", "controller.sesion_controller", "crear_sesion",
+         (c["aparato_id"], c["cliente_id"], c["fecha_libre"], c["hora"]), True),
+        ("reservar", "controller.sesion_controller", "reservar",
+         (c["tipo"], c["fecha_libre"], c["hora"], c["cliente_id"]), True),
+        ("cancelar_sesion", "controller.sesion_controller", "cancelar_sesion", (c["sesion_id"],), True),
+        ("listar_sesiones_dia", "controller.sesion_controller", "listar_sesiones_dia", (c["fecha"],), False),
+        ("obtener_ocupacion_diaria", "controller.sesion_controller", "obtener_ocupacion_diaria", (c["fecha"],), False),
+        ("exportar_sesiones_pdf", "controller.sesion_controller", "exportar_sesiones_pdf", (c["fecha"], c["carpeta"]), False),
+        ("obtener_estado_pagos_mes", "controller.recibo_controller", "obtener_estado_pagos_mes",
+         (c["anyo"], c["mes"]), False),
+        ("listar_estado_pagos_rango", "controller.recibo_controller", "listar_estado_pagos_rango",
+         (c["anyo"], c["mes"], c["n_clientes"] // 2, 200), False),
+        ("generar_recibos_mes", "controller.recibo_controller", "generar_recibos_mes", (2099, 1, 40.0), True),
+        ("ejecutar_facturacion_mes", "controller.recibo_controller", "ejecutar_facturacion_mes",
+         (c["anyo"], c["mes"], 40.0), True),
+        ("generar_recibo_individual", "controller.recibo_controller", "generar_recibo_individual",
+         (c["cliente_id"], 2099, 2, 40.0), True),
+        ("exportar_morosos_pdf", "controller.recibo_controller", "exportar_morosos_pdf",
+         (c["anyo"], c["mes"], c["carpeta"]), False),
+        ("registrar_pago", "controller.pago_controller", "registrar_pago", (c["recibo_pendiente"],), True),
+        ("listar_pagos_cliente", "controller.pago_controller", "listar_pagos_cliente", (c["cliente_id"],), False),
+    ]
+
+
+def _medir(funcion, args, escribe: bool, repeticiones: int) -> list[float]:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        if escribe:
+            try:
+                with conexion.transaccion():
+                    funcion(*args)
+                    tiempos.append(time.perf_counter() - inicio)
+                    raise _Revertir()
+            except _Revertir:
+                pass
+        else:
+            funcion(*args)
+            tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def ejecutar(ruta_db, repeticiones: int = 20, filtro: str | None = None) -> dict:
+    """Ejecuta todos los casos y devuelve el resultado como diccionario serializable."""
+    conexion.configurar(db_path=ruta_db)
+    conn = conexion.obtener_conexion()
+    ctx = _contexto(conn)
+
+    resultados = {}
+    omitidos = {}
+    fallidos = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx["carpeta"] = tmp  # Los PDF se escriben aquí (ruta absoluta, sin cambiar de directorio)
+        try:
+            for nombre, modulo, nombre_funcion, args, escribe in _casos(ctx):
+                if filtro and filtro not in nombre:
+                    continue
+                if any(a is None for a in args):
+                    omitidos[nombre] = "sin datos para los parámetros"
+                    continue
+
+                reps = 1 if nombre.startswith("exportar") else repeticiones
+                try:
+                    funcion = getattr(importlib.import_module(modulo), nombre_funcion)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        _medir(funcion, args, escribe, 1)  # calentamiento
+                        tiempos = _medir(funcion, args, escribe, reps)
+                except ModuleNotFoundError as e:
+                    if e.name not in DEPENDENCIAS_OPCIONALES:
+                        fallidos[nombre] = f"{type(e).__name__}: {e}"
+                    else:
+                        omitidos[nombre] = f"falta la dependencia opcional {e.name}"
+                    continue
+                except Exception as e:
+                    fallidos[nombre] = f"{type(e).__name__}: {e}"
+                    continue
+
+                tiempos_ms = sorted(t * 1000 for t in tiempos)
+                resultados[nombre] = {
+                    "mediana_ms": round(statistics.median(tiempos_ms), 3),
+                    "min_ms": round(tiempos_ms[0], 3),
+                    "max_ms": round(tiempos_ms[-1], 3),
+                    "repeticiones": len(tiempos_ms),
+                }
+        finally:
+            conexion.cerrar_conexiones()
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "db": str(ruta_db),
+        "volumen": {"clientes": ctx["n_clientes"]},
+        "python": platform.python_version(),
+        "perfil": conexion.PERFIL,
+        "resultados": resultados,
+        "omitidos": omitidos,
+        "fallidos": fallidos,
+    }
+
+
+def comparar(actual: dict, baseline: dict, tolerancia: float, margen_ms: float = 0.1) -> list[str]:
+    """
+    Devuelve las funciones cuya mediana empeora más de 'tolerancia' (relativa)
+    y además más de 'margen_ms' (absoluto, para no avisar por ruido en
+    funciones de microsegundos) respecto a la base.
+    """
+    regresiones = []
+    for nombre, datos in actual["resultados"].items():
+        base = baseline.get("resultados", {}).get(nombre)
+        if base is None:
+            continue
+        if datos["mediana_ms"] > base["mediana_ms"] * (1 + tolerancia) + margen_ms:
+            regresiones.append(
+                f"{nombre}: {base['mediana_ms']:.3f} ms -> {datos['mediana_ms']:.3f} ms"
+            )
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los controladores de GestiónGym")
+    parser.add_argument("--db", required=True, help="BD sobre la que medir (ver benchmarks.generar_datos)")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--filtro", help="Solo los casos cuyo nombre contenga este texto")
+    parser.add_argument("--salida", help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--baseline", help="Fichero JSON con la línea base a comparar")
+    parser.add_argument("--guardar-baseline", help="Guarda los resultados como nueva línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Empeoramiento relativo permitido frente a la base (0.2 = 20 %%)")
+    parser.add_argument("--margen-ms", type=float, default=0.1,
+                        help="Empeoramiento absoluto mínimo (ms) para considerar regresión")
+    args = parser.parse_args()
+
+    resultado = ejecutar(args.db, args.repeticiones, args.filtro)
+
+    for nombre, datos in resultado["resultados"].items():
+        print(f"{nombre:<28} mediana {datos['mediana_ms']:>10.3f} ms   min {datos['min_ms']:>10.3f} ms")
+    for nombre, motivo in resultado["omitidos"].items():
+        print(f"{nombre:<28} OMITIDO ({motivo})")
+    for nombre, motivo in resultado["fallidos"].items():
+        print(f"{nombre:<28} FALLO ({motivo})")
+
+    for ruta in (args.salida, args.guardar_baseline):
+        if ruta:
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False, indent=2)
+            print(f"Resultados guardados en {ruta}")
+
+    correcto = not resultado["fallidos"]
+    if not correcto:
+        print(f"\n{len(resultado['fallidos'])} casos han fallado.")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regresiones = comparar(resultado, baseline, args.tolerancia, args.margen_ms)
+        if regresiones:
+            print("\nREGRESIONES respecto a la línea base:")
+            for r in regresiones:
+                print(f"  {r}")
+            correcto = False
+        else:
+            print("\nSin regresiones respecto a la línea base.")
+
+    if not correcto:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/bench_escritura.py
+"""
+Mide ráfagas de reservas concurrentes con escritura directa (cada hilo
+confirma su transacción) frente a la cola de escritura con confirmación
+agrupada (model.cola_escritura).
+
+Cada hilo simula un puesto que hace reservas seguidas en franjas distintas.
+Para cada perfil de SQLite se parte de la misma BD recién creada.
+
+Uso:
+    python -m benchmarks.bench_escritura [--hilos 8] [--reservas 100] [--perfiles desktop durable]
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from model import conexion
+from model.cola_escritura import activar_cola_escritura, desactivar_cola_escritura
+
+
+def _preparar_bd(ruta: Path, clientes: int):
+    from model.migraciones import aplicar_migraciones
+    from controller.aparato_controller import inicializar_aparatos_por_defecto
+
+    conexion.configurar(db_path=ruta)
+    with contextlib.redirect_stdout(io.StringIO()):
+        aplicar_migraciones()
+        inicializar_aparatos_por_defecto()
+    with conexion.transaccion() as conn:
+        conn.executemany(
+            "INSERT INTO Cliente (dni, nombre, apellido, fecha_alta) VALUES (?, 'Socio', 'Prueba', '2026-01-01');",
+            ((f"{i:08d}B",) for i in range(clientes))
+        )
+    conexion.cerrar_conexiones()
+
+
+def _franjas(total: int):
+    """(tipo, fecha, hora) distintos en días laborables, para que no haya choques."""
+    from controller.aparato_controller import listar_aparatos
+    from controller.sesion_controller import SLOTS_RESERVA
+
+    tipos = sorted({a.tipo for a in listar_aparatos()})
+    franjas, dia = [], date(2030, 1, 7)   # lunes
+    while len(franjas) < total:
+        if dia.weekday() < 5:
+            franjas.extend((t, dia.isoformat(), h) for h in SLOTS_RESERVA for t in tipos)
+        dia += timedelta(days=1)
+    return franjas[:total]
+
+
+def medir(ruta: Path, perfil: str, hilos: int, reservas: int, con_cola: bool) -> dict:
+    from controller.sesion_controller import reservar
+
+    conexion.configurar(perfil=perfil, db_path=ruta)
+    franjas = _franjas(hilos * reservas)
+    cola = None
+    if con_cola:
+        cola = activar_cola_escritura()
+        cola.ejecutar(lambda: None)   # El escritor abre su conexión fuera de la medida
+
+    latencias, errores = [], []
+    lock = threading.Lock()
+    salida = threading.Barrier(hilos + 1)
+
+    def puesto(n: int):
+        propias, fallos = [], []
+        conexion.obtener_conexion()   # La conexión se abre fuera de la medida
+        salida.wait()
+        for tipo, fecha, hora in franjas[n::hilos]:
+            inicio = time.perf_counter()
+            try:
+                if not reservar(tipo, fecha, hora, n + 1).ok:
+                    fallos.append("sin plaza")
+            except Exception as e:
+                fallos.append(str(e))
+            propias.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(propias)
+            errores.extend(fallos)
+
+    trabajadores = [threading.Thread(target=puesto, args=(n,)) for n in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    salida.wait()
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    estadisticas = cola.estadisticas() if cola is not None else None
+    desactivar_cola_escritura()
+    conexion.cerrar_conexiones()
+
+    cuantiles = statistics.quantiles(latencias, n=100)
+    return {
+        "operaciones": len(latencias),
+        "errores": len(errores),
+        "ops_s": len(latencias) / total,
+        "p50_ms": cuantiles[49] * 1000,
+        "p95_ms": cuantiles[94] * 1000,
+        "p99_ms": cuantiles[98] * 1000,
+        "cola": estadisticas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hilos", type=int, default=8, help="puestos reservando a la vez")
+    parser.add_argument("--reservas", type=int, default=100, help="reservas por puesto")
+    parser.add_argument("--dir", help="carpeta de la BD temporal (mejor en el mismo disco que la real)")
+    parser.add_argument("--perfiles", nargs="+", default=["desktop", "durable"],
+                        choices=list(conexion.PERFILES))
+    args = parser.parse_args()
+
+    print(f"{args.hilos} hilos x {args.reservas} reservas")
+    for perfil in args.perfiles:
+        print(f"\nPerfil {perfil}")
+        resultados = {}
+        for nombre, con_cola in (("directa", False), ("cola", True)):
+            with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+                ruta = Path(tmp) / "bench_escritura.db"
+                _preparar_bd(ruta, args.hilos)
+                r = resultados[nombre] = medir(ruta, perfil, args.hilos, args.reservas, con_cola)
+            linea = (f"  {nombre:<8} {r['ops_s']:9.0f} ops/s   p50 {r['p50_ms']:7.2f} ms   "
+                     f"p95 {r['p95_ms']:7.2f} ms   p99 {r['p99_ms']:7.2f} ms   errores {r['errores']}")
+            if r["cola"]:
+                linea += f"   lote medio {r['cola']['media_lote']} (máx. {r['cola']['mayor_lote']})"
+            print(linea)
+        if resultados["directa"]["ops_s"] > 0:
+            print(f"  Mejora   x{resultados['cola']['ops_s'] / resultados['directa']['ops_s']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
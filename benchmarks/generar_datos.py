@@ -0,0 +1,230 @@
+# benchmarks/generar_datos.py
+"""
+Genera una base de datos sintética de GestiónGym para medir rendimiento.
+
+Distribuciones aproximadas a las de un gimnasio real:
+- Nombres y apellidos españoles frecuentes, DNI con letra de control válida.
+- Altas repartidas en los últimos años (más altas en enero y septiembre).
+- Sesiones solo en días laborables, más ocupación a primera hora y por la tarde.
+- Un recibo por cliente y mes desde su alta; ~90 % de los meses pasados pagados
+  (con su Pago) y ~60 % del mes en curso.
+
+Uso:
+    python -m benchmarks.generar_datos --escala pequena --db bench.db
+    python -m benchmarks.generar_datos --clientes 100000 --aparatos 200 \\
+        --sesiones 5000000 --meses 24 --db grande.db
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from model import conexion
+from model.migraciones import aplicar_migraciones
+
+ESCALAS = {
+    "pequena": {"clientes": 1_000, "aparatos": 20, "sesiones": 20_000, "meses": 3},
+    "media": {"clientes": 10_000, "aparatos": 60, "sesiones": 500_000, "meses": 12},
+    "grande": {"clientes": 100_000, "aparatos": 200, "sesiones": 5_000_000, "meses": 24},
+}
+
+NOMBRES = [
+    "Antonio", "Manuel", "José", "Francisco", "David", "Juan", "Javier", "Daniel",
+    "Carlos", "Alejandro", "Miguel", "Rafael", "Pablo", "Sergio", "Álvaro", "Adrián",
+    "María", "Carmen", "Ana", "Isabel", "Laura", "Lucía", "Cristina", "Marta",
+    "Elena", "Sara", "Paula", "Raquel", "Rocío", "Irene", "Nuria", "Beatriz",
+]
+APELLIDOS = [
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez",
+    "Pérez", "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno",
+    "Muñoz", "Álvarez", "Romero", "Alonso", "Gutiérrez", "Navarro", "Torres",
+    "Domínguez", "Vázquez", "Ramos", "Gil", "Ramírez", "Serrano", "Blanco", "Molina",
+    "Morales", "Suárez", "Ortega", "Delgado", "Castro", "Ortiz", "Rubio", "Marín",
+    "Sanz", "Núñez", "Iglesias", "Medina", "Garrido", "Cortés", "Castillo", "Mesa",
+]
+# (tipo, peso): hay muchas más cintas y bicis que remos
+TIPOS_APARATO = [
+    ("Cinta de correr", 6), ("Bicicleta estática", 5), ("Elíptica", 3),
+    ("Press banca", 2), ("Multigimnasio", 2), ("Remo", 1),
+]
+
+# Slots reservables (08:00-22:00) con la ocupación relativa de cada uno
+SLOTS = [f"{h:02d}:{m:02d}" for h in range(8, 23) for m in (0, 30) if (h, m) != (22, 30)]
+PESO_SLOT = {s: (3 if s < "10:00" else 1 if s < "17:00" else 4 if s < "21:00" else 2) for s in SLOTS}
+LETRAS_DNI = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def _dni(numero: int) -> str:
+    return f"{numero:08d}{LETRAS_DNI[numero % 23]}"
+
+
+def _elegir(rng, opciones_con_peso):
+    opciones, pesos = zip(*opciones_con_peso)
+    return rng.choices(opciones, weights=pesos)[0]
+
+
+def _dias_laborables_hacia_atras(desde: date):
+    """Genera días laborables (L-V) empezando en 'desde' y retrocediendo."""
+    dia = desde
+    while True:
+        if dia.weekday() < 5:
+            yield dia
+        dia -= timedelta(days=1)
+
+
+def generar(ruta_db, clientes: int, aparatos: int, sesiones: int, meses: int,
+            semilla: int = 1234, hoy: date | None = None) -> dict:
+    """
+    Crea (o rellena) la BD en ruta_db con el volumen indicado.
+    Devuelve un diccionario con los totales generados y el tiempo empleado.
+    """
+    rng = random.Random(semilla)
+    hoy = hoy or date.today()
+    inicio = time.perf_counter()
+
+    conexion.configurar(db_path=ruta_db)
+    aplicar_migraciones()
+    conn = conexion.obtener_conexion()
+    conn.execute("PRAGMA synchronous = OFF;")  # Solo para la carga inicial
+
+    with conexion.transaccion():
+        # --- Aparatos ---
+        filas_aparato = []
+        contador_tipo = {}
+        for _ in range(aparatos):
+            tipo = _elegir(rng, TIPOS_APARATO)
+            contador_tipo[tipo] = contador_tipo.get(tipo, 0) + 1
+            codigo = f"{tipo[:4].upper()}{contador_tipo[tipo]:03d}"
+            filas_aparato.append((codigo, tipo, f"{tipo} nº {contador_tipo[tipo]}"))
+        conn.executemany("INSERT INTO Aparato (codigo, tipo, descripcion) VALUES (?, ?, ?);",
+                         filas_aparato)
+
+        # --- Clientes (altas repartidas en los últimos años) ---
+        primer_mes = (hoy.replace(day=1) - timedelta(days=30 * (meses - 1))).replace(day=1)
+        dias_historia = max((hoy - primer_mes).days, 1) + 365 * 2
+        numeros_dni = rng.sample(range(10_000_000, 99_999_999), clientes)
+
+        def filas_cliente():
+            for numero in numeros_dni:
+                nombre = rng.choice(NOMBRES)
+                apellido = f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+                alta = hoy - timedelta(days=int(rng.triangular(0, dias_historia, dias_historia * 0.3)))
+                if rng.random() < 0.25:  # picos de enero y septiembre
+                    alta = alta.replace(month=rng.choice((1, 9)), day=rng.randint(1, 28))
+                    if alta > hoy:
+                        alta = alta.replace(year=alta.year - 1)
+                usuario = f"{nombre}.{apellido.split()[0]}{numero % 1000}".lower()
+                yield (_dni(numero), nombre, apellido, f"{usuario}@correo.es",
+                       f"6{rng.randint(0, 99_999_999):08d}", alta.isoformat())
+
+        conn.executemany(
+            "INSERT INTO Cliente (dni, nombre, apellido, email, telefono, fecha_alta) "
+            "VALUES (?, ?, ?, ?, ?, ?);",
+            filas_cliente()
+        )
+        ids_cliente = [f[0] for f in conn.execute("SELECT cliente_id FROM Cliente;").fetchall()]
+        ids_aparato = [f[0] for f in conn.execute("SELECT aparato_id FROM Aparato;").fetchall()]
+
+        # --- Sesiones (laborables, desde dentro de dos semanas hacia atrás) ---
+        if sesiones and ids_aparato:
+            max_peso = max(PESO_SLOT.values())
+
+            def filas_sesion():
+                restantes = sesiones
+                for dia in _dias_laborables_hacia_atras(hoy + timedelta(days=14)):
+                    fecha = dia.isoformat()
+                    for slot in SLOTS:
+                        ocupacion = PESO_SLOT[slot] / max_peso * rng.uniform(0.35, 0.85)
+                        n = min(restantes, max(1, int(len(ids_aparato) * ocupacion)))
+                        for aparato_id in rng.sample(ids_aparato, n):
+                            yield (aparato_id, rng.choice(ids_cliente), fecha, slot)
+                        restantes -= n
+                        if restantes <= 0:
+                            return
+
+            conn.executemany(
+                "INSERT INTO Sesion (aparato_id, cliente_id, fecha, hora_inicio, duracion) "
+                "VALUES (?, ?, ?, ?, 30);",
+                filas_sesion()
+            )
+
+        # --- Recibos y pagos (un recibo por cliente y mes desde el alta) ---
+        periodos = []
+        mes_actual = hoy.replace(day=1)
+        for _ in range(meses):
+            periodos.append((mes_actual.year, mes_actual.month))
+            mes_actual = (mes_actual - timedelta(days=1)).replace(day=1)
+
+        altas = dict(conn.execute("SELECT cliente_id, fecha_alta FROM Cliente;").fetchall())
+
+        def filas_recibo():
+            for anyo, mes in periodos:
+                inicio_mes = f"{anyo:04d}-{mes:02d}-01"
+                # El mes en curso aún tiene muchos pendientes; los pasados casi todos pagados
+                prob_pagado = 0.6 if (anyo, mes) == (hoy.year, hoy.month) else 0.9
+                for cliente_id in ids_cliente:
+                    if altas[cliente_id] > f"{anyo:04d}-{mes:02d}-31":
+                        continue
+                    estado = "pagado" if rng.random() < prob_pagado else "pendiente"
+                    yield (cliente_id, anyo, mes, inicio_mes, 40.0, estado)
+
+        conn.executemany(
+            "INSERT INTO Recibo (cliente_id, periodo_anyo, periodo_mes, fecha_generacion, importe, estado) "
+            "VALUES (?, ?, ?, ?, ?, ?);",
+            filas_recibo()
+        )
+        conn.execute(
+            """
+            INSERT INTO Pago (recibo_id, fecha_pago, metodo, referencia)
+            SELECT recibo_id, date(fecha_generacion, '+' || (abs(random()) % 10) || ' days'),
+                   CASE abs(random()) % 10 WHEN 0 THEN 'efectivo'
+                                           WHEN 1 THEN 'domiciliación'
+                                           WHEN 2 THEN 'domiciliación'
+                                           ELSE 'tarjeta' END,
+                   NULL
+            FROM Recibo WHERE estado = 'pagado';
+            """
+        )
+
+    totales = {
+        tabla: conn.execute(f"SELECT COUNT(*) FROM {tabla};").fetchone()[0]
+        for tabla in ("Cliente", "Aparato", "Sesion", "Recibo", "Pago")
+    }
+    conn.execute("ANALYZE;")
+    totales["segundos"] = round(time.perf_counter() - inicio, 2)
+    return totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una BD sintética de GestiónGym")
+    parser.add_argument("--db", required=True, help="Fichero de base de datos a generar")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--clientes", type=int)
+    parser.add_argument("--aparatos", type=int)
+    parser.add_argument("--sesiones", type=int)
+    parser.add_argument("--meses", type=int)
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--sobrescribir", action="store_true", help="Borra la BD si ya existe")
+    args = parser.parse_args()
+
+    ruta = Path(args.db)
+    if ruta.exists():
+        if not args.sobrescribir:
+            parser.error(f"{ruta} ya existe (usa --sobrescribir)")
+        for sufijo in ("", "-wal", "-shm"):
+            Path(str(ruta) + sufijo).unlink(missing_ok=True)
+
+    parametros = dict(ESCALAS[args.escala])
+    for clave in parametros:
+        if getattr(args, clave) is not None:
+            parametros[clave] = getattr(args, clave)
+
+    print(f"Generando {ruta} con {parametros}...")
+    totales = generar(ruta, semilla=args.semilla, **parametros)
+    conexion.cerrar_conexiones()
+    print("Generado:", totales)
+
+
+if __name__ == "__main__":
+    main()
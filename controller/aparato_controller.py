@@ -1,7 +1,95 @@
 # controller/aparato_controller.py
 
-from model.conexion import crear_conexion
+import threading
+
+from model.conexion import obtener_conexion, transaccion, al_confirmar, en_transaccion
+from model.cola_escritura import escritura
 from model.aparato import Aparato
+from .disponibilidad import matriz
+
+
+class CatalogoAparatos:
+    """
+    Caché en memoria del inventario de aparatos (cambia pocas veces al mes).
+    Se carga con una sola consulta la primera vez que se pide y se descarta
+    cuando crear/actualizar/eliminar_aparato confirman su transacción.
+    Dentro de una transacción, si aún no está cargado, se lee de la BD sin
+    guardarlo (podría incluir cambios que luego se deshagan).
+    Lo que devuelve (Aparato, listas y diccionarios) es compartido: no debe modificarse.
+    """
+
+    def __init__(self):
+        self._datos = None   # dict con aparatos, por_id, ids_por_tipo, total_por_tipo
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _leer(self) -> dict:
+        conn = obtener_conexion()
+        if conn is None:
+            raise RuntimeError("No se pudo conectar a la base de datos.")
+        cursor = conn.cursor()
+        cursor.row_factory = Aparato.desde_fila
+        cursor.execute(
+            "SELECT aparato_id, codigo, tipo, descripcion FROM Aparato ORDER BY tipo, codigo;"
+        )
+        aparatos = tuple(cursor.fetchall())
+        ids_por_tipo = {}
+        for aparato in sorted(aparatos, key=lambda a: a.aparato_id):
+            ids_por_tipo.setdefault(aparato.tipo, []).append(aparato.aparato_id)
+        return {
+            "aparatos": aparatos,
+            "por_id": {a.aparato_id: a for a in aparatos},
+            "ids_por_tipo": ids_por_tipo,
+            "total_por_tipo": {tipo: len(ids) for tipo, ids in ids_por_tipo.items()},
+        }
+
+    def _obtener(self) -> dict:
+        with self._lock:
+            if self._datos is not None:
+                self.aciertos += 1
+                return self._datos
+            self.fallos += 1
+            if en_transaccion():
+                return self._leer()
+            self._datos = self._leer()
+            return self._datos
+
+    def invalidar(self):
+        with self._lock:
+            self._datos = None
+
+    def aparatos(self) -> list:
+        """Todos los aparatos, ordenados por tipo y código."""
+        return list(self._obtener()["aparatos"])
+
+    def por_id(self, aparato_id):
+        return self._obtener()["por_id"].get(aparato_id)
+
+    def tipos(self) -> list[str]:
+        """Tipos distintos, en orden alfabético."""
+        return sorted(self._obtener()["ids_por_tipo"])
+
+    def ids_por_tipo(self) -> dict:
+        """tipo -> [aparato_id, ...] en orden de id."""
+        return self._obtener()["ids_por_tipo"]
+
+    def total_por_tipo(self) -> dict:
+        """tipo -> número de aparatos."""
+        return self._obtener()["total_por_tipo"]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"cargado": self._datos is not None, "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+# Instancia compartida (la usan también sesion_controller y la matriz de disponibilidad)
+catalogo = CatalogoAparatos()
+
+
+def _invalidar_catalogo():
+    catalogo.invalidar()
+    matriz.invalidar()
 
 
 def inicializar_aparatos_por_defecto():
@@ -9,147 +97,131 @@ def inicializar_aparatos_por_defecto():
     Inserta los aparatos por defecto solo si la tabla Aparato está vacía.
     Se debe llamar al inicio del programa.
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         print("No se pudo conectar a la base de datos. No se inicializan aparatos.")
         return
 
     try:
-        cursor = conn.cursor()
+        with transaccion():
+            cursor = conn.cursor()
 
-        # Comprobar cuántos aparatos hay ya
-        cursor.execute("SELECT COUNT(*) AS total FROM Aparato;")
-        fila = cursor.fetchone()
-        total = fila[0] if fila is not None else 0
+            # Comprobar cuántos aparatos hay ya
+            cursor.execute("SELECT COUNT(*) AS total FROM Aparato;")
+            fila = cursor.fetchone()
+            total = fila[0] if fila is not None else 0
 
-        if total > 0:
-            print(f"La tabla Aparato ya tiene {total} registros. No se insertan aparatos por defecto.")
-            return
+            if total > 0:
+                print(f"La tabla Aparato ya tiene {total} registros. No se insertan aparatos por defecto.")
+                return
 
-        # Insertar los aparatos por defecto
-        for codigo, tipo, descripcion in Aparato.APARATOS_POR_DEFECTO:
-            cursor.execute(
-                "INSERT INTO Aparato (codigo, tipo, descripcion) VALUES (?, ?, ?);",
-                (codigo, tipo, descripcion)
-            )
+            # Insertar los aparatos por defecto
+            for codigo, tipo, descripcion in Aparato.APARATOS_POR_DEFECTO:
+                cursor.execute(
+                    "INSERT INTO Aparato (codigo, tipo, descripcion) VALUES (?, ?, ?);",
+                    (codigo, tipo, descripcion)
+                )
+            al_confirmar(_invalidar_catalogo)
 
-        conn.commit()
         print("Aparatos por defecto insertados correctamente.")
 
     except Exception as e:
         print(f"Error al inicializar aparatos por defecto: {e}")
-    finally:
-        conn.close()
 
 
+@escritura
 def crear_aparato(codigo, tipo, descripcion=None):
     """Crea un nuevo aparato y devuelve un objeto Aparato."""
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         raise RuntimeError("No se pudo conectar a la base de datos.")
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO Aparato (codigo, tipo, descripcion) VALUES (?, ?, ?);",
-                (codigo, tipo, descripcion)
-            )
-            aparato_id = cursor.lastrowid
-        return Aparato(aparato_id, codigo, tipo, descripcion)
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO Aparato (codigo, tipo, descripcion) VALUES (?, ?, ?);",
+            (codigo, tipo, descripcion)
+        )
+        aparato_id = cursor.lastrowid
+        al_confirmar(_invalidar_catalogo)
+    return Aparato(aparato_id, codigo, tipo, descripcion)
 
 
-def listar_aparatos():
-    """Devuelve una lista de objetos Aparato con todos los registros."""
-    conn = crear_conexion()
-    if conn is None:
-        print("No se pudo conectar a la base de datos.")
-        return []
+def iter_aparatos():
+    """Generador de Aparato (por tipo y código). El inventario ya está en memoria."""
+    yield from listar_aparatos()
 
-    aparatos = []
+
+def listar_aparatos():
+    """Devuelve una lista de objetos Aparato con todos los registros (desde el catálogo)."""
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT aparato_id, codigo, tipo, descripcion FROM Aparato ORDER BY tipo, codigo;"
-        )
-        filas = cursor.fetchall()
-
-        for fila in filas:
-            aparatos.append(
-                Aparato(
-                    aparato_id=fila["aparato_id"],
-                    codigo=fila["codigo"],
-                    tipo=fila["tipo"],
-                    descripcion=fila["descripcion"]
-                )
-            )
+        return catalogo.aparatos()
     except Exception as e:
         print(f"Error al listar aparatos: {e}")
-    finally:
-        conn.close()
+        return []
 
-    return aparatos
 
+# Columnas por las que se puede ordenar listar_aparatos_rango
+COLUMNAS_ORDEN_APARATO = ("aparato_id", "codigo", "tipo", "descripcion")
 
-def obtener_aparato_por_id(aparato_id):
-    """Devuelve un objeto Aparato por su ID, o None si no existe."""
-    conn = crear_conexion()
-    if conn is None:
-        return None
 
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT aparato_id, codigo, tipo, descripcion FROM Aparato WHERE aparato_id = ?;",
-            (aparato_id,)
-        )
-        fila = cursor.fetchone()
-        if fila is None:
-            return None
-        return Aparato(
-            aparato_id=fila["aparato_id"],
-            codigo=fila["codigo"],
-            tipo=fila["tipo"],
-            descripcion=fila["descripcion"]
-        )
-    finally:
-        conn.close()
+def contar_aparatos() -> int:
+    """Número de aparatos (desde el catálogo)."""
+    return len(listar_aparatos())
+
+
+def listar_aparatos_rango(offset: int, limite: int, orden: str | None = None,
+                          descendente: bool = False):
+    """
+    Página de aparatos para las listas paginadas, del catálogo en memoria.
+    Por defecto ordena como listar_aparatos (tipo, código); 'orden' debe ser
+    una de COLUMNAS_ORDEN_APARATO (los valores vacíos van al final).
+    """
+    aparatos = listar_aparatos()
+    if orden is not None:
+        if orden not in COLUMNAS_ORDEN_APARATO:
+            raise ValueError(f"No se puede ordenar por {orden}.")
+        con_valor = [a for a in aparatos if getattr(a, orden) is not None]
+        con_valor.sort(key=lambda a: (getattr(a, orden), a.aparato_id), reverse=descendente)
+        aparatos = con_valor + [a for a in aparatos if getattr(a, orden) is None]
+    return aparatos[offset:offset + limite]
+
+
+def obtener_aparato_por_id(aparato_id):
+    """Devuelve un objeto Aparato por su ID, o None si no existe (desde el catálogo)."""
+    return catalogo.por_id(aparato_id)
 
 
+@escritura
 def actualizar_aparato(aparato_id, codigo, tipo, descripcion=None):
     """Actualiza un aparato existente. Devuelve True si se actualizó."""
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                UPDATE Aparato
-                SET codigo = ?, tipo = ?, descripcion = ?
-                WHERE aparato_id = ?;
-                """,
-                (codigo, tipo, descripcion, aparato_id)
-            )
-            return cursor.rowcount > 0
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE Aparato
+            SET codigo = ?, tipo = ?, descripcion = ?
+            WHERE aparato_id = ?;
+            """,
+            (codigo, tipo, descripcion, aparato_id)
+        )
+        al_confirmar(_invalidar_catalogo)  # Puede haber cambiado de tipo
+        return cursor.rowcount > 0
 
 
+@escritura
 def eliminar_aparato(aparato_id):
     """Elimina un aparato por ID. Devuelve True si se borró."""
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM Aparato WHERE aparato_id = ?;", (aparato_id,))
-            return cursor.rowcount > 0
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM Aparato WHERE aparato_id = ?;", (aparato_id,))
+        al_confirmar(_invalidar_catalogo)  # ON DELETE CASCADE borra también sus sesiones
+        return cursor.rowcount > 0
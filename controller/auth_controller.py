@@ -1,7 +1,7 @@
 # controller/auth_controller.py
 
 import hashlib
-from model.conexion import crear_conexion
+from model.conexion import obtener_conexion, transaccion
 from model.usuario import Usuario
 
 
@@ -17,7 +17,7 @@ def crear_admin_si_no_existe(
     """
     Crea un usuario admin por defecto si no existe ninguno con ese username.
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         print("No se pudo conectar a la base de datos. No se puede crear admin.")
         return
@@ -34,7 +34,7 @@ def crear_admin_si_no_existe(
             return
 
         pwd_hash = _hash_password(password)
-        with conn:
+        with transaccion():
             cursor.execute(
                 "INSERT INTO Usuario (username, password_hash, rol) VALUES (?, ?, 'admin');",
                 (username, pwd_hash)
@@ -42,8 +42,6 @@ def crear_admin_si_no_existe(
         print(f"Usuario admin '{username}' creado con contraseña por defecto.")
     except Exception as e:
         print(f"Error al crear admin por defecto: {e}")
-    finally:
-        conn.close()
 
 
 def autenticar_usuario(username: str, password: str):
@@ -51,13 +49,14 @@ def autenticar_usuario(username: str, password: str):
     Intenta autenticar un usuario.
     Devuelve un objeto Usuario si las credenciales son correctas, o None si no.
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         print("No se pudo conectar a la base de datos.")
         return None
 
     try:
         cursor = conn.cursor()
+        cursor.row_factory = Usuario.desde_fila
         pwd_hash = _hash_password(password)
         cursor.execute(
             """
@@ -67,18 +66,7 @@ def autenticar_usuario(username: str, password: str):
             """,
             (username, pwd_hash)
         )
-        fila = cursor.fetchone()
-        if fila is None:
-            return None
-
-        return Usuario(
-            usuario_id=fila["usuario_id"],
-            username=fila["username"],
-            password_hash=fila["password_hash"],
-            rol=fila["rol"]
-        )
+        return cursor.fetchone()
     except Exception as e:
         print(f"Error al autenticar usuario: {e}")
         return None
-    finally:
-        conn.close()
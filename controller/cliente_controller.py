@@ -1,9 +1,126 @@
 # controller/cliente_controller.py
 
-from model.conexion import crear_conexion
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from model import migraciones
+from model.conexion import obtener_conexion, transaccion, al_confirmar, en_transaccion, iterar_filas
+from model.cola_escritura import escritura
 from model.cliente import Cliente
+from .disponibilidad import matriz
+from .recibo_controller import generar_recibo_individual
+
+# Caché de búsquedas por id/DNI: número de clientes y segundos que vale cada entrada
+TAMANO_CACHE_CLIENTES = int(os.environ.get("GESTIONGYM_CACHE_CLIENTES", "512"))
+TTL_CACHE_CLIENTES = float(os.environ.get("GESTIONGYM_CACHE_CLIENTES_TTL", "300"))
+
+
+class CacheClientes:
+    """
+    LRU acotada de clientes para obtener_cliente_por_id / obtener_cliente_por_dni.
+    Guarda los campos de la fila (cada acierto devuelve un Cliente nuevo) y un
+    índice DNI -> id. Las entradas caducan a los 'ttl' segundos, así que los
+    cambios hechos desde otro puesto se ven como mucho con ese retraso; los de
+    este proceso invalidan la entrada al confirmarse. Dentro de una transacción
+    no se usa (podría devolver o guardar datos sin confirmar).
+    """
+
+    def __init__(self, tamano: int = TAMANO_CACHE_CLIENTES, ttl: float = TTL_CACHE_CLIENTES):
+        self.tamano = tamano
+        self.ttl = ttl
+        self._entradas = OrderedDict()   # cliente_id -> (campos, caduca)
+        self._por_dni = {}               # dni -> cliente_id
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.caducadas = 0
+
+    def configurar(self, tamano: int | None = None, ttl: float | None = None):
+        with self._lock:
+            if tamano is not None:
+                self.tamano = tamano
+            if ttl is not None:
+                self.ttl = ttl
+            self._recortar()
+
+    def por_id(self, cliente_id):
+        with self._lock:
+            return self._leer(cliente_id)
+
+    def por_dni(self, dni):
+        with self._lock:
+            cliente_id = self._por_dni.get(dni)
+            if cliente_id is None:
+                self.fallos += 1
+                return None
+            return self._leer(cliente_id)
+
+    def guardar(self, campos: tuple):
+        if self.tamano <= 0:
+            return
+        cliente_id, dni = campos[0], campos[1]
+        with self._lock:
+            self._quitar(cliente_id)
+            self._entradas[cliente_id] = (campos, time.monotonic() + self.ttl)
+            self._por_dni[dni] = cliente_id
+            self._recortar()
+
+    def invalidar(self, cliente_id=None):
+        """Descarta un cliente (o todos si cliente_id es None)."""
+        with self._lock:
+            if cliente_id is None:
+                self._entradas.clear()
+                self._por_dni.clear()
+            else:
+                self._quitar(cliente_id)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "tamano": self.tamano,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "caducadas": self.caducadas,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+            }
+
+    def _leer(self, cliente_id):
+        entrada = self._entradas.get(cliente_id)
+        if entrada is None:
+            self.fallos += 1
+            return None
+        campos, caduca = entrada
+        if time.monotonic() >= caduca:
+            self._quitar(cliente_id)
+            self.caducadas += 1
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(cliente_id)
+        self.aciertos += 1
+        return Cliente(*campos)
+
+    def _quitar(self, cliente_id):
+        entrada = self._entradas.pop(cliente_id, None)
+        if entrada is not None and self._por_dni.get(entrada[0][1]) == cliente_id:
+            del self._por_dni[entrada[0][1]]
+
+    def _recortar(self):
+        while len(self._entradas) > max(self.tamano, 0):
+            self._quitar(next(iter(self._entradas)))
+
 
+# Instancia compartida
+cache_clientes = CacheClientes()
 
+
+@escritura
 def crear_cliente(dni, nombre, apellido, email=None, telefono=None, fecha_alta=None):
     """
     Crea un nuevo cliente en la base de datos y devuelve un objeto Cliente.
@@ -12,135 +129,377 @@ def crear_cliente(dni, nombre, apellido, email=None, telefono=None, fecha_alta=N
     if not dni or not nombre or not apellido or not fecha_alta:
         raise ValueError("DNI, nombre, apellido y fecha de alta son obligatorios.")
 
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         raise RuntimeError("No se pudo conectar a la base de datos.")
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO Cliente (dni, nombre, apellido, email, telefono, fecha_alta)
-                VALUES (?, ?, ?, ?, ?, ?);
-                """,
-                (dni, nombre, apellido, email, telefono, fecha_alta)
-            )
-            cliente_id = cursor.lastrowid
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO Cliente (dni, nombre, apellido, email, telefono, fecha_alta)
+            VALUES (?, ?, ?, ?, ?, ?);
+            """,
+            (dni, nombre, apellido, email, telefono, fecha_alta)
+        )
+        cliente_id = cursor.lastrowid
+
+    return Cliente(cliente_id, dni, nombre, apellido, email, telefono, fecha_alta)
+
 
-        return Cliente(cliente_id, dni, nombre, apellido, email, telefono, fecha_alta)
-    finally:
-        conn.close()
+@escritura
+def crear_cliente_con_recibo(dni, nombre, apellido, email=None, telefono=None,
+                             fecha_alta=None, anyo=None, mes=None, importe=30.0):
+    """
+    Da de alta un cliente y genera su primer recibo (anyo/mes) en una única
+    transacción: o se crean los dos, o ninguno.
+    Devuelve una tupla (Cliente, recibo_id).
+    """
+    with transaccion():
+        cliente = crear_cliente(dni, nombre, apellido, email, telefono, fecha_alta)
+        recibo_id = generar_recibo_individual(cliente.cliente_id, anyo, mes, importe)
+        if recibo_id is None:
+            raise RuntimeError("No se pudo generar el recibo del cliente.")
+    return cliente, recibo_id
 
 
 def listar_clientes():
     """
     Devuelve una lista de objetos Cliente con todos los registros de la tabla.
     """
-    conn = crear_conexion()
+    return list(iter_clientes())
+
+
+def iter_clientes(tamano_lote: int | None = None):
+    """
+    Generador de Cliente (orden apellido, nombre) que lee por lotes de
+    fetchmany, con memoria constante aunque haya muchos clientes.
+    """
+    conn = obtener_conexion()
     if conn is None:
-        return []
+        return
+
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    cursor.execute(
+        """
+        SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
+        FROM Cliente
+        ORDER BY apellido, nombre;
+        """
+    )
+    yield from iterar_filas(cursor, tamano_lote)
+
+
+# Columnas por las que se puede ordenar listar_clientes_rango (se interpolan en el SQL)
+COLUMNAS_ORDEN_CLIENTE = ("cliente_id", "dni", "nombre", "apellido", "email", "telefono", "fecha_alta")
+
+
+def contar_clientes(consulta: str | None = None) -> int:
+    """
+    Devuelve el número total de clientes o, con consulta, el de los que
+    encajan con ella (mismas reglas que buscar_clientes).
+    """
+    conn = obtener_conexion()
+    if conn is None:
+        return 0
+
+    texto = (consulta or "").strip()
+    if not texto:
+        return conn.execute("SELECT COUNT(*) FROM Cliente;").fetchone()[0]
 
-    clientes = []
+    filtro = filtro_busqueda_clientes(conn, texto)
+    if filtro is None:
+        return 0
+    condicion, params = filtro
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
-            FROM Cliente
-            ORDER BY apellido, nombre;
-            """
+        return conn.execute(f"SELECT COUNT(*) FROM Cliente WHERE {condicion};", params).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0  # Palabras que el tokenizador deja vacías (ver buscar_clientes)
+
+
+def listar_clientes_rango(offset: int, limite: int, orden: str | None = None,
+                          descendente: bool = False):
+    """
+    Devuelve una página de clientes (lista de Cliente) para las listas paginadas.
+    Por defecto ordena como listar_clientes (apellido, nombre); 'orden' debe ser
+    una de COLUMNAS_ORDEN_CLIENTE. El cliente_id desempata para que el orden sea estable.
+    """
+    if orden is None:
+        orden_sql = "apellido, nombre, cliente_id"
+    elif orden in COLUMNAS_ORDEN_CLIENTE:
+        sentido = "DESC" if descendente else "ASC"
+        orden_sql = f"{orden} {sentido}, cliente_id {sentido}"
+    else:
+        raise ValueError(f"No se puede ordenar por {orden}.")
+
+    conn = obtener_conexion()
+    if conn is None:
+        return []
+
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    cursor.execute(
+        f"""
+        SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
+        FROM Cliente
+        ORDER BY {orden_sql}
+        LIMIT ? OFFSET ?;
+        """,
+        (limite, offset)
+    )
+    return cursor.fetchall()
+
+
+# conexión -> (generación de migraciones, existe ClienteFTS): el buscador
+# pregunta en cada pulsación y el esquema solo cambia al migrar
+_indice_fts = weakref.WeakKeyDictionary()
+
+
+def _tiene_indice_fts(conn) -> bool:
+    guardado = _indice_fts.get(conn)
+    if guardado is not None and guardado[0] == migraciones.generacion:
+        return guardado[1]
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ClienteFTS';"
+    ).fetchone() is not None
+    _indice_fts[conn] = (migraciones.generacion, existe)
+    return existe
+
+
+def _consulta_fts(texto: str) -> str:
+    """
+    Convierte lo que escribe el usuario en una consulta FTS5: cada palabra
+    entre comillas (sin operadores ni sintaxis FTS) y como prefijo, todas
+    obligatorias. 'mar garc' -> '"mar"* "garc"*'
+    """
+    terminos = [t.replace('"', "") for t in texto.split()]
+    return " ".join(f'"{t}"*' for t in terminos if t)
+
+
+def _condicion_like(texto: str):
+    """WHERE equivalente con LIKE para BD sin ClienteFTS (cada palabra en algún campo)."""
+    condiciones, params = [], []
+    for termino in texto.split():
+        # % y _ escritos por el usuario se buscan tal cual, no como comodines
+        termino = termino.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        patron = f"%{termino}%"
+        condiciones.append(
+            "(nombre LIKE ? ESCAPE '\\' OR apellido LIKE ? ESCAPE '\\' OR dni LIKE ? ESCAPE '\\'"
+            " OR email LIKE ? ESCAPE '\\' OR telefono LIKE ? ESCAPE '\\')"
         )
-        filas = cursor.fetchall()
-        for fila in filas:
-            clientes.append(
-                Cliente(
-                    cliente_id=fila["cliente_id"],
-                    dni=fila["dni"],
-                    nombre=fila["nombre"],
-                    apellido=fila["apellido"],
-                    email=fila["email"],
-                    telefono=fila["telefono"],
-                    fecha_alta=fila["fecha_alta"]
-                )
-            )
-    finally:
-        conn.close()
+        params.extend([patron] * 5)
+    return " AND ".join(condiciones) or "1", params
 
-    return clientes
 
+def filtro_busqueda_clientes(conn, texto: str, columna_id: str = "cliente_id"):
+    """
+    (condición, parámetros) para el WHERE de una consulta sobre Cliente que
+    deja solo los clientes que encajan con texto (mismas reglas que
+    buscar_clientes), o None si no puede encajar ninguno.
+    columna_id: cómo se llama cliente_id en esa consulta (p. ej. 'c.cliente_id').
+    Con ClienteFTS, la consulta puede lanzar sqlite3.OperationalError si las
+    palabras quedan vacías al tokenizar: el llamante lo trata como sin resultados.
+    """
+    if _tiene_indice_fts(conn):
+        expresion = _consulta_fts(texto)
+        if not expresion:
+            return None
+        return f"{columna_id} IN (SELECT rowid FROM ClienteFTS WHERE ClienteFTS MATCH ?)", [expresion]
+    return _condicion_like(texto)
 
-def obtener_cliente_por_id(cliente_id: int):
+
+def buscar_clientes(consulta: str, limite: int | None = 50):
     """
-    Devuelve un objeto Cliente por su ID, o None si no existe.
+    Busca clientes por nombre, apellido, DNI, email o teléfono.
+    Cada palabra de la consulta se busca como prefijo y sin distinguir
+    tildes ni mayúsculas ('garc 123' encuentra a García con DNI 123...).
+    Devuelve una lista de Cliente ordenada por relevancia (los aciertos
+    en DNI y apellido pesan más). Con la consulta vacía devuelve los
+    primeros clientes en el orden de listar_clientes. limite=None: sin límite.
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
-        return None
+        return []
 
-    try:
-        cursor = conn.cursor()
+    texto = (consulta or "").strip()
+    if not texto:
+        if limite is None:
+            return listar_clientes()
+        return listar_clientes_rango(0, limite)
+
+    limite_sql = -1 if limite is None else limite  # LIMIT -1 = sin límite
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    if _tiene_indice_fts(conn):
+        expresion = _consulta_fts(texto)
+        if not expresion:
+            return []
+        try:
+            cursor.execute(
+                """
+                SELECT c.cliente_id, c.dni, c.nombre, c.apellido, c.email, c.telefono, c.fecha_alta
+                FROM ClienteFTS
+                JOIN Cliente c ON c.cliente_id = ClienteFTS.rowid
+                WHERE ClienteFTS MATCH ?
+                ORDER BY bm25(ClienteFTS, 2.0, 3.0, 5.0, 1.0, 1.0), c.apellido, c.nombre
+                LIMIT ?;
+                """,
+                (expresion, limite_sql)
+            )
+        except sqlite3.OperationalError:
+            # Palabras que el tokenizador deja vacías (solo signos): sin resultados
+            return []
+    else:
+        condicion, params = _condicion_like(texto)
         cursor.execute(
-            """
+            f"""
             SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
             FROM Cliente
-            WHERE cliente_id = ?;
+            WHERE {condicion}
+            ORDER BY apellido, nombre
+            LIMIT ?;
             """,
-            (cliente_id,)
+            (*params, limite_sql)
         )
-        fila = cursor.fetchone()
-        if fila is None:
-            return None
 
-        return Cliente(
-            cliente_id=fila["cliente_id"],
-            dni=fila["dni"],
-            nombre=fila["nombre"],
-            apellido=fila["apellido"],
-            email=fila["email"],
-            telefono=fila["telefono"],
-            fecha_alta=fila["fecha_alta"]
-        )
-    finally:
-        conn.close()
+    return cursor.fetchall()
+
+
+def ids_clientes_coincidentes(consulta: str) -> set[int] | None:
+    """
+    Ids de todos los clientes que encajan con la consulta (mismas reglas que
+    buscar_clientes), para filtrar listas que ya están en memoria.
+    Devuelve None si la consulta está vacía (no hay que filtrar).
+    """
+    texto = (consulta or "").strip()
+    if not texto:
+        return None
+
+    conn = obtener_conexion()
+    if conn is None:
+        return set()
+
+    if _tiene_indice_fts(conn):
+        expresion = _consulta_fts(texto)
+        if not expresion:
+            return set()
+        try:
+            filas = conn.execute(
+                "SELECT rowid FROM ClienteFTS WHERE ClienteFTS MATCH ?;", (expresion,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return set()
+    else:
+        condicion, params = _condicion_like(texto)
+        filas = conn.execute(f"SELECT cliente_id FROM Cliente WHERE {condicion};", params).fetchall()
+    return {fila[0] for fila in filas}
+
+
+def listar_clientes_pagina(despues_de: tuple | None = None, limite: int = 100):
+    """
+    Paginación por clave (keyset) en el orden de listar_clientes.
+    despues_de: (apellido, nombre, cliente_id) del último cliente de la página
+    anterior, o None para la primera.
+    Devuelve (clientes, clave_siguiente); clave_siguiente es None en la última página.
+    Con idx_cliente_apellido_nombre cada página cuesta lo mismo, sea la primera
+    o la última (no hay OFFSET que recorrer).
+    """
+    if limite < 1:
+        raise ValueError("El tamaño de página debe ser al menos 1.")
+
+    conn = obtener_conexion()
+    if conn is None:
+        return [], None
+
+    if despues_de is None:
+        condicion, params = "", ()
+    else:
+        condicion, params = "WHERE (apellido, nombre, cliente_id) > (?, ?, ?)", tuple(despues_de)
+
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    cursor.execute(
+        f"""
+        SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
+        FROM Cliente
+        {condicion}
+        ORDER BY apellido, nombre, cliente_id
+        LIMIT ?;
+        """,
+        (*params, limite + 1)  # Una de más para saber si hay página siguiente
+    )
+    clientes = cursor.fetchall()
+    if len(clientes) <= limite:
+        return clientes, None
+    del clientes[limite:]
+    ultimo = clientes[-1]
+    return clientes, (ultimo.apellido, ultimo.nombre, ultimo.cliente_id)
+
+
+def obtener_cliente_por_id(cliente_id: int):
+    """
+    Devuelve un objeto Cliente por su ID, o None si no existe.
+    Pasa por cache_clientes.
+    """
+    usar_cache = not en_transaccion()
+    if usar_cache:
+        cliente = cache_clientes.por_id(cliente_id)
+        if cliente is not None:
+            return cliente
+
+    conn = obtener_conexion()
+    if conn is None:
+        return None
+
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    cursor.execute(
+        """
+        SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
+        FROM Cliente
+        WHERE cliente_id = ?;
+        """,
+        (cliente_id,)
+    )
+    cliente = cursor.fetchone()
+    if cliente is not None and usar_cache:
+        cache_clientes.guardar(cliente.como_tupla())
+    return cliente
 
 
 def obtener_cliente_por_dni(dni: str):
     """
     Devuelve un objeto Cliente buscando por DNI, o None si no existe.
-    Útil para evitar clientes duplicados.
+    Útil para evitar clientes duplicados. Pasa por cache_clientes.
     """
-    conn = crear_conexion()
+    usar_cache = not en_transaccion()
+    if usar_cache:
+        cliente = cache_clientes.por_dni(dni)
+        if cliente is not None:
+            return cliente
+
+    conn = obtener_conexion()
     if conn is None:
         return None
 
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
-            FROM Cliente
-            WHERE dni = ?;
-            """,
-            (dni,)
-        )
-        fila = cursor.fetchone()
-        if fila is None:
-            return None
-
-        return Cliente(
-            cliente_id=fila["cliente_id"],
-            dni=fila["dni"],
-            nombre=fila["nombre"],
-            apellido=fila["apellido"],
-            email=fila["email"],
-            telefono=fila["telefono"],
-            fecha_alta=fila["fecha_alta"]
-        )
-    finally:
-        conn.close()
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    cursor.execute(
+        """
+        SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
+        FROM Cliente
+        WHERE dni = ?;
+        """,
+        (dni,)
+    )
+    cliente = cursor.fetchone()
+    if cliente is not None and usar_cache:
+        cache_clientes.guardar(cliente.como_tupla())
+    return cliente
 
 
+@escritura
 def actualizar_cliente(cliente_id: int, dni, nombre, apellido,
                        email=None, telefono=None, fecha_alta=None):
     """
@@ -150,26 +509,26 @@ def actualizar_cliente(cliente_id: int, dni, nombre, apellido,
     if not dni or not nombre or not apellido:
         raise ValueError("DNI, nombre y apellido son obligatorios.")
 
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                UPDATE Cliente
-                SET dni = ?, nombre = ?, apellido = ?, email = ?, telefono = ?, fecha_alta = ?
-                WHERE cliente_id = ?;
-                """,
-                (dni, nombre, apellido, email, telefono, fecha_alta, cliente_id)
-            )
-            return cursor.rowcount > 0
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE Cliente
+            SET dni = ?, nombre = ?, apellido = ?, email = ?, telefono = ?, fecha_alta = ?
+            WHERE cliente_id = ?;
+            """,
+            (dni, nombre, apellido, email, telefono, fecha_alta, cliente_id)
+        )
+        if cursor.rowcount > 0:
+            al_confirmar(lambda: cache_clientes.invalidar(cliente_id))
+        return cursor.rowcount > 0
 
 
+@escritura
 def eliminar_cliente(cliente_id: int):
     """
     Elimina un cliente por ID.
@@ -177,17 +536,17 @@ def eliminar_cliente(cliente_id: int):
     según la configuración (aquí usamos ON DELETE CASCADE en algunas tablas).
     Devuelve True si se eliminó alguna fila.
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "DELETE FROM Cliente WHERE cliente_id = ?;",
-                (cliente_id,)
-            )
-            return cursor.rowcount > 0
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM Cliente WHERE cliente_id = ?;",
+            (cliente_id,)
+        )
+        if cursor.rowcount > 0:
+            al_confirmar(lambda: cache_clientes.invalidar(cliente_id))
+            al_confirmar(matriz.invalidar)  # ON DELETE CASCADE borra también sus sesiones
+        return cursor.rowcount > 0
@@ -0,0 +1,260 @@
+# controller/disponibilidad.py
+"""
+Matriz de disponibilidad en memoria para las reservas.
+
+Por cada fecha se guarda, para cada aparato, un entero de 48 bits en el que el
+bit i indica que la franja i (00:00, 00:30, ..., 23:30) está ocupada. El día se
+carga de Sesion la primera vez que se consulta y después lo mantienen al día
+crear_sesion y cancelar_sesion (solo cuando la transacción se confirma, ver
+model.conexion.al_confirmar). Se guardan como mucho MAX_DIAS días; se descarta
+el menos usado.
+
+Los aparatos de cada tipo salen del catálogo de aparato_controller.
+La matriz lee los días con su propia conexión, cada uno en una lectura corta:
+así no carga un día desde la foto antigua de un llamante con una lectura
+abierta (p. ej. un iter_* a medias). Con esa conexión vigila PRAGMA data_version:
+si cambia sin que este proceso haya confirmado nada (model.conexion.confirmaciones_propias),
+el cambio vino de otro proceso y la matriz (y el catálogo) se vacían. Los
+cambios propios ya los aplica al_confirmar. Si en el mismo intervalo confirman
+este proceso y otro, el cambio ajeno puede no detectarse; la matriz solo
+orienta (reservar() comprueba la franja en SQL). Se descartan los días
+anteriores a hoy al cargar uno nuevo.
+Dentro de una transacción abierta no se responde desde memoria: el llamante
+debe consultar por SQL para ver sus propios cambios aún sin confirmar.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from model import conexion
+from model.conexion import en_transaccion, confirmaciones_propias
+
+# Días que se mantienen en memoria (los menos usados se descartan)
+MAX_DIAS = 62
+
+FRANJAS_POR_DIA = 48
+
+
+def indice_franja(hora: str) -> int | None:
+    """'HH:MM' -> índice de franja (0..47), o None si no es una franja válida."""
+    try:
+        h, m = hora.split(":")
+        h, m = int(h), int(m)
+    except (AttributeError, ValueError):
+        return None
+    if not 0 <= h <= 23 or m not in (0, 30):
+        return None
+    return h * 2 + m // 30
+
+
+class MatrizDisponibilidad:
+    """Ocupación aparato x franja por fecha, cargada bajo demanda desde Sesion."""
+
+    def __init__(self, max_dias: int = MAX_DIAS):
+        self.max_dias = max_dias
+        self._dias = OrderedDict()          # fecha -> {aparato_id: máscara de franjas}
+        self._conn = None                   # Conexión propia (solo se usa con _lock)
+        self._ruta = None                   # BD a la que apunta _conn
+        self._version = None                # (data_version, confirmaciones_propias) vistos
+        self._lock = threading.RLock()
+        self.aciertos = 0
+        self.cargas = 0
+
+    # ---------- Estado ----------
+
+    def puede_responder(self, conn) -> bool:
+        """
+        True si la matriz puede contestar al llamante (conn es su conexión):
+        no hay una transacción abierta y, si otro proceso cambió la BD desde
+        la última consulta, se vacía antes de seguir.
+        """
+        if conn is None or en_transaccion():
+            return False
+
+        with self._lock:
+            propia = self._conexion()
+            if propia is None:
+                return False
+            # Las confirmaciones propias se leen antes: si una llega entre las dos
+            # lecturas, se toma por ajena y solo se vacía de más
+            propias = confirmaciones_propias()
+            version = propia.execute("PRAGMA data_version;").fetchone()[0]
+            anterior = self._version
+            self._version = (version, propias)
+            if anterior is not None and anterior[0] != version and anterior[1] == propias:
+                self._vaciar()   # Cambios de otro proceso: no se sabe qué cambió
+        return True
+
+    def invalidar(self, fecha: str | None = None):
+        """Descarta un día (o todo, incluido el catálogo de aparatos si fecha es None)."""
+        with self._lock:
+            if fecha is None:
+                self._vaciar()
+            else:
+                self._dias.pop(fecha, None)
+
+    def descartar_anteriores(self, fecha: str):
+        """Descarta los días anteriores a fecha ('YYYY-MM-DD')."""
+        with self._lock:
+            for dia in [d for d in self._dias if d < fecha]:
+                del self._dias[dia]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "dias_cargados": len(self._dias),
+                "aciertos": self.aciertos,
+                "cargas": self.cargas,
+            }
+
+    def _vaciar(self):
+        self._dias.clear()
+        _catalogo_aparatos().invalidar()
+
+    def _conexion(self):
+        """Conexión propia de la matriz; se reabre (y se vacía) si cambia la BD configurada."""
+        if self._conn is not None and self._ruta != conexion.DB_PATH:
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            # check_same_thread=False (ver crear_conexion): se usa desde varios hilos, siempre con _lock
+            self._conn = conexion.crear_conexion()
+            self._ruta = conexion.DB_PATH
+            self._version = None
+            self._vaciar()
+        return self._conn
+
+    # ---------- Carga ----------
+
+    def _catalogo(self, conn) -> dict:
+        """tipo -> [aparato_id, ...] (orden de id)."""
+        return _catalogo_aparatos().ids_por_tipo()
+
+    def _leer_dia(self, fecha: str) -> dict:
+        # En autocommit cada execute es una lectura corta con la última versión confirmada
+        ocupacion = {}
+        for aparato_id, hora in self._conexion().execute(
+            "SELECT aparato_id, hora_inicio FROM Sesion WHERE fecha = ?;", (fecha,)
+        ).fetchall():
+            indice = indice_franja(hora)
+            if indice is not None:
+                ocupacion[aparato_id] = ocupacion.get(aparato_id, 0) | (1 << indice)
+        return ocupacion
+
+    def _dia(self, conn, fecha: str) -> dict:
+        dia = self._dias.get(fecha)
+        if dia is not None:
+            self._dias.move_to_end(fecha)
+            self.aciertos += 1
+            return dia
+
+        self.descartar_anteriores(date.today().isoformat())
+        dia = self._dias[fecha] = self._leer_dia(fecha)
+        self.cargas += 1
+        while len(self._dias) > self.max_dias:
+            self._dias.popitem(last=False)
+        return dia
+
+    # ---------- Consultas (llamar solo si puede_responder(conn)) ----------
+
+    def ocupado(self, conn, aparato_id: int, fecha: str, hora: str) -> bool:
+        indice = indice_franja(hora)
+        if indice is None:
+            return False
+        with self._lock:
+            return bool(self._dia(conn, fecha).get(aparato_id, 0) >> indice & 1)
+
+    def slots_disponibles(self, conn, fecha: str, tipos: list[str], slots) -> dict:
+        """{tipo: [horas de 'slots' con al menos un aparato libre de ese tipo]}"""
+        resultado = {}
+        with self._lock:
+            catalogo = self._catalogo(conn)
+            dia = self._dia(conn, fecha)
+            for tipo in tipos:
+                ids = catalogo.get(tipo)
+                if not ids:
+                    resultado[tipo] = []
+                    continue
+                # Un bit queda a 1 solo si TODOS los aparatos del tipo tienen ocupada esa franja
+                llenos = -1
+                for aparato_id in ids:
+                    llenos &= dia.get(aparato_id, 0)
+                resultado[tipo] = [s for s in slots if not llenos >> indice_franja(s) & 1]
+        return resultado
+
+    def aparato_libre(self, conn, tipo: str, fecha: str, hora: str) -> int | None:
+        """Primer aparato (por id) del tipo libre en esa franja, o None."""
+        indice = indice_franja(hora)
+        with self._lock:
+            ids = self._catalogo(conn).get(tipo, [])
+            if indice is None:
+                return ids[0] if ids else None
+            dia = self._dia(conn, fecha)
+            for aparato_id in ids:
+                if not dia.get(aparato_id, 0) >> indice & 1:
+                    return aparato_id
+        return None
+
+    # ---------- Actualización (desde los controladores, tras el COMMIT) ----------
+
+    def marcar(self, aparato_id: int, fecha: str, hora: str):
+        """Marca la franja como ocupada (si el día está cargado)."""
+        self._cambiar(aparato_id, fecha, hora, True)
+
+    def liberar(self, aparato_id: int, fecha: str, hora: str):
+        """Marca la franja como libre (si el día está cargado)."""
+        self._cambiar(aparato_id, fecha, hora, False)
+
+    def _cambiar(self, aparato_id, fecha, hora, ocupar: bool):
+        indice = indice_franja(hora)
+        with self._lock:
+            dia = self._dias.get(fecha)
+            if dia is None or indice is None:
+                return
+            mascara = dia.get(aparato_id, 0)
+            mascara = mascara | (1 << indice) if ocupar else mascara & ~(1 << indice)
+            if mascara:
+                dia[aparato_id] = mascara
+            else:
+                dia.pop(aparato_id, None)
+
+    # ---------- Comprobación ----------
+
+    def verificar_consistencia(self, conn) -> list[str]:
+        """
+        Compara los días cargados y el catálogo con la BD (conn: la del llamante,
+        los días se leen con la conexión propia).
+        Devuelve la lista de diferencias encontradas (vacía si todo cuadra)
+        y recarga lo que no coincida.
+        """
+        diferencias = []
+        with self._lock:
+            catalogo = _catalogo_aparatos()
+            if catalogo.estadisticas()["cargado"]:
+                en_memoria = catalogo.ids_por_tipo()
+                catalogo.invalidar()
+                if catalogo.ids_por_tipo() != en_memoria:
+                    diferencias.append("catálogo de aparatos")
+
+            for fecha, dia in list(self._dias.items()):
+                real = self._leer_dia(fecha)
+                if real == dia:
+                    continue
+                for aparato_id in sorted(set(real) | set(dia)):
+                    memoria, bd = dia.get(aparato_id, 0), real.get(aparato_id, 0)
+                    if memoria != bd:
+                        franjas = [f"{i // 2:02d}:{i % 2 * 30:02d}"
+                                   for i in range(FRANJAS_POR_DIA) if (memoria ^ bd) >> i & 1]
+                        diferencias.append(f"{fecha} aparato {aparato_id}: {', '.join(franjas)}")
+                self._dias[fecha] = real
+        return diferencias
+
+
+def _catalogo_aparatos():
+    # Import diferido: aparato_controller importa este módulo
+    from .aparato_controller import catalogo
+    return catalogo
+
+
+# Instancia compartida por los controladores
+matriz = MatrizDisponibilidad()
@@ -0,0 +1,321 @@
+# controller/exportacion.py
+"""
+Exportación de datos a CSV o JSON Lines (opcionalmente comprimidos con gzip).
+
+Cada exportación es una única SELECT que se recorre con iterar_filas y se
+escribe fila a fila, así que la memoria no depende del número de filas
+(años de sesiones o de pagos). No hay ORDER BY, que obligaría a SQLite a
+ordenar el resultado completo: las filas salen en el orden del índice que
+elija SQLite para el filtro (p. ej. fecha en sesiones) o de la clave primaria.
+
+Exportaciones (ver EXPORTACIONES):
+    clientes, aparatos, sesiones, recibos, pagos   tablas tal cual
+    ocupacion      sesiones con aparato y cliente (forma de obtener_ocupacion_diaria)
+    estado_pagos   estado de cada cliente en cada mes (forma de obtener_estado_pagos_mes)
+
+El filtro desde/hasta (ambos incluidos) acepta 'YYYY', 'YYYY-MM' o
+'YYYY-MM-DD'. En las exportaciones por periodo (recibos, estado_pagos) solo
+cuentan año y mes.
+
+    python -m controller.exportacion sesiones --desde 2023 --hasta 2025 -o sesiones.csv.gz
+    python -m controller.exportacion pagos --desde 2025-01 -o pagos.jsonl
+"""
+import argparse
+import calendar
+import csv
+import gzip
+import json
+import re
+import sys
+import time
+from datetime import date
+
+from model.conexion import obtener_conexion, iterar_filas
+
+FORMATOS = ("csv", "jsonl")
+
+_RE_FECHA = re.compile(r"^\d{4}(-\d{2}(-\d{2})?)?$")
+
+
+# nombre -> (SQL con {filtro}, columna de fecha o "periodo", descripción)
+EXPORTACIONES = {
+    "clientes": (
+        """
+        SELECT cliente_id, dni, nombre, apellido, email, telefono, fecha_alta
+        FROM Cliente {filtro};
+        """,
+        "fecha_alta",
+        "Clientes (filtro por fecha de alta)",
+    ),
+    "aparatos": (
+        """
+        SELECT aparato_id, codigo, tipo, descripcion
+        FROM Aparato {filtro};
+        """,
+        None,
+        "Aparatos (sin filtro)",
+    ),
+    "sesiones": (
+        """
+        SELECT sesion_id, aparato_id, cliente_id, fecha, hora_inicio, duracion, created_by
+        FROM Sesion {filtro};
+        """,
+        "fecha",
+        "Sesiones (filtro por fecha)",
+    ),
+    "recibos": (
+        """
+        SELECT recibo_id, cliente_id, periodo_anyo, periodo_mes,
+               fecha_generacion, importe, estado
+        FROM Recibo {filtro};
+        """,
+        "periodo",
+        "Recibos (filtro por periodo)",
+    ),
+    "pagos": (
+        """
+        SELECT pago_id, recibo_id, fecha_pago, metodo, referencia
+        FROM Pago {filtro};
+        """,
+        "fecha_pago",
+        "Pagos (filtro por fecha de pago)",
+    ),
+    "ocupacion": (
+        """
+        SELECT
+            s.sesion_id,
+            s.aparato_id,
+            a.codigo AS aparato_codigo,
+            a.tipo AS aparato_tipo,
+            s.cliente_id,
+            c.nombre AS cliente_nombre,
+            c.apellido AS cliente_apellido,
+            s.fecha,
+            s.hora_inicio
+        FROM Sesion s
+        JOIN Aparato a ON s.aparato_id = a.aparato_id
+        JOIN Cliente c ON s.cliente_id = c.cliente_id
+        {filtro};
+        """,
+        "s.fecha",
+        "Sesiones con código y tipo de aparato y nombre del cliente",
+    ),
+    "estado_pagos": (
+        # CROSS JOIN fija el orden de los bucles: mes por fuera, clientes por dentro
+        """
+        WITH RECURSIVE meses(periodo_anyo, periodo_mes) AS (
+            SELECT ?, ?
+            UNION ALL
+            SELECT periodo_anyo + (periodo_mes = 12), periodo_mes % 12 + 1
+            FROM meses
+            WHERE (periodo_anyo, periodo_mes) < (?, ?)
+        )
+        SELECT
+            m.periodo_anyo, m.periodo_mes,
+            c.cliente_id, c.nombre, c.apellido, c.dni,
+            r.recibo_id, r.importe,
+            COALESCE(r.estado, 'pendiente') AS estado
+        FROM meses m
+        CROSS JOIN Cliente c
+        LEFT JOIN Recibo r ON r.cliente_id = c.cliente_id
+                           AND r.periodo_anyo = m.periodo_anyo
+                           AND r.periodo_mes = m.periodo_mes;
+        """,
+        "meses",
+        "Estado de pago de cada cliente en cada mes (sin recibo: pendiente)",
+    ),
+}
+
+
+def _limite_fecha(valor: str, final: bool) -> str:
+    """'YYYY' / 'YYYY-MM' / 'YYYY-MM-DD' -> primer o último día, en ISO."""
+    if not _RE_FECHA.match(valor):
+        raise ValueError(f"Fecha no válida: {valor!r} (YYYY, YYYY-MM o YYYY-MM-DD)")
+    try:
+        if len(valor) == 10:
+            return date.fromisoformat(valor).isoformat()
+        anyo, mes = _limite_periodo(valor, final)
+        dia = calendar.monthrange(anyo, mes)[1] if final else 1
+        return date(anyo, mes, dia).isoformat()
+    except ValueError:
+        raise ValueError(f"Fecha no válida: {valor!r}") from None
+
+
+def _limite_periodo(valor: str, final: bool) -> tuple[int, int]:
+    if not _RE_FECHA.match(valor):
+        raise ValueError(f"Periodo no válido: {valor!r} (YYYY o YYYY-MM)")
+    anyo = int(valor[:4])
+    if len(valor) == 4:
+        mes = 12 if final else 1
+    else:
+        mes = int(valor[5:7])
+    try:
+        date(anyo, mes, 1)   # Año 0 o mes fuera de 1..12
+    except ValueError:
+        raise ValueError(f"Periodo no válido: {valor!r}") from None
+    if len(valor) == 10:
+        try:
+            date.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"Fecha no válida: {valor!r}") from None
+    return anyo, mes
+
+
+def _consulta(nombre: str, desde: str | None, hasta: str | None) -> tuple[str, list]:
+    """SQL y parámetros de una exportación con el filtro aplicado."""
+    try:
+        sql, columna, _ = EXPORTACIONES[nombre]
+    except KeyError:
+        raise ValueError(f"Exportación desconocida: {nombre} (disponibles: {', '.join(EXPORTACIONES)})")
+
+    condiciones, parametros = [], []
+    if columna == "meses":
+        # Sin límites: el mes actual
+        hoy = f"{date.today():%Y-%m}"
+        parametros = [*_limite_periodo(desde or hasta or hoy, False),
+                      *_limite_periodo(hasta or desde or hoy, True)]
+        if parametros[:2] > parametros[2:]:
+            raise ValueError("El periodo inicial es posterior al final.")
+        return sql, parametros
+    if columna == "periodo":
+        if desde:
+            condiciones.append("(periodo_anyo, periodo_mes) >= (?, ?)")
+            parametros += _limite_periodo(desde, False)
+        if hasta:
+            condiciones.append("(periodo_anyo, periodo_mes) <= (?, ?)")
+            parametros += _limite_periodo(hasta, True)
+    elif columna is not None:
+        if desde:
+            condiciones.append(f"{columna} >= ?")
+            parametros.append(_limite_fecha(desde, False))
+        if hasta:
+            condiciones.append(f"{columna} <= ?")
+            parametros.append(_limite_fecha(hasta, True))
+    elif desde or hasta:
+        raise ValueError(f"La exportación {nombre} no admite filtro de fechas.")
+
+    filtro = "WHERE " + " AND ".join(condiciones) if condiciones else ""
+    return sql.format(filtro=filtro), parametros
+
+
+def iter_exportacion(nombre: str, desde: str | None = None, hasta: str | None = None,
+                     tamano_lote: int | None = None):
+    """
+    Genera primero la tupla de nombres de columna y después una tupla por fila.
+    Lee por lotes (iterar_filas), sin cargar el resultado en memoria.
+    """
+    conn = obtener_conexion()
+    if conn is None:
+        raise RuntimeError("No se pudo conectar a la base de datos.")
+
+    sql, parametros = _consulta(nombre, desde, hasta)
+    cursor = conn.cursor()
+    cursor.row_factory = None   # Tuplas: más baratas que sqlite3.Row para escribir en fichero
+    cursor.execute(sql, parametros)
+    yield tuple(d[0] for d in cursor.description)
+    yield from iterar_filas(cursor, tamano_lote)
+
+
+def _abrir_salida(ruta: str, comprimir: bool):
+    if ruta == "-":
+        return sys.stdout
+    if comprimir:
+        return gzip.open(ruta, "wt", encoding="utf-8", newline="", compresslevel=6)
+    return open(ruta, "w", encoding="utf-8", newline="")
+
+
+def escribir_filas(salida, formato: str, columnas: tuple, filas) -> int:
+    """Escribe las filas en un fichero de texto ya abierto. Devuelve cuántas escribió."""
+    total = 0
+    if formato == "csv":
+        escritor = csv.writer(salida)
+        escritor.writerow(columnas)
+        for fila in filas:
+            escritor.writerow(fila)
+            total += 1
+    else:
+        for fila in filas:
+            salida.write(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False))
+            salida.write("\n")
+            total += 1
+    return total
+
+
+def exportar(nombre: str, ruta: str, formato: str | None = None,
+             desde: str | None = None, hasta: str | None = None,
+             comprimir: bool | None = None) -> dict:
+    """
+    Escribe la exportación 'nombre' en 'ruta' ('-' para la salida estándar).
+    formato: 'csv' o 'jsonl'; si es None se deduce de la extensión (por
+    defecto csv). comprimir: gzip; si es None, cuando la ruta acaba en '.gz'.
+    La salida estándar nunca se comprime (comprimir=True con '-' es un error).
+    Devuelve un diccionario con filas, ruta y duracion_ms.
+    """
+    base = ruta[:-3] if ruta.endswith(".gz") else ruta
+    if formato is None:
+        formato = "jsonl" if base.endswith((".jsonl", ".json")) else "csv"
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no válido: {formato} (csv o jsonl)")
+    if comprimir is None:
+        comprimir = ruta.endswith(".gz")
+    if comprimir and ruta == "-":
+        raise ValueError("La salida estándar no se puede comprimir: indica un fichero con -o.")
+
+    inicio = time.perf_counter()
+    filas = iter_exportacion(nombre, desde, hasta)
+    columnas = next(filas)   # Valida la exportación y el filtro antes de crear el fichero
+
+    salida = None
+    try:
+        salida = _abrir_salida(ruta, comprimir)
+        total = escribir_filas(salida, formato, columnas, filas)
+    finally:
+        filas.close()
+        if salida is not None and salida is not sys.stdout:
+            salida.close()
+
+    return {
+        "filas": total,
+        "ruta": ruta,
+        "duracion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta datos de GestiónGym a CSV o JSON Lines.")
+    parser.add_argument("exportacion", nargs="?", choices=list(EXPORTACIONES),
+                        help="qué exportar (--lista para ver la descripción de cada una)")
+    parser.add_argument("-o", "--salida", default="-",
+                        help="fichero de salida (.csv, .jsonl, con .gz para comprimir; '-' = pantalla)")
+    parser.add_argument("--formato", choices=FORMATOS, help="por defecto, según la extensión")
+    parser.add_argument("--desde", help="YYYY, YYYY-MM o YYYY-MM-DD (incluido)")
+    parser.add_argument("--hasta", help="YYYY, YYYY-MM o YYYY-MM-DD (incluido)")
+    parser.add_argument("--gzip", action="store_true", help="comprimir aunque la ruta no acabe en .gz")
+    parser.add_argument("--db", help="ruta de la base de datos (por defecto la de la aplicación)")
+    parser.add_argument("--lista", action="store_true", help="muestra las exportaciones disponibles")
+    args = parser.parse_args(argv)
+
+    if args.lista or not args.exportacion:
+        for nombre, (_, _, descripcion) in EXPORTACIONES.items():
+            print(f"{nombre:<14} {descripcion}")
+        return
+
+    from model import conexion
+    if args.db:
+        conexion.configurar(db_path=args.db)
+
+    try:
+        resumen = exportar(args.exportacion, args.salida, args.formato,
+                           args.desde, args.hasta, args.gzip or None)
+    except ValueError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        # Salida cortada (p. ej. '| head'): no es un error
+        sys.stderr.close()
+        return
+    if args.salida != "-":
+        print(f"{resumen['filas']} filas exportadas a {resumen['ruta']} ({resumen['duracion_ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# controller/importacion_clientes.py
+"""
+Importación masiva de clientes desde un CSV (alta de un gimnasio que se pasa
+a la aplicación con miles de socios).
+
+Primero se lee y valida el fichero fila a fila, sin tocar la BD: se
+comprueban los campos, se descartan los DNI repetidos dentro del propio
+fichero y las filas válidas, ya normalizadas, se vuelcan a un fichero
+temporal. Solo después se abre la transacción de escritura, de modo que el
+resto de puestos no esperan mientras se lee el CSV. En ella se relee el
+fichero temporal por lotes de TAMANO_LOTE_IMPORTACION filas: se buscan los
+DNI que ya existen en Cliente (dni IN (...)) y los válidos se insertan con
+executemany. Todo va en una única transacción: si algo falla no se importa
+ninguno. Al final se generan los recibos del primer mes con un
+INSERT ... SELECT sobre los clientes recién creados.
+
+En memoria solo quedan un lote y los DNI ya vistos (para detectar los
+repetidos), no el fichero. Las filas rechazadas se escriben según aparecen
+en otro CSV, con la línea y el motivo.
+
+Columnas: dni, nombre, apellido y, opcionales, email, telefono, fecha_alta
+('YYYY-MM-DD'; si falta se usa la fecha de hoy). Se admite ',' o ';' como
+separador y la cabecera no distingue mayúsculas.
+
+    python -m controller.importacion_clientes socios.csv --db gym.db
+"""
+import argparse
+import csv
+import os
+import re
+import tempfile
+import time
+from itertools import islice
+from datetime import date
+
+from model.conexion import transaccion
+from model.cola_escritura import escritura
+
+# Filas que se comprueban e insertan de cada vez
+TAMANO_LOTE_IMPORTACION = 500
+
+# Parámetros como mucho en cada dni IN (...): SQLite anterior a 3.32 no admite más de 999
+MAX_PARAMETROS_IN = 900
+
+COLUMNAS_OBLIGATORIAS = ("dni", "nombre", "apellido")
+
+# Mismas reglas que el alta desde la interfaz (view/app.py ClientesView.add_cliente)
+_RE_DNI = re.compile(r"^\d{8}[A-Za-z]$")
+_RE_NOMBRE = re.compile(r"^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$")
+_RE_TELEFONO = re.compile(r"^\d+$")
+
+
+def validar_fila(fila: dict) -> tuple[tuple | None, str | None]:
+    """
+    Valida y normaliza una fila del CSV.
+    Devuelve ((dni, nombre, apellido, email, telefono, fecha_alta), None)
+    o (None, motivo del rechazo).
+    """
+    dni = (fila.get("dni") or "").strip()
+    nombre = (fila.get("nombre") or "").strip()
+    apellido = (fila.get("apellido") or "").strip()
+    email = (fila.get("email") or "").strip() or None
+    telefono = re.sub(r"[\s.-]", "", fila.get("telefono") or "") or None
+    fecha_alta = (fila.get("fecha_alta") or "").strip() or date.today().isoformat()
+
+    if not _RE_DNI.match(dni):
+        return None, "DNI no válido (8 números y una letra)"
+    if not _RE_NOMBRE.match(nombre):
+        return None, "Nombre vacío o con caracteres que no son letras"
+    if not _RE_NOMBRE.match(apellido):
+        return None, "Apellido vacío o con caracteres que no son letras"
+    if email is not None and "@" not in email:
+        return None, "Email no válido"
+    if telefono is not None and not _RE_TELEFONO.match(telefono):
+        return None, "El teléfono solo puede contener números"
+    try:
+        fecha_alta = date.fromisoformat(fecha_alta).isoformat()
+    except ValueError:
+        return None, "Fecha de alta no válida (YYYY-MM-DD)"
+
+    return (dni, nombre, apellido, email, telefono, fecha_alta), None
+
+
+def _abrir_lector(fichero):
+    """csv.DictReader con el separador detectado y la cabecera en minúsculas."""
+    muestra = fichero.read(4096)
+    fichero.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+
+    lector = csv.DictReader(fichero, dialect=dialecto)
+    if lector.fieldnames is None:
+        raise ValueError("El fichero CSV está vacío.")
+    lector.fieldnames = [c.strip().lower() for c in lector.fieldnames]
+    faltan = [c for c in COLUMNAS_OBLIGATORIAS if c not in lector.fieldnames]
+    if faltan:
+        raise ValueError(f"Faltan columnas obligatorias en el CSV: {', '.join(faltan)}")
+    return lector
+
+
+def _dnis_existentes(conn, dnis: list[str]) -> set[str]:
+    existentes = set()
+    for i in range(0, len(dnis), MAX_PARAMETROS_IN):
+        trozo = dnis[i:i + MAX_PARAMETROS_IN]
+        marcas = ", ".join("?" * len(trozo))
+        existentes.update(
+            f[0] for f in conn.execute(f"SELECT dni FROM Cliente WHERE dni IN ({marcas});", trozo)
+        )
+    return existentes
+
+
+def importar_clientes_csv(ruta: str, anyo: int | None = None, mes: int | None = None,
+                          importe: float = 30.0, generar_recibos: bool = True,
+                          ruta_rechazos: str | None = None,
+                          tamano_lote: int = TAMANO_LOTE_IMPORTACION) -> dict:
+    """
+    Importa los clientes de un CSV en una sola transacción y, si generar_recibos,
+    les crea el recibo de anyo/mes (por defecto el mes actual).
+    Las filas no válidas o con DNI ya existente se escriben en ruta_rechazos
+    (por defecto '<fichero>_rechazos.csv'; no se crea si no hay rechazos).
+    Devuelve un diccionario con leidas, importados, rechazados, recibos,
+    ruta_rechazos y duracion_ms.
+    """
+    hoy = date.today()
+    anyo = anyo or hoy.year
+    mes = mes or hoy.month
+    if not 1 <= mes <= 12:
+        raise ValueError("El mes debe estar entre 1 y 12.")
+    if tamano_lote < 1:
+        raise ValueError("El tamaño de lote debe ser al menos 1.")
+    if ruta_rechazos is None:
+        ruta_rechazos = os.path.splitext(ruta)[0] + "_rechazos.csv"
+
+    inicio = time.perf_counter()
+    leidas = 0
+    vistos = set()         # DNI ya leídos en este fichero
+
+    with open(ruta, newline="", encoding="utf-8-sig") as fichero, \
+            tempfile.TemporaryFile("w+", newline="", encoding="utf-8") as temporal:
+        lector = _abrir_lector(fichero)
+        rechazos = _Rechazos(ruta_rechazos, lector.fieldnames)
+        try:
+            # Lectura y validación fuera de la transacción (y del hilo escritor)
+            validas = csv.writer(temporal)
+            for fila in lector:
+                leidas += 1
+                originales = [fila.get(c) or "" for c in lector.fieldnames]
+                datos, motivo = validar_fila(fila)
+                if datos is not None and datos[0] in vistos:
+                    datos, motivo = None, "DNI repetido en el fichero"
+                if datos is None:
+                    rechazos.anotar(lector.line_num, originales, motivo)
+                    continue
+                vistos.add(datos[0])
+                validas.writerow([lector.line_num, *("" if v is None else v for v in datos), *originales])
+
+            temporal.seek(0)
+            importados, recibos = _insertar_clientes(
+                temporal, rechazos, anyo, mes, hoy.isoformat(), importe, generar_recibos, tamano_lote)
+        except Exception:
+            rechazos.cerrar(descartar=True)   # No se ha importado nada: el fichero no vale
+            raise
+        rechazos.cerrar()
+
+    return {
+        "leidas": leidas,
+        "importados": importados,
+        "rechazados": rechazos.total,
+        "recibos": recibos,
+        "ruta_rechazos": ruta_rechazos if rechazos.total else None,
+        "duracion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+    }
+
+
+@escritura
+def _insertar_clientes(temporal, rechazos, anyo: int, mes: int, fecha_recibo: str, importe: float,
+                       generar_recibos: bool, tamano_lote: int) -> tuple[int, int]:
+    """
+    Inserta en una sola transacción las filas validadas del fichero temporal
+    (línea, dni, nombre, apellido, email, telefono, fecha_alta, valores originales...).
+    Las de DNI ya existente se anotan en rechazos. Devuelve (importados, recibos).
+    """
+    importados = recibos = 0
+    filas = csv.reader(temporal)
+    # IMMEDIATE: nadie puede dar de alta el mismo DNI entre la comprobación y el INSERT
+    with transaccion(inmediata=True) as conn:
+        primer_id = conn.execute("SELECT COALESCE(MAX(cliente_id), 0) FROM Cliente;").fetchone()[0]
+
+        while lote := list(islice(filas, tamano_lote)):
+            existentes = _dnis_existentes(conn, [f[1] for f in lote])
+            nuevas = []
+            for linea, dni, nombre, apellido, email, telefono, fecha_alta, *originales in lote:
+                if dni in existentes:
+                    rechazos.anotar(linea, originales, "Ya existe un cliente con ese DNI")
+                else:
+                    nuevas.append((dni, nombre, apellido, email or None, telefono or None, fecha_alta))
+
+            conn.executemany(
+                """
+                INSERT INTO Cliente (dni, nombre, apellido, email, telefono, fecha_alta)
+                VALUES (?, ?, ?, ?, ?, ?);
+                """,
+                nuevas
+            )
+            importados += len(nuevas)
+
+        if generar_recibos and importados:
+            # AUTOINCREMENT: los recién insertados son los de id mayor que el máximo anterior
+            cursor = conn.execute(
+                """
+                INSERT INTO Recibo (cliente_id, periodo_anyo, periodo_mes,
+                                    fecha_generacion, importe, estado)
+                SELECT cliente_id, ?, ?, ?, ?, 'pendiente'
+                FROM Cliente
+                WHERE cliente_id > ?;
+                """,
+                (anyo, mes, fecha_recibo, importe, primer_id)
+            )
+            recibos = cursor.rowcount
+
+    return importados, recibos
+
+
+class _Rechazos:
+    """CSV de filas rechazadas: se escribe según llegan y solo se crea si hay alguna."""
+
+    def __init__(self, ruta: str, columnas: list[str]):
+        self.ruta = ruta
+        self.columnas = columnas
+        self.total = 0
+        self._fichero = None
+        self._escritor = None
+
+    def anotar(self, linea, originales: list, motivo: str):
+        if self._escritor is None:
+            self._fichero = open(self.ruta, "w", newline="", encoding="utf-8")
+            self._escritor = csv.writer(self._fichero)
+            self._escritor.writerow(["linea", *self.columnas, "motivo"])
+        self._escritor.writerow([linea, *originales, motivo])
+        self.total += 1
+
+    def cerrar(self, descartar: bool = False):
+        if self._fichero is None:
+            return
+        self._fichero.close()
+        self._fichero = self._escritor = None
+        if descartar:
+            os.remove(self.ruta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa clientes desde un fichero CSV.")
+    parser.add_argument("csv", help="fichero con columnas dni, nombre, apellido[, email, telefono, fecha_alta]")
+    parser.add_argument("--db", help="ruta de la base de datos (por defecto la de la aplicación)")
+    parser.add_argument("--anyo", type=int, help="año del primer recibo (por defecto el actual)")
+    parser.add_argument("--mes", type=int, help="mes del primer recibo (por defecto el actual)")
+    parser.add_argument("--importe", type=float, default=30.0, help="importe del primer recibo")
+    parser.add_argument("--sin-recibos", action="store_true", help="no generar el recibo del primer mes")
+    parser.add_argument("--rechazos", help="fichero CSV para las filas rechazadas")
+    args = parser.parse_args(argv)
+
+    from model import conexion
+    from model.migraciones import aplicar_migraciones
+    if args.db:
+        conexion.configurar(db_path=args.db)
+    aplicar_migraciones()
+
+    resumen = importar_clientes_csv(args.csv, args.anyo, args.mes, args.importe,
+                                    not args.sin_recibos, args.rechazos)
+    print(f"Filas leídas: {resumen['leidas']}")
+    print(f"Clientes importados: {resumen['importados']} (recibos: {resumen['recibos']})")
+    print(f"Filas rechazadas: {resumen['rechazados']}")
+    if resumen["ruta_rechazos"]:
+        print(f"Motivos de rechazo en: {resumen['ruta_rechazos']}")
+    print(f"Tiempo: {resumen['duracion_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
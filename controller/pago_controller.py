@@ -1,11 +1,13 @@
 # controller/pago_controller.py
 
 from datetime import date
-from model.conexion import crear_conexion
+from model.conexion import obtener_conexion, transaccion, iterar_filas
+from model.cola_escritura import escritura
 from model.pago import Pago
-from .recibo_controller import marcar_recibo_como_pagado
+from .recibo_controller import marcar_recibo_como_pagado, generar_recibo_individual
 
 
+@escritura
 def registrar_pago(recibo_id: int, fecha_pago: str | None = None,
                    metodo: str | None = None, referencia: str | None = None):
     """
@@ -16,64 +18,68 @@ def registrar_pago(recibo_id: int, fecha_pago: str | None = None,
     if fecha_pago is None:
         fecha_pago = date.today().isoformat()
 
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         raise RuntimeError("No se pudo conectar a la base de datos.")
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO Pago (recibo_id, fecha_pago, metodo, referencia)
-                VALUES (?, ?, ?, ?);
-                """,
-                (recibo_id, fecha_pago, metodo, referencia)
-            )
-            pago_id = cursor.lastrowid
+    # El pago y el cambio de estado del recibo van en la misma transacción
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO Pago (recibo_id, fecha_pago, metodo, referencia)
+            VALUES (?, ?, ?, ?);
+            """,
+            (recibo_id, fecha_pago, metodo, referencia)
+        )
+        pago_id = cursor.lastrowid
 
         # Marcar el recibo como pagado
         marcar_recibo_como_pagado(recibo_id)
 
-        return Pago(pago_id, recibo_id, fecha_pago, metodo, referencia)
-    finally:
-        conn.close()
+    return Pago(pago_id, recibo_id, fecha_pago, metodo, referencia)
 
 
-def listar_pagos_cliente(cliente_id: int):
+@escritura
+def cobrar_recibo_mes(cliente_id: int, anyo: int, mes: int, importe: float,
+                      recibo_id: int | None = None, metodo: str | None = None):
     """
-    Devuelve una lista de Pagos asociados a un cliente.
-    (buscamos pagos a través de sus recibos)
+    Cobra la cuota de un mes a un cliente en una única transacción:
+    si aún no tiene recibo para ese mes lo genera, y después registra el pago.
+    Devuelve el objeto Pago. Si algo falla no queda ni recibo ni pago a medias.
     """
-    conn = crear_conexion()
+    with transaccion():
+        if not recibo_id:
+            recibo_id = generar_recibo_individual(cliente_id, anyo, mes, importe)
+            if recibo_id is None:
+                raise RuntimeError("No se pudo generar o localizar el recibo.")
+        return registrar_pago(recibo_id, metodo=metodo)
+
+
+def iter_pagos_cliente(cliente_id: int, tamano_lote: int | None = None):
+    """Generador de los Pagos de un cliente (más recientes primero), por lotes."""
+    conn = obtener_conexion()
     if conn is None:
-        return []
+        return
+
+    cursor = conn.cursor()
+    cursor.row_factory = Pago.desde_fila
+    cursor.execute(
+        """
+        SELECT p.pago_id, p.recibo_id, p.fecha_pago, p.metodo, p.referencia
+        FROM Pago p
+        JOIN Recibo r ON p.recibo_id = r.recibo_id
+        WHERE r.cliente_id = ?
+        ORDER BY p.fecha_pago DESC;
+        """,
+        (cliente_id,)
+    )
+    yield from iterar_filas(cursor, tamano_lote)
 
-    pagos = []
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT p.*
-            FROM Pago p
-            JOIN Recibo r ON p.recibo_id = r.recibo_id
-            WHERE r.cliente_id = ?
-            ORDER BY p.fecha_pago DESC;
-            """,
-            (cliente_id,)
-        )
-        filas = cursor.fetchall()
-        for fila in filas:
-            pagos.append(
-                Pago(
-                    pago_id=fila["pago_id"],
-                    recibo_id=fila["recibo_id"],
-                    fecha_pago=fila["fecha_pago"],
-                    metodo=fila["metodo"],
-                    referencia=fila["referencia"],
-                )
-            )
-    finally:
-        conn.close()
 
-    return pagos
+def listar_pagos_cliente(cliente_id: int):
+    """
+    Devuelve una lista de Pagos asociados a un cliente.
+    (buscamos pagos a través de sus recibos)
+    """
+    return list(iter_pagos_cliente(cliente_id))
@@ -1,54 +1,116 @@
 # controller/recibo_controller.py
 
-from datetime import date
-from model.conexion import crear_conexion
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from model.conexion import obtener_conexion, transaccion, iterar_filas
+from model.cola_escritura import escritura
 from model.recibo import Recibo
 
+# Importe que se propone cobrar a un cliente sin recibo en el mes
+IMPORTE_SUGERIDO = 40.0
+
+# Columnas por las que se puede ordenar listar_estado_pagos_rango (se interpolan en el SQL)
+COLUMNAS_ORDEN_ESTADO_PAGO = {
+    "cliente_id": ("c.cliente_id",),
+    "nombre": ("c.nombre", "c.apellido"),
+    "apellido": ("c.apellido", "c.nombre"),
+    "dni": ("c.dni",),
+    "importe": (f"COALESCE(r.importe, {IMPORTE_SUGERIDO})",),
+    "estado": ("COALESCE(r.estado, 'pendiente')",),
+}
+
+
+@escritura
+def ejecutar_facturacion_mes(anyo: int, mes: int, importe_cuota: float) -> dict:
+    """
+    Genera en bloque los recibos de un mes para todos los clientes que aún
+    no lo tengan, con un único INSERT ... SELECT en una sola transacción.
+    Es idempotente: volver a ejecutarla para el mismo mes no crea duplicados.
+    Cada ejecución queda registrada en la tabla EjecucionFacturacion.
+    Devuelve un diccionario con ejecucion_id, creados, omitidos y duracion_ms.
+    """
+    if not 1 <= mes <= 12:
+        raise ValueError("El mes debe estar entre 1 y 12.")
+
+    inicio = time.perf_counter()
+    ahora = datetime.now()
+
+    # IMMEDIATE: el recuento de clientes y el INSERT ven el mismo estado
+    with transaccion(inmediata=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM Cliente;")
+        total_clientes = cursor.fetchone()[0]
+
+        # Usa el índice UNIQUE (cliente_id, periodo_anyo, periodo_mes) para saltar los existentes
+        cursor.execute(
+            """
+            INSERT INTO Recibo (cliente_id, periodo_anyo, periodo_mes,
+                                fecha_generacion, importe, estado)
+            SELECT c.cliente_id, ?, ?, ?, ?, 'pendiente'
+            FROM Cliente c
+            WHERE NOT EXISTS (
+                SELECT 1 FROM Recibo r
+                WHERE r.cliente_id = c.cliente_id
+                  AND r.periodo_anyo = ? AND r.periodo_mes = ?
+            );
+            """,
+            (anyo, mes, ahora.date().isoformat(), importe_cuota, anyo, mes)
+        )
+        creados = cursor.rowcount
+        omitidos = total_clientes - creados
+        duracion_ms = round((time.perf_counter() - inicio) * 1000, 3)
+
+        cursor.execute(
+            """
+            INSERT INTO EjecucionFacturacion (periodo_anyo, periodo_mes, importe,
+                                              fecha_ejecucion, creados, omitidos, duracion_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            (anyo, mes, importe_cuota, ahora.isoformat(timespec="seconds"),
+             creados, omitidos, duracion_ms)
+        )
+        ejecucion_id = cursor.lastrowid
+
+    return {
+        "ejecucion_id": ejecucion_id,
+        "creados": creados,
+        "omitidos": omitidos,
+        "duracion_ms": duracion_ms,
+    }
+
 
 def generar_recibos_mes(anyo: int, mes: int, importe_cuota: float):
     """
     Genera recibos para todos los clientes para un mes/año dado.
     No duplica recibos (gracias a la UNIQUE en (cliente_id, periodo_anyo, periodo_mes)).
-    Devuelve el número de recibos creados.
+    Devuelve el número de recibos creados (ver ejecutar_facturacion_mes para el detalle).
+    """
+    return ejecutar_facturacion_mes(anyo, mes, importe_cuota)["creados"]
+
+
+def listar_ejecuciones_facturacion(limite: int = 20):
     """
-    conn = crear_conexion()
+    Devuelve las últimas ejecuciones de facturación (más recientes primero)
+    como lista de diccionarios.
+    """
+    conn = obtener_conexion()
     if conn is None:
-        raise RuntimeError("No se pudo conectar a la base de datos.")
+        return []
 
-    creados = 0
-    try:
-        cursor = conn.cursor()
-        # Obtener todos los clientes
-        cursor.execute("SELECT cliente_id FROM Cliente;")
-        clientes = cursor.fetchall()
-
-        fecha_generacion = date.today().isoformat()
-
-        for fila in clientes:
-            cliente_id = fila["cliente_id"]
-
-            # Intentar insertar recibo, si ya existe, ignoramos el error
-            try:
-                cursor.execute(
-                    """
-                    INSERT INTO Recibo (cliente_id, periodo_anyo, periodo_mes,
-                                        fecha_generacion, importe, estado)
-                    VALUES (?, ?, ?, ?, ?, 'pendiente');
-                    """,
-                    (cliente_id, anyo, mes, fecha_generacion, importe_cuota)
-                )
-                creados += 1
-            except Exception:
-                # Probablemente ya existe un recibo para ese cliente y mes
-                conn.rollback()
-                # Reabrimos transacción para los siguientes
-                cursor = conn.cursor()
-
-        conn.commit()
-    finally:
-        conn.close()
-
-    return creados
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT ejecucion_id, periodo_anyo, periodo_mes, importe,
+               fecha_ejecucion, creados, omitidos, duracion_ms
+        FROM EjecucionFacturacion
+        ORDER BY ejecucion_id DESC
+        LIMIT ?;
+        """,
+        (limite,)
+    )
+    return [dict(fila) for fila in cursor.fetchall()]
 
 
 def obtener_estado_pagos_mes(anyo: int, mes: int):
@@ -57,63 +119,238 @@ def obtener_estado_pagos_mes(anyo: int, mes: int):
     para el mes/año dado.
     Si no existe recibo, se considera 'pendiente' (virtual).
     """
-    conn = crear_conexion()
+    return list(iter_estado_pagos_mes(anyo, mes))
+
+
+def listar_estado_pagos_rango(anyo: int, mes: int, offset: int, limite: int,
+                              orden: str | None = None, descendente: bool = False,
+                              consulta: str | None = None):
+    """
+    Página del estado de pago del mes (mismos diccionarios que
+    obtener_estado_pagos_mes) para las listas paginadas.
+    Por defecto en el orden de obtener_estado_pagos_mes (apellido, nombre);
+    'orden' debe ser una de COLUMNAS_ORDEN_ESTADO_PAGO. El cliente_id desempata.
+    consulta: solo los clientes que encajan con ella (ver buscar_clientes);
+    el total lo da contar_clientes(consulta).
+    """
+    if orden is None:
+        orden_sql = "c.apellido, c.nombre, c.cliente_id"
+    elif orden in COLUMNAS_ORDEN_ESTADO_PAGO:
+        sentido = "DESC" if descendente else "ASC"
+        orden_sql = ", ".join(f"{e} {sentido}" for e in COLUMNAS_ORDEN_ESTADO_PAGO[orden])
+        orden_sql += f", c.cliente_id {sentido}"
+    else:
+        raise ValueError(f"No se puede ordenar por {orden}.")
+
+    conn = obtener_conexion()
     if conn is None:
         return []
 
-    resultados = []
+    donde, params = "", []
+    texto = (consulta or "").strip()
+    if texto:
+        # Import diferido: cliente_controller importa este módulo
+        from .cliente_controller import filtro_busqueda_clientes
+        filtro = filtro_busqueda_clientes(conn, texto, "c.cliente_id")
+        if filtro is None:
+            return []
+        donde, params = f"WHERE {filtro[0]}", filtro[1]
+
     try:
-        cursor = conn.cursor()
-        # LEFT JOIN de Cliente a Recibo filtrando por el mes/año especifico en el JOIN
-        # OJO: Para hacer el left join correctamente con filtros en la tabla derecha,
-        # necesitamos mover las condiciones de Recibo al ON o usar subquery.
-        # SQLite soporta condiciones complejas en ON.
-        
-        query = """
-            SELECT 
+        filas = conn.execute(
+            f"""
+            SELECT
                 c.cliente_id, c.nombre, c.apellido, c.dni,
                 r.recibo_id, r.importe, r.estado
             FROM Cliente c
-            LEFT JOIN Recibo r ON c.cliente_id = r.cliente_id 
-                               AND r.periodo_anyo = ? 
+            LEFT JOIN Recibo r ON c.cliente_id = r.cliente_id
+                               AND r.periodo_anyo = ?
                                AND r.periodo_mes = ?
-            ORDER BY c.apellido, c.nombre;
+            {donde}
+            ORDER BY {orden_sql}
+            LIMIT ? OFFSET ?;
+            """,
+            (anyo, mes, *params, limite, offset)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        if not texto:
+            raise
+        return []  # Palabras que el tokenizador deja vacías (ver buscar_clientes)
+    return [_estado_pago(fila) for fila in filas]
+
+
+def iter_estado_pagos_mes(anyo: int, mes: int, tamano_lote: int | None = None,
+                          solo_pendientes: bool = False):
+    """
+    Generador con los mismos diccionarios que obtener_estado_pagos_mes, por lotes.
+    solo_pendientes: solo clientes sin recibo o con el recibo pendiente (morosos).
+    """
+    conn = obtener_conexion()
+    if conn is None:
+        return
+
+    cursor = conn.cursor()
+    # LEFT JOIN de Cliente a Recibo filtrando por el mes/año especifico en el JOIN
+    # OJO: Para hacer el left join correctamente con filtros en la tabla derecha,
+    # necesitamos mover las condiciones de Recibo al ON o usar subquery.
+    # SQLite soporta condiciones complejas en ON.
+    
+    query = """
+        SELECT 
+            c.cliente_id, c.nombre, c.apellido, c.dni,
+            r.recibo_id, r.importe, r.estado
+        FROM Cliente c
+        LEFT JOIN Recibo r ON c.cliente_id = r.cliente_id 
+                           AND r.periodo_anyo = ? 
+                           AND r.periodo_mes = ?
+        {filtro}
+        ORDER BY c.apellido, c.nombre;
+    """.format(filtro="WHERE r.recibo_id IS NULL OR r.estado = 'pendiente'" if solo_pendientes else "")
+    cursor.execute(query, (anyo, mes))
+    for fila in iterar_filas(cursor, tamano_lote):
+        yield _estado_pago(fila)
+
+
+def obtener_morosos_mes(anyo: int, mes: int):
+    """
+    Clientes que deben el mes: sin recibo o con el recibo pendiente.
+    Mismo formato que obtener_estado_pagos_mes.
+    """
+    return list(iter_morosos_mes(anyo, mes))
+
+
+def iter_morosos_mes(anyo: int, mes: int, tamano_lote: int | None = None):
+    """Generador de obtener_morosos_mes, por lotes."""
+    return iter_estado_pagos_mes(anyo, mes, tamano_lote, solo_pendientes=True)
+
+
+def listar_recibos_mes(anyo: int, mes: int):
+    """Devuelve la lista de Recibo emitidos para un mes/año."""
+    return list(iter_recibos_mes(anyo, mes))
+
+
+def listar_recibos_pagina(desde: tuple, hasta: tuple,
+                          despues_de: tuple | None = None, limite: int = 100):
+    """
+    Paginación por clave de los recibos de los periodos desde..hasta, ambos
+    (anyo, mes) e incluidos, en orden (periodo_anyo, periodo_mes, recibo_id).
+    despues_de: (periodo_anyo, periodo_mes, recibo_id) del último recibo de la
+    página anterior, o None para la primera.
+    Devuelve (recibos, clave_siguiente); clave_siguiente es None en la última página.
+    Usa idx_recibo_periodo: el coste no depende de cuántas páginas se han pasado.
+    """
+    if limite < 1:
+        raise ValueError("El tamaño de página debe ser al menos 1.")
+
+    conn = obtener_conexion()
+    if conn is None:
+        return [], None
+
+    # Con clave, el límite inferior lo pone solo la clave (ver listar_sesiones_pagina)
+    if despues_de is None:
+        condicion, params = "(periodo_anyo, periodo_mes) >= (?, ?)", tuple(desde)
+    else:
+        condicion, params = "(periodo_anyo, periodo_mes, recibo_id) > (?, ?, ?)", tuple(despues_de)
+
+    cursor = conn.cursor()
+    cursor.row_factory = Recibo.desde_fila
+    cursor.execute(
+        f"""
+        SELECT recibo_id, cliente_id, periodo_anyo, periodo_mes,
+               fecha_generacion, importe, estado
+        FROM Recibo
+        WHERE {condicion} AND (periodo_anyo, periodo_mes) <= (?, ?)
+        ORDER BY periodo_anyo, periodo_mes, recibo_id
+        LIMIT ?;
+        """,
+        (*params, *hasta, limite + 1)
+    )
+    recibos = cursor.fetchall()
+    if len(recibos) <= limite:
+        return recibos, None
+    del recibos[limite:]
+    ultimo = recibos[-1]
+    return recibos, (ultimo.periodo_anyo, ultimo.periodo_mes, ultimo.recibo_id)
+
+
+def iter_recibos_mes(anyo: int, mes: int, tamano_lote: int | None = None):
+    """Generador de los Recibo de un mes/año (por recibo_id), por lotes."""
+    conn = obtener_conexion()
+    if conn is None:
+        return
+
+    cursor = conn.cursor()
+    cursor.row_factory = Recibo.desde_fila
+    cursor.execute(
         """
-        cursor.execute(query, (anyo, mes))
-        filas = cursor.fetchall()
-        
-        for fila in filas:
-            estado = fila["estado"] if fila["estado"] else "pendiente"
-            importe = fila["importe"] if fila["importe"] is not None else 40.0 # Default sugerido
-            
-            resultados.append({
-                "cliente_id": fila["cliente_id"],
-                "nombre": fila["nombre"],
-                "apellido": fila["apellido"],
-                "dni": fila["dni"],
-                "recibo_id": fila["recibo_id"], # Puede ser None
-                "importe": importe,
-                "estado": estado
-            })
-    finally:
-        conn.close()
-
-    return resultados
-
-
-def exportar_morosos_pdf(anyo: int, mes: int) -> str:
-    """
-    Genera un PDF con la lista de morosos (estado 'pendiente') para el mes indicado.
-    Usa obtener_estado_pagos_mes para determinar quién debe.
+        SELECT recibo_id, cliente_id, periodo_anyo, periodo_mes,
+               fecha_generacion, importe, estado
+        FROM Recibo
+        WHERE periodo_anyo = ? AND periodo_mes = ?
+        ORDER BY recibo_id;
+        """,
+        (anyo, mes)
+    )
+    yield from iterar_filas(cursor, tamano_lote)
+
+
+def obtener_estado_pago_cliente(cliente_id: int, anyo: int, mes: int):
+    """
+    Devuelve el estado de pago de UN cliente para el mes/año dado, con el mismo
+    formato que cada elemento de obtener_estado_pagos_mes, o None si el cliente
+    no existe. Sirve para refrescar una sola fila tras cobrar.
+    """
+    conn = obtener_conexion()
+    if conn is None:
+        return None
+
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT 
+            c.cliente_id, c.nombre, c.apellido, c.dni,
+            r.recibo_id, r.importe, r.estado
+        FROM Cliente c
+        LEFT JOIN Recibo r ON c.cliente_id = r.cliente_id 
+                           AND r.periodo_anyo = ? 
+                           AND r.periodo_mes = ?
+        WHERE c.cliente_id = ?;
+        """,
+        (anyo, mes, cliente_id)
+    )
+    fila = cursor.fetchone()
+    return _estado_pago(fila) if fila is not None else None
+
+
+def _estado_pago(fila) -> dict:
+    estado = fila["estado"] if fila["estado"] else "pendiente"
+    importe = fila["importe"] if fila["importe"] is not None else IMPORTE_SUGERIDO
+
+    return {
+        "cliente_id": fila["cliente_id"],
+        "nombre": fila["nombre"],
+        "apellido": fila["apellido"],
+        "dni": fila["dni"],
+        "recibo_id": fila["recibo_id"], # Puede ser None
+        "importe": importe,
+        "estado": estado
+    }
+
+
+def exportar_morosos_pdf(anyo: int, mes: int, carpeta: str | None = None) -> str:
+    """
+    Genera un PDF con la lista de morosos (estado 'pendiente') para el mes
+    indicado, en carpeta (por defecto el directorio actual).
+    Usa iter_morosos_mes: los morosos se pintan según se leen.
     """
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import A4
     
-    todos = obtener_estado_pagos_mes(anyo, mes)
-    # Filtrar solo 'pendiente'
-    morosos = [c for c in todos if c['estado'] == 'pendiente']
+    morosos = iter_morosos_mes(anyo, mes)
     
     filename = f"morosos_{anyo}_{mes}.pdf"
+    if carpeta is not None:
+        filename = os.path.join(carpeta, filename)
     
     c = canvas.Canvas(filename, pagesize=A4)
     width, height = A4
@@ -135,10 +372,9 @@ def exportar_morosos_pdf(anyo: int, mes: int) -> str:
     y -= 20
     c.setFont("Helvetica", 10)
     
-    if not morosos:
-        c.drawString(50, y, "No hay morosos para este periodo. ¡Todo pagado!")
-    
+    hay_morosos = False
     for m in morosos:
+        hay_morosos = True
         if y < 50:
             c.showPage()
             y = height - 50
@@ -148,23 +384,26 @@ def exportar_morosos_pdf(anyo: int, mes: int) -> str:
         c.drawString(300, y, m['dni'])
         c.drawString(450, y, f"{m['importe']} €")
         y -= 15
+
+    if not hay_morosos:
+        c.drawString(50, y, "No hay morosos para este periodo. ¡Todo pagado!")
         
     c.save()
     return filename
 
 
+@escritura
 def generar_recibo_individual(cliente_id: int, anyo: int, mes: int, importe: float) -> int | None:
     """
     Genera un único recibo para un cliente específico.
     Devuelve el ID del recibo creado, o None si error.
     """
-    from model.conexion import crear_conexion # Ensure import if needed, though usually at top
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return None
 
     try:
-        with conn:
+        with transaccion():
             cursor = conn.cursor()
             fecha_generacion = date.today().isoformat()
             cursor.execute(
@@ -179,32 +418,27 @@ def generar_recibo_individual(cliente_id: int, anyo: int, mes: int, importe: flo
     except Exception as e:
         print(f"Error generando recibo individual: {e}")
         return None
-    finally:
-        conn.close()
 
 
+@escritura
 def marcar_recibo_como_pagado(recibo_id: int):
     """
     Marca un recibo como pagado (solo cambia estado).
     El registro de pago como tal lo hace pago_controller.registrar_pago().
     """
-    from model.conexion import crear_conexion # Ensure import if needed
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                UPDATE Recibo
-                SET estado = 'pagado'
-                WHERE recibo_id = ?;
-                """,
-                (recibo_id,)
-            )
-            return cursor.rowcount > 0
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE Recibo
+            SET estado = 'pagado'
+            WHERE recibo_id = ?;
+            """,
+            (recibo_id,)
+        )
+        return cursor.rowcount > 0
 
@@ -1,11 +1,45 @@
 # controller/sesion_controller.py
 
+import os
+import sqlite3
 from datetime import datetime
-from model.conexion import crear_conexion
+from enum import Enum
+from model.conexion import obtener_conexion, transaccion, al_confirmar, iterar_filas
+from model.cola_escritura import escritura
 from model.sesion import Sesion
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+from .disponibilidad import matriz
+from .aparato_controller import catalogo
 
+# Franjas reservables: 08:00 a 22:00 cada 30 min (la última reserva es a las 22:00)
+SLOTS_RESERVA = tuple(
+    f"{h:02d}:{m:02d}" for h in range(8, 22 + 1) for m in (0, 30) if (h, m) != (22, 30)
+)
+
+# Reintentos de reservar() si otro puesto ocupa el mismo aparato a la vez
+MAX_INTENTOS_RESERVA = 3
+
+
+class EstadoReserva(Enum):
+    RESERVADA = "reservada"
+    SIN_PLAZAS = "sin_plazas"
+    FRANJA_NO_VALIDA = "franja_no_valida"
+    CLIENTE_NO_EXISTE = "cliente_no_existe"
+
+
+class ResultadoReserva:
+    """Resultado de reservar(): estado y, si se reservó, la Sesion creada."""
+
+    def __init__(self, estado: EstadoReserva, sesion=None, mensaje: str = ""):
+        self.estado = estado
+        self.sesion = sesion
+        self.mensaje = mensaje
+
+    @property
+    def ok(self) -> bool:
+        return self.estado is EstadoReserva.RESERVADA
+
+    def __repr__(self):
+        return f"<ResultadoReserva {self.estado.value} {self.sesion!r}>"
 
 
 # ---------- VALIDACIONES DE NEGOCIO ----------
@@ -47,29 +81,30 @@ def hay_sesion_en_slot(aparato_id: int, fecha: str, hora_inicio: str) -> bool:
     """
     Devuelve True si ya existe una sesión para ese aparato, día y hora.
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS total
-            FROM Sesion
-            WHERE aparato_id = ? AND fecha = ? AND hora_inicio = ?;
-            """,
-            (aparato_id, fecha, hora_inicio)
-        )
-        fila = cursor.fetchone()
-        total = fila[0] if fila is not None else 0
-        return total > 0
-    finally:
-        conn.close()
+    if matriz.puede_responder(conn):
+        return matriz.ocupado(conn, aparato_id, fecha, hora_inicio)
+
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT COUNT(*) AS total
+        FROM Sesion
+        WHERE aparato_id = ? AND fecha = ? AND hora_inicio = ?;
+        """,
+        (aparato_id, fecha, hora_inicio)
+    )
+    fila = cursor.fetchone()
+    total = fila[0] if fila is not None else 0
+    return total > 0
 
 
 # ---------- CRUD / OPERACIONES DE SESIONES ----------
 
+@escritura
 def crear_sesion(aparato_id: int, cliente_id: int, fecha: str,
                  hora_inicio: str, created_by: int | None = None):
     """
@@ -87,83 +122,186 @@ def crear_sesion(aparato_id: int, cliente_id: int, fecha: str,
     if hay_sesion_en_slot(aparato_id, fecha, hora_inicio):
         raise ValueError("Ya existe una sesión en ese aparato para ese día y franja.")
 
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         raise RuntimeError("No se pudo conectar a la base de datos.")
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO Sesion (aparato_id, cliente_id, fecha, hora_inicio, duracion, created_by)
-                VALUES (?, ?, ?, ?, 30, ?);
-                """,
-                (aparato_id, cliente_id, fecha, hora_inicio, created_by)
-            )
-            sesion_id = cursor.lastrowid
-
-        return Sesion(sesion_id, aparato_id, cliente_id, fecha, hora_inicio, 30, created_by)
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO Sesion (aparato_id, cliente_id, fecha, hora_inicio, duracion, created_by)
+            VALUES (?, ?, ?, ?, 30, ?);
+            """,
+            (aparato_id, cliente_id, fecha, hora_inicio, created_by)
+        )
+        sesion_id = cursor.lastrowid
+        al_confirmar(lambda: matriz.marcar(aparato_id, fecha, hora_inicio))
 
+    return Sesion(sesion_id, aparato_id, cliente_id, fecha, hora_inicio, 30, created_by)
 
+
+@escritura
 def cancelar_sesion(sesion_id: int) -> bool:
     """
     Elimina una sesión (cancelación).
     Devuelve True si se eliminó alguna fila.
     (Aquí se podría implementar una política de cancelación más compleja).
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return False
 
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM Sesion WHERE sesion_id = ?;", (sesion_id,))
-            return cursor.rowcount > 0
-    finally:
-        conn.close()
+    with transaccion():
+        cursor = conn.cursor()
+        # Se lee antes de borrar para liberar la franja en la matriz de disponibilidad
+        cursor.execute(
+            "SELECT aparato_id, fecha, hora_inicio FROM Sesion WHERE sesion_id = ?;",
+            (sesion_id,)
+        )
+        fila = cursor.fetchone()
+        if fila is None:
+            return False
+
+        cursor.execute("DELETE FROM Sesion WHERE sesion_id = ?;", (sesion_id,))
+        al_confirmar(lambda: matriz.liberar(fila["aparato_id"], fila["fecha"], fila["hora_inicio"]))
+        return cursor.rowcount > 0
+
+
+@escritura
+def reservar(tipo_aparato: str, fecha: str, hora_inicio: str, cliente_id: int,
+             created_by: int | None = None) -> ResultadoReserva:
+    """
+    Reserva el primer aparato libre del tipo indicado en una franja.
+    Elige el aparato e inserta la sesión con una sola sentencia dentro de una
+    transacción BEGIN IMMEDIATE, así dos puestos no pueden quedarse con el
+    mismo aparato. Si aun así salta la UNIQUE (aparato_id, fecha, hora_inicio)
+    se reintenta con el siguiente aparato libre.
+    Solo admite las franjas de SLOTS_RESERVA; si el cliente no existe
+    devuelve CLIENTE_NO_EXISTE.
+    """
+    if not es_fecha_laborable(fecha):
+        return ResultadoReserva(EstadoReserva.FRANJA_NO_VALIDA,
+                                mensaje="La fecha debe ser de lunes a viernes.")
+    if hora_inicio not in SLOTS_RESERVA:
+        return ResultadoReserva(EstadoReserva.FRANJA_NO_VALIDA,
+                                mensaje=f"La hora debe ser una franja de {SLOTS_RESERVA[0]} a {SLOTS_RESERVA[-1]} "
+                                        "(minutos 00 o 30).")
+
+    for _ in range(MAX_INTENTOS_RESERVA):
+        try:
+            with transaccion(inmediata=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1 FROM Cliente WHERE cliente_id = ?;", (cliente_id,))
+                if cursor.fetchone() is None:
+                    return ResultadoReserva(EstadoReserva.CLIENTE_NO_EXISTE,
+                                            mensaje=f"No existe ningún cliente con id {cliente_id}.")
+
+                cursor.execute(
+                    """
+                    INSERT INTO Sesion (aparato_id, cliente_id, fecha, hora_inicio, duracion, created_by)
+                    SELECT a.aparato_id, ?, ?, ?, 30, ?
+                    FROM Aparato a
+                    WHERE a.tipo = ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM Sesion s
+                          WHERE s.aparato_id = a.aparato_id
+                            AND s.fecha = ? AND s.hora_inicio = ?
+                      )
+                    ORDER BY a.aparato_id
+                    LIMIT 1;
+                    """,
+                    (cliente_id, fecha, hora_inicio, created_by, tipo_aparato, fecha, hora_inicio)
+                )
+                if cursor.rowcount == 0:
+                    return ResultadoReserva(EstadoReserva.SIN_PLAZAS,
+                                            mensaje=f"No quedan aparatos de tipo {tipo_aparato} libres a las {hora_inicio}.")
+
+                sesion_id = cursor.lastrowid
+                cursor.execute("SELECT aparato_id FROM Sesion WHERE sesion_id = ?;", (sesion_id,))
+                aparato_id = cursor.fetchone()[0]
+                al_confirmar(lambda: matriz.marcar(aparato_id, fecha, hora_inicio))
+        except sqlite3.IntegrityError as e:
+            if "UNIQUE" not in str(e):
+                raise  # p. ej. created_by no es un usuario (FOREIGN KEY)
+            continue
+
+        sesion = Sesion(sesion_id, aparato_id, cliente_id, fecha, hora_inicio, 30, created_by)
+        return ResultadoReserva(EstadoReserva.RESERVADA, sesion=sesion)
+
+    return ResultadoReserva(EstadoReserva.SIN_PLAZAS,
+                            mensaje="La franja se ha llenado mientras se reservaba.")
 
 
 def listar_sesiones_dia(fecha: str):
     """
     Devuelve una lista de Sesion para una fecha dada.
     """
-    conn = crear_conexion()
-    if conn is None:
-        return []
+    return list(iter_sesiones_dia(fecha))
 
-    sesiones = []
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT *
-            FROM Sesion
-            WHERE fecha = ?
-            ORDER BY aparato_id, hora_inicio;
-            """,
-            (fecha,)
-        )
-        filas = cursor.fetchall()
-        for fila in filas:
-            sesiones.append(
-                Sesion(
-                    sesion_id=fila["sesion_id"],
-                    aparato_id=fila["aparato_id"],
-                    cliente_id=fila["cliente_id"],
-                    fecha=fila["fecha"],
-                    hora_inicio=fila["hora_inicio"],
-                    duracion=fila["duracion"],
-                    created_by=fila["created_by"],
-                )
-            )
-    finally:
-        conn.close()
 
-    return sesiones
+def listar_sesiones_pagina(fecha_desde: str, fecha_hasta: str,
+                           despues_de: tuple | None = None, limite: int = 100):
+    """
+    Paginación por clave de las sesiones entre dos fechas (incluidas), en
+    orden (fecha, hora_inicio, sesion_id).
+    despues_de: (fecha, hora_inicio, sesion_id) de la última sesión de la
+    página anterior, o None para la primera.
+    Devuelve (sesiones, clave_siguiente); clave_siguiente es None en la última página.
+    Usa idx_sesion_fecha_hora: el coste no depende de cuántas páginas se han pasado.
+    """
+    if limite < 1:
+        raise ValueError("El tamaño de página debe ser al menos 1.")
+
+    conn = obtener_conexion()
+    if conn is None:
+        return [], None
+
+    # Con clave, el límite inferior lo pone solo la clave: si se añade también
+    # fecha >= ?, SQLite recorre el índice desde fecha_desde
+    if despues_de is None:
+        condicion, params = "fecha >= ?", (fecha_desde,)
+    else:
+        condicion, params = "(fecha, hora_inicio, sesion_id) > (?, ?, ?)", tuple(despues_de)
+
+    cursor = conn.cursor()
+    cursor.row_factory = Sesion.desde_fila
+    cursor.execute(
+        f"""
+        SELECT sesion_id, aparato_id, cliente_id, fecha, hora_inicio, duracion, created_by
+        FROM Sesion
+        WHERE {condicion} AND fecha <= ?
+        ORDER BY fecha, hora_inicio, sesion_id
+        LIMIT ?;
+        """,
+        (*params, fecha_hasta, limite + 1)
+    )
+    sesiones = cursor.fetchall()
+    if len(sesiones) <= limite:
+        return sesiones, None
+    del sesiones[limite:]
+    ultima = sesiones[-1]
+    return sesiones, (ultima.fecha, ultima.hora_inicio, ultima.sesion_id)
+
+
+def iter_sesiones_dia(fecha: str, tamano_lote: int | None = None):
+    """Generador de las Sesion de una fecha (por aparato y hora), por lotes."""
+    conn = obtener_conexion()
+    if conn is None:
+        return
+
+    cursor = conn.cursor()
+    cursor.row_factory = Sesion.desde_fila
+    cursor.execute(
+        """
+        SELECT sesion_id, aparato_id, cliente_id, fecha, hora_inicio, duracion, created_by
+        FROM Sesion
+        WHERE fecha = ?
+        ORDER BY aparato_id, hora_inicio;
+        """,
+        (fecha,)
+    )
+    yield from iterar_filas(cursor, tamano_lote)
 
 
 def obtener_ocupacion_diaria(fecha: str):
@@ -173,61 +311,63 @@ def obtener_ocupacion_diaria(fecha: str):
     para todas las sesiones de un día dado.
     Esto facilita que la vista pinte la ocupación por aparato.
     """
-    conn = crear_conexion()
+    return list(iter_ocupacion_diaria(fecha))
+
+
+def iter_ocupacion_diaria(fecha: str, tamano_lote: int | None = None):
+    """Generador con los mismos diccionarios que obtener_ocupacion_diaria, por lotes."""
+    conn = obtener_conexion()
     if conn is None:
-        return []
+        return
 
-    resultados = []
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT
-                s.sesion_id,
-                s.aparato_id,
-                a.codigo AS aparato_codigo,
-                a.tipo AS aparato_tipo,
-                s.cliente_id,
-                c.nombre AS cliente_nombre,
-                c.apellido AS cliente_apellido,
-                s.fecha,
-                s.hora_inicio
-            FROM Sesion s
-            JOIN Aparato a ON s.aparato_id = a.aparato_id
-            JOIN Cliente c ON s.cliente_id = c.cliente_id
-            WHERE s.fecha = ?
-            ORDER BY a.tipo, a.codigo, s.hora_inicio;
-            """,
-            (fecha,)
-        )
-        filas = cursor.fetchall()
-        for fila in filas:
-            resultados.append(
-                {
-                    "sesion_id": fila["sesion_id"],
-                    "aparato_id": fila["aparato_id"],
-                    "aparato_codigo": fila["aparato_codigo"],
-                    "aparato_tipo": fila["aparato_tipo"],
-                    "cliente_id": fila["cliente_id"],
-                    "cliente_nombre": fila["cliente_nombre"],
-                    "cliente_apellido": fila["cliente_apellido"],
-                    "fecha": fila["fecha"],
-                    "hora_inicio": fila["hora_inicio"],
-                }
-            )
-    finally:
-        conn.close()
-
-    return resultados
-
-
-def exportar_sesiones_pdf(fecha: str) -> str:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT
+            s.sesion_id,
+            s.aparato_id,
+            a.codigo AS aparato_codigo,
+            a.tipo AS aparato_tipo,
+            s.cliente_id,
+            c.nombre AS cliente_nombre,
+            c.apellido AS cliente_apellido,
+            s.fecha,
+            s.hora_inicio
+        FROM Sesion s
+        JOIN Aparato a ON s.aparato_id = a.aparato_id
+        JOIN Cliente c ON s.cliente_id = c.cliente_id
+        WHERE s.fecha = ?
+        ORDER BY a.tipo, a.codigo, s.hora_inicio;
+        """,
+        (fecha,)
+    )
+    for fila in iterar_filas(cursor, tamano_lote):
+        yield {
+            "sesion_id": fila["sesion_id"],
+            "aparato_id": fila["aparato_id"],
+            "aparato_codigo": fila["aparato_codigo"],
+            "aparato_tipo": fila["aparato_tipo"],
+            "cliente_id": fila["cliente_id"],
+            "cliente_nombre": fila["cliente_nombre"],
+            "cliente_apellido": fila["cliente_apellido"],
+            "fecha": fila["fecha"],
+            "hora_inicio": fila["hora_inicio"],
+        }
+
+
+def exportar_sesiones_pdf(fecha: str, carpeta: str | None = None) -> str:
     """
-    Genera un PDF con el listado de sesiones para la fecha indicada.
+    Genera un PDF con el listado de sesiones para la fecha indicada, en
+    carpeta (por defecto el directorio actual).
     Devuelve el nombre del archivo generado.
     """
-    ocupacion = obtener_ocupacion_diaria(fecha)
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
+    ocupacion = iter_ocupacion_diaria(fecha)  # Se pinta según se lee
     filename = f"sesiones_{fecha}.pdf"
+    if carpeta is not None:
+        filename = os.path.join(carpeta, filename)
 
     c = canvas.Canvas(filename, pagesize=A4)
     width, height = A4
@@ -271,70 +411,65 @@ def obtener_tipos_aparatos() -> list[str]:
     Devuelve una lista de strings con los tipos de aparatos únicos.
     Ej: ['Cinta', 'Bicicleta', 'Pesas']
     """
-    conn = crear_conexion()
-    if conn is None:
-        return []
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT tipo FROM Aparato ORDER BY tipo;")
-        return [fila[0] for fila in cursor.fetchall()]
-    finally:
-        conn.close()
+        return catalogo.tipos()
+    except RuntimeError:
+        return []
 
 
-def obtener_slots_disponibles(fecha: str, tipo_aparato: str) -> list[str]:
+def obtener_slots_disponibles(fecha: str, tipo_aparato):
     """
-    Devuelve lista de horas (HH:MM) disponibles para un tipo de aparato en una fecha.
-    Rango 08:00 a 22:00, intervalos de 30 min.
-    Un slot es disponible si: (sesiones_en_ese_slot_y_tipo < total_aparatos_de_ese_tipo).
+    Devuelve las horas (HH:MM) disponibles para un tipo de aparato en una fecha.
+    Un slot está disponible si: sesiones_en_ese_slot_y_tipo < total_aparatos_de_ese_tipo.
+
+    tipo_aparato puede ser un tipo (devuelve lista de horas) o una lista de
+    tipos (devuelve {tipo: lista de horas}), para que el asistente de reservas
+    cargue todos los tipos de una fecha con una sola llamada.
+    Responde desde la matriz de disponibilidad en memoria; si no puede
+    (p. ej. dentro de una transacción) obtiene la ocupación de todo el día
+    con una única consulta agrupada.
     """
-    if not es_fecha_laborable(fecha):
-        return []
-
-    conn = crear_conexion()
-    if conn is None:
-        return []
-
-    slots_disponibles = []
-    try:
-        cursor = conn.cursor()
-        
-        # 1. Contar total de aparatos del tipo
-        cursor.execute("SELECT COUNT(*) FROM Aparato WHERE tipo = ?", (tipo_aparato,))
-        total_aparatos = cursor.fetchone()[0]
-        
-        if total_aparatos == 0:
-            return []
-
-        # 2. Generar slots teóricos (08:00 a 22:00)
-        # 08:00, 08:30, ..., 22:00
-        slots = []
-        for h in range(8, 22 + 1): # Hasta 22 inclusive
-            slots.append(f"{h:02d}:00")
-            if h < 22: # 22:30 quizás ya no si cierra a las 22:00, asumamos última reserva 22:00
-                slots.append(f"{h:02d}:30")
-        
-        # 3. Verificar cada slot
-        # Podríamos hacer una query agrupadora, pero iterar slots es simple para este volumen.
-        query_ocupacion = """
-            SELECT COUNT(s.sesion_id)
-            FROM Sesion s
-            JOIN Aparato a ON s.aparato_id = a.aparato_id
-            WHERE s.fecha = ? AND s.hora_inicio = ? AND a.tipo = ?
-        """
-        
-        for slot in slots:
-            cursor.execute(query_ocupacion, (fecha, slot, tipo_aparato))
-            ocupacion = cursor.fetchone()[0]
-            
-            if ocupacion < total_aparatos:
-                slots_disponibles.append(slot)
-                
-    finally:
-        conn.close()
-        
-    return slots_disponibles
+    un_tipo = isinstance(tipo_aparato, str)
+    tipos = [tipo_aparato] if un_tipo else list(dict.fromkeys(tipo_aparato))
+
+    disponibles = {tipo: [] for tipo in tipos}
+    if tipos and es_fecha_laborable(fecha):
+        conn = obtener_conexion()
+        if conn is not None and matriz.puede_responder(conn):
+            disponibles.update(matriz.slots_disponibles(conn, fecha, tipos, SLOTS_RESERVA))
+        elif conn is not None:
+            disponibles.update(_calcular_slots_disponibles(conn, fecha, tipos))
+
+    return disponibles[tipo_aparato] if un_tipo else disponibles
+
+
+def _calcular_slots_disponibles(conn, fecha: str, tipos: list[str]) -> dict:
+    """Cruza la rejilla SLOTS_RESERVA con la ocupación del día, por tipo."""
+    marcadores = ", ".join("?" * len(tipos))
+    cursor = conn.cursor()
+
+    # 1. Total de aparatos de cada tipo (catálogo en memoria)
+    total_aparatos = catalogo.total_por_tipo()
+
+    # 2. Ocupación de cada (tipo, slot) del día en una sola consulta
+    cursor.execute(
+        f"""
+        SELECT a.tipo, s.hora_inicio, COUNT(*)
+        FROM Sesion s
+        JOIN Aparato a ON s.aparato_id = a.aparato_id
+        WHERE s.fecha = ? AND a.tipo IN ({marcadores})
+        GROUP BY a.tipo, s.hora_inicio;
+        """,
+        (fecha, *tipos)
+    )
+    ocupacion = {(tipo, hora): n for tipo, hora, n in cursor.fetchall()}
+
+    # 3. Rejilla en memoria
+    return {
+        tipo: [slot for slot in SLOTS_RESERVA
+               if ocupacion.get((tipo, slot), 0) < total_aparatos.get(tipo, 0)]
+        for tipo in tipos
+    }
 
 
 def asignar_aparato_disponible(tipo_aparato: str, fecha: str, hora: str) -> int | None:
@@ -342,27 +477,28 @@ def asignar_aparato_disponible(tipo_aparato: str, fecha: str, hora: str) -> int
     Busca un aparato concreto del tipo especificado que esté libre en esa fecha/hora.
     Devuelve su ID o None si no hay hueco (aunque debería haber si se llamó tras comprobar slots).
     """
-    conn = crear_conexion()
+    conn = obtener_conexion()
     if conn is None:
         return None
-        
-    try:
-        cursor = conn.cursor()
-        # Buscamos IDs de aparatos de ese tipo que NO estén en la lista de ocupados
-        query = """
-            SELECT a.aparato_id
-            FROM Aparato a
-            WHERE a.tipo = ?
-            AND a.aparato_id NOT IN (
-                SELECT s.aparato_id
-                FROM Sesion s
-                WHERE s.fecha = ? AND s.hora_inicio = ?
-            )
-            LIMIT 1;
-        """
-        cursor.execute(query, (tipo_aparato, fecha, hora))
-        fila = cursor.fetchone()
-        return fila[0] if fila else None
-    finally:
-        conn.close()
+
+    if matriz.puede_responder(conn):
+        return matriz.aparato_libre(conn, tipo_aparato, fecha, hora)
+
+    cursor = conn.cursor()
+    # Buscamos IDs de aparatos de ese tipo que NO estén en la lista de ocupados
+    query = """
+        SELECT a.aparato_id
+        FROM Aparato a
+        WHERE a.tipo = ?
+        AND a.aparato_id NOT IN (
+            SELECT s.aparato_id
+            FROM Sesion s
+            WHERE s.fecha = ? AND s.hora_inicio = ?
+        )
+        ORDER BY a.aparato_id
+        LIMIT 1;
+    """
+    cursor.execute(query, (tipo_aparato, fecha, hora))
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
 
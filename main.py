@@ -1,18 +1,97 @@
 # main.py
+import time
 
-from model.conexion import crear_tablas
-from controller.aparato_controller import inicializar_aparatos_por_defecto
-from view.app import App
+# Referencia para el informe de arranque (antes de las importaciones pesadas)
+_INICIO = time.perf_counter()
+
+import json
+import os
+from datetime import datetime
+
+from model.conexion import cerrar_conexiones, informe_configuracion
+from model.migraciones import aplicar_migraciones
+from model import instrumentacion
+from model.cola_escritura import activar_cola_escritura, desactivar_cola_escritura
+from servicio import backend
+
+# La interfaz (customtkinter) y los controladores se importan dentro de main(),
+# después de la primera marca de tiempo, para que el informe de arranque los mida
+
+# Escrituras por la cola con confirmación agrupada (ver model.cola_escritura)
+COLA_ESCRITURA = os.environ.get("GESTIONGYM_COLA_ESCRITURA") == "1"
+
+# Histórico del tiempo de arranque (una línea JSON por arranque; vacío = no guardar)
+RUTA_LOG_ARRANQUE = os.environ.get("GESTIONGYM_LOG_ARRANQUE", "arranque.jsonl")
+
+
+class _Cronometro:
+    """Marcas de tiempo acumuladas desde _INICIO, en ms."""
+
+    def __init__(self):
+        self.marcas = {}
+        self._anterior = _INICIO
+
+    def marcar(self, fase: str):
+        ahora = time.perf_counter()
+        self.marcas[fase] = round((ahora - self._anterior) * 1000, 1)
+        self.marcas["total"] = round((ahora - _INICIO) * 1000, 1)
+        self._anterior = ahora
+
+    def informe(self):
+        print("Arranque (ms):", ", ".join(f"{fase}={ms}" for fase, ms in self.marcas.items()))
+        if not RUTA_LOG_ARRANQUE:
+            return
+        try:
+            with open(RUTA_LOG_ARRANQUE, "a", encoding="utf-8") as f:
+                registro = {"fecha": datetime.now().isoformat(timespec="seconds"), **self.marcas}
+                f.write(json.dumps(registro) + "\n")
+        except OSError as e:
+            print(f"No se pudo guardar el informe de arranque: {e}")
 
 
 def main():
-    # 1. Preparar base de datos
-    crear_tablas()
-    inicializar_aparatos_por_defecto()
+    cronometro = _Cronometro()
+    cronometro.marcar("importaciones")
+
+    # 1. Preparar base de datos (no hace nada si el esquema ya está al día).
+    #    Con GESTIONGYM_SERVIDOR la BD es del servicio: solo se comprueba que responde
+    if backend.remoto():
+        try:
+            salud = backend.servicio().salud()
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return
+        cronometro.marcar("base_datos")
+        print(f"Servicio: {backend.URL_SERVIDOR} (esquema v{salud['version_esquema']})")
+    else:
+        from controller.aparato_controller import inicializar_aparatos_por_defecto
+        aplicar_migraciones()
+        inicializar_aparatos_por_defecto()
+        cronometro.marcar("base_datos")
+        print("Configuración SQLite:", informe_configuracion())
+        if COLA_ESCRITURA:
+            activar_cola_escritura()
 
     # 2. Lanzar app (solo admin, sin login)
-    app = App()
-    app.mainloop()
+    try:
+        from view.app import App
+        cronometro.marcar("interfaz")
+        app = App()
+        cronometro.marcar("ventana")
+
+        def primera_vez_interactiva():
+            # El bucle de eventos ya ha pintado la ventana y atiende al usuario
+            cronometro.marcar("interactiva")
+            cronometro.informe()
+
+        app.after_idle(primera_vez_interactiva)
+        app.mainloop()
+    finally:
+        # 3. Aplicar las escrituras pendientes y cerrar las conexiones persistentes a la BD
+        desactivar_cola_escritura()
+        cerrar_conexiones()
+        if instrumentacion.ACTIVA:
+            instrumentacion.volcar_informe("informe_consultas.json")
 
 
 if __name__ == "__main__":
@@ -6,4 +6,16 @@ from .sesion import Sesion
 from .recibo import Recibo
 from .pago import Pago
 from .usuario import Usuario
-from .conexion import crear_conexion, crear_tablas
+from .conexion import (
+    crear_conexion,
+    obtener_conexion,
+    cerrar_conexion,
+    cerrar_conexiones,
+    crear_tablas,
+    transaccion,
+    en_transaccion,
+    al_confirmar,
+    iterar_filas,
+    configurar,
+    informe_configuracion,
+)
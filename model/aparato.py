@@ -1,6 +1,11 @@
 # model/aparato.py
 
-class Aparato:
+from .registro import Registro
+
+
+class Aparato(Registro):
+    __slots__ = ("aparato_id", "codigo", "tipo", "descripcion")
+
     # Lista de aparatos por defecto para inicializar la BD
     # (codigo, tipo, descripcion)
     APARATOS_POR_DEFECTO = [
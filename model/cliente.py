@@ -1,6 +1,11 @@
 # model/cliente.py
 
-class Cliente:
+from .registro import Registro
+
+
+class Cliente(Registro):
+    __slots__ = ("cliente_id", "dni", "nombre", "apellido", "email", "telefono", "fecha_alta")
+
     def __init__(self, cliente_id, dni, nombre, apellido, email=None, telefono=None, fecha_alta=None):
         self.cliente_id = cliente_id
         self.dni = dni
@@ -0,0 +1,202 @@
+# model/cola_escritura.py
+"""
+Cola de escrituras con confirmación agrupada (group commit).
+
+Sin la cola, cada crear_sesion, reservar, registrar_pago... abre y confirma
+su propia transacción en su hilo: cada escritura paga su COMMIT (y su fsync
+con el perfil 'durable') y, si hay varias a la vez, compiten por el bloqueo
+de escritura de SQLite.
+
+Con la cola activa, las funciones marcadas con @escritura no escriben en el
+hilo que las llama: se encolan y un único hilo escritor las ejecuta por
+lotes. El escritor toma la primera pendiente, espera como mucho
+ESPERA_LOTE_MS a que lleguen más (hasta MAX_LOTE) y las aplica todas en una
+sola transacción BEGIN IMMEDIATE, cada una en su SAVEPOINT: si una falla se
+deshace solo ella y el resto del lote sigue. El llamante recibe el resultado
+(o la excepción) cuando el COMMIT del lote está hecho, y las acciones de
+al_confirmar (matriz de disponibilidad, cachés) se ejecutan entonces.
+
+    activar_cola_escritura()          # p. ej. al arrancar (GESTIONGYM_COLA_ESCRITURA=1)
+    sesion = crear_sesion(...)        # igual que siempre: espera al COMMIT del lote
+    futuro = cola_activa().enviar(crear_sesion, ...)   # o sin esperar
+
+Una llamada que ya está dentro de una transacción (p. ej. crear_cliente
+desde crear_cliente_con_recibo) se ejecuta directamente en ella.
+"""
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from model.conexion import obtener_conexion, transaccion, en_transaccion, cerrar_conexion
+
+# Escrituras como mucho por transacción
+MAX_LOTE = int(os.environ.get("GESTIONGYM_COLA_MAX_LOTE", "64"))
+
+# Tiempo que espera el escritor a que lleguen más escrituras antes de confirmar.
+# Con 0 el lote es lo que se encoló durante el COMMIT anterior; subirlo solo
+# compensa si el fsync del disco es lento (ver benchmarks/bench_escritura.py)
+ESPERA_LOTE_MS = float(os.environ.get("GESTIONGYM_COLA_ESPERA_MS", "0"))
+
+_FIN = object()
+
+
+class ColaEscritura:
+    """Hilo escritor único que aplica las escrituras encoladas por lotes."""
+
+    def __init__(self, max_lote: int = MAX_LOTE, espera_ms: float = ESPERA_LOTE_MS):
+        if max_lote < 1:
+            raise ValueError("El tamaño máximo de lote debe ser al menos 1.")
+        self.max_lote = max_lote
+        self.espera_ms = espera_ms
+        self._pendientes = queue.SimpleQueue()
+        self._cerrada = False
+        self._lock = threading.Lock()
+        self.lotes = 0
+        self.escrituras = 0
+        self.errores = 0
+        self.mayor_lote = 0
+        self._hilo = threading.Thread(target=self._bucle, name="escritor", daemon=True)
+        self._hilo.start()
+
+    # ---------- Uso ----------
+
+    def enviar(self, funcion, *args, **kwargs) -> Future:
+        """Encola funcion(*args, **kwargs). El Future se resuelve tras el COMMIT de su lote."""
+        futuro = Future()
+        with self._lock:
+            if self._cerrada:
+                raise RuntimeError("La cola de escritura está cerrada.")
+            self._pendientes.put((futuro, funcion, args, kwargs))
+        return futuro
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        """Encola y espera el resultado (o relanza la excepción)."""
+        return self.enviar(funcion, *args, **kwargs).result()
+
+    def es_hilo_escritor(self) -> bool:
+        return threading.current_thread() is self._hilo
+
+    def cerrar(self, esperar: bool = True):
+        """Aplica lo ya encolado y para el hilo escritor."""
+        with self._lock:
+            if self._cerrada:
+                return
+            self._cerrada = True
+            self._pendientes.put(_FIN)
+        if esperar and not self.es_hilo_escritor():
+            self._hilo.join()
+
+    def estadisticas(self) -> dict:
+        return {
+            "lotes": self.lotes,
+            "escrituras": self.escrituras,
+            "errores": self.errores,
+            "mayor_lote": self.mayor_lote,
+            "media_lote": round(self.escrituras / self.lotes, 2) if self.lotes else 0.0,
+        }
+
+    # ---------- Hilo escritor ----------
+
+    def _bucle(self):
+        try:
+            while True:
+                lote, fin = self._recoger()
+                if lote:
+                    self._aplicar(lote)
+                if fin:
+                    break
+        finally:
+            cerrar_conexion()
+
+    def _recoger(self) -> tuple[list, bool]:
+        """Espera la primera escritura y junta las que lleguen dentro del plazo."""
+        primera = self._pendientes.get()
+        if primera is _FIN:
+            return [], True
+        lote = [primera]
+        limite = time.monotonic() + self.espera_ms / 1000
+        while len(lote) < self.max_lote:
+            try:
+                # Lo que ya está en cola se toma sin esperar; después, hasta el límite
+                siguiente = self._pendientes.get(timeout=max(limite - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if siguiente is _FIN:
+                return lote, True
+            lote.append(siguiente)
+        return lote, False
+
+    def _aplicar(self, lote: list):
+        lote = [e for e in lote if e[0].set_running_or_notify_cancel()]   # Sin las canceladas
+        resultados = []
+        try:
+            with transaccion(inmediata=True):
+                for futuro, funcion, args, kwargs in lote:
+                    try:
+                        with transaccion():   # SAVEPOINT: un fallo solo deshace esta escritura
+                            valor = funcion(*args, **kwargs)
+                    except Exception as e:
+                        resultados.append((futuro, None, e))
+                    else:
+                        resultados.append((futuro, valor, None))
+        except Exception as e:
+            # BEGIN o COMMIT fallidos: no se ha confirmado nada del lote
+            conn = obtener_conexion()
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            self.errores += len(lote)
+            for futuro, _, _, _ in lote:
+                futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.escrituras += len(resultados)
+        self.mayor_lote = max(self.mayor_lote, len(resultados))
+        for futuro, valor, error in resultados:
+            if error is not None:
+                self.errores += 1
+                futuro.set_exception(error)
+            else:
+                futuro.set_result(valor)
+
+
+# Cola en uso (None = cada escritura se confirma en el hilo que la llama)
+_cola = None
+
+
+def activar_cola_escritura(max_lote: int = MAX_LOTE, espera_ms: float = ESPERA_LOTE_MS) -> ColaEscritura:
+    """Arranca el hilo escritor; desde entonces las funciones @escritura pasan por él."""
+    global _cola
+    if _cola is None:
+        _cola = ColaEscritura(max_lote, espera_ms)
+    return _cola
+
+
+def desactivar_cola_escritura():
+    """Aplica lo pendiente, para el hilo escritor y vuelve a escribir directamente."""
+    global _cola
+    cola, _cola = _cola, None
+    if cola is not None:
+        cola.cerrar()
+
+
+def cola_activa() -> ColaEscritura | None:
+    return _cola
+
+
+def escritura(funcion):
+    """
+    Marca una función de controlador que escribe en la BD: con la cola activa
+    se ejecuta en el hilo escritor, salvo que el llamante ya esté en una
+    transacción (entonces forma parte de ella).
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        cola = _cola
+        if cola is None or cola.es_hilo_escritor() or en_transaccion():
+            return funcion(*args, **kwargs)
+        return cola.ejecutar(funcion, *args, **kwargs)
+    return envoltura
@@ -1,140 +1,347 @@
 # model/conexion.py
+import logging
+import os
 import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
 
-# Ruta al fichero de base de datos (en la raíz del proyecto)
-DB_PATH = Path("gestiongym.db")
+from model.instrumentacion import ConexionInstrumentada
+
+# Ruta al fichero de base de datos (por defecto en la raíz del proyecto).
+# Se puede cambiar con la variable de entorno GESTIONGYM_DB o con configurar().
+# Siempre absoluta: las conexiones que se abren más tarde (otro hilo, la matriz
+# de disponibilidad) apuntan al mismo fichero aunque cambie el directorio actual.
+DB_PATH = Path(os.environ.get("GESTIONGYM_DB", "gestiongym.db")).resolve()
+
+# Perfiles de rendimiento: PRAGMAs que se aplican una vez por conexión.
+#   cache_size negativo = KiB (p. ej. -16000 ≈ 16 MB de caché de páginas)
+#   mmap_size en bytes
+#   busy_timeout en milisegundos (espera si otro proceso tiene el fichero bloqueado)
+# WAL permite que una lectura (p. ej. un PDF) y una escritura (una reserva)
+# no se bloqueen entre sí. Requiere que todos los procesos estén en la misma máquina.
+PERFILES = {
+    "desktop": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "high-throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 15000,
+    },
+}
+
+# Perfil activo (variable de entorno GESTIONGYM_PERFIL o configurar())
+PERFIL = os.environ.get("GESTIONGYM_PERFIL", "desktop")
+
+# Filas que piden a la vez (fetchmany) los iter_* de los controladores
+TAMANO_LOTE = int(os.environ.get("GESTIONGYM_TAMANO_LOTE", "500"))
+
+_log = logging.getLogger(__name__)
+
+
+class _EstadoHilo:
+    """
+    Estado de conexión de un hilo: la conexión persistente, la profundidad
+    de transacción anidada (ver transaccion()) y las funciones pendientes de
+    ejecutar tras el COMMIT, una lista por nivel de anidamiento (ver al_confirmar()).
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.cierre = None
+        self.nivel = 0
+        self.al_confirmar = []
+
+
+# Un _EstadoHilo por hilo. Al terminar el hilo se libera y weakref.finalize
+# cierra su conexión, así que los hilos de vida corta no dejan conexiones abiertas.
+_local = threading.local()
+
+# Estados de los hilos vivos, para cerrar_conexiones()
+_estados = weakref.WeakSet()
+_lock_conexiones = threading.Lock()
+
+# Transacciones con cambios confirmadas por las conexiones de este proceso
+_confirmaciones = 0
+_lock_confirmaciones = threading.Lock()
+
+
+def _estado_hilo() -> _EstadoHilo:
+    estado = getattr(_local, "estado", None)
+    if estado is None:
+        estado = _local.estado = _EstadoHilo()
+        with _lock_conexiones:
+            _estados.add(estado)
+    return estado
 
 
 def crear_conexion():
-    """Crea una conexión a la base de datos."""
+    """
+    Crea una conexión NUEVA a la base de datos.
+    Los controladores no deben usarla directamente: usan obtener_conexion(),
+    que reutiliza la conexión del hilo en lugar de abrir una por operación.
+    """
     conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)  # Usamos sqlite3.connect
+        # check_same_thread=False solo para poder cerrarla desde cerrar_conexiones();
+        # cada conexión se sigue usando únicamente desde el hilo que la creó.
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False,
+                               factory=ConexionInstrumentada)
         conn.row_factory = sqlite3.Row   # Para poder acceder a columnas por nombre
         conn.execute("PRAGMA foreign_keys = ON;")  # Activar claves foráneas
-        print(f"Conexión a SQLite establecida: {DB_PATH}")
+        _aplicar_perfil(conn, PERFIL)
+        _log.debug("Conexión a SQLite establecida: %s (perfil %s)", DB_PATH, PERFIL)
     except sqlite3.Error as e:  # Cambiamos Error por sqlite3.Error
         print(f"Error al conectar a la base de datos: {e}")
     return conn
 
 
-def crear_tablas():
-    """Crea las tablas necesarias en la base de datos (si no existen)."""
-    conn = crear_conexion()
+def _aplicar_perfil(conn, perfil: str):
+    """Aplica los PRAGMAs del perfil indicado a una conexión recién abierta."""
+    if perfil not in PERFILES:
+        raise ValueError(f"Perfil desconocido: {perfil}. Opciones: {', '.join(PERFILES)}")
+
+    for pragma, valor in PERFILES[perfil].items():
+        conn.execute(f"PRAGMA {pragma} = {valor};")
+
+
+def configurar(perfil: str | None = None, db_path=None):
+    """
+    Cambia el perfil de rendimiento y/o la ruta de la base de datos.
+    Cierra las conexiones abiertas para que las nuevas usen la configuración.
+    """
+    global PERFIL, DB_PATH
+
+    if perfil is not None:
+        if perfil not in PERFILES:
+            raise ValueError(f"Perfil desconocido: {perfil}. Opciones: {', '.join(PERFILES)}")
+        PERFIL = perfil
+    if db_path is not None:
+        DB_PATH = Path(db_path).resolve()
+
+    cerrar_conexiones()
+
+
+def informe_configuracion() -> dict:
+    """
+    Devuelve un diccionario con el perfil activo, la ruta de la BD y
+    el valor REAL de cada PRAGMA en la conexión del hilo actual.
+    """
+    informe = {"perfil": PERFIL, "db_path": str(DB_PATH)}
+    conn = obtener_conexion()
     if conn is None:
-        print("No se pudo crear la conexión, no se crean tablas.")
-        return
+        return informe
+
+    for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size",
+                   "temp_store", "busy_timeout", "foreign_keys"):
+        fila = conn.execute(f"PRAGMA {pragma};").fetchone()
+        informe[pragma] = fila[0] if fila is not None else None
+    return informe
+
+
+def obtener_conexion():
+    """
+    Devuelve la conexión persistente del hilo actual, creándola la primera vez.
+    No se debe cerrar tras cada operación: se cierra con cerrar_conexion()
+    o, al salir de la aplicación, con cerrar_conexiones().
+    Devuelve None si no se pudo conectar.
+    """
+    estado = _estado_hilo()
+    if _conexion_vigente(estado) is None:
+        conn = crear_conexion()
+        if conn is not None:
+            # El finalizador no debe referenciar 'estado' o nunca se liberaría
+            estado.cierre = weakref.finalize(estado, _cerrar, conn)
+            estado.conn = conn
+    return estado.conn
+
 
+def _cerrar(conn):
     try:
-        cursor = conn.cursor()
-
-        # Tabla Cliente
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Cliente (
-                cliente_id   INTEGER PRIMARY KEY AUTOINCREMENT,
-                dni          TEXT UNIQUE NOT NULL,
-                nombre       TEXT NOT NULL,
-                apellido     TEXT NOT NULL,
-                email        TEXT,
-                telefono     TEXT,
-                fecha_alta   TEXT NOT NULL
-            );
-            """
-        )
-
-        # Tabla Aparato
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Aparato (
-                aparato_id   INTEGER PRIMARY KEY AUTOINCREMENT,
-                codigo       TEXT UNIQUE,
-                tipo         TEXT NOT NULL,
-                descripcion  TEXT
-            );
-            """
-        )
-
-        # Tabla Usuario (admin)
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Usuario (
-                usuario_id    INTEGER PRIMARY KEY AUTOINCREMENT,
-                username      TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                rol           TEXT NOT NULL CHECK (rol IN ('admin'))
-            );
-            """
-        )
-
-        # Tabla Sesion
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Sesion (
-                sesion_id    INTEGER PRIMARY KEY AUTOINCREMENT,
-                aparato_id   INTEGER NOT NULL,
-                cliente_id   INTEGER NOT NULL,
-                fecha        TEXT NOT NULL,     -- 'YYYY-MM-DD'
-                hora_inicio  TEXT NOT NULL,     -- 'HH:MM'
-                duracion     INTEGER NOT NULL DEFAULT 30,
-                created_by   INTEGER,
-                FOREIGN KEY (aparato_id) REFERENCES Aparato(aparato_id) ON DELETE CASCADE,
-                FOREIGN KEY (cliente_id) REFERENCES Cliente(cliente_id) ON DELETE CASCADE,
-                FOREIGN KEY (created_by) REFERENCES Usuario(usuario_id) ON DELETE SET NULL,
-                UNIQUE (aparato_id, fecha, hora_inicio),
-                CHECK (substr(hora_inicio, 4, 2) IN ('00', '30')),
-                CHECK (CAST(substr(hora_inicio, 1, 2) AS INTEGER) BETWEEN 0 AND 23),
-                CHECK (duracion = 30)
-            );
-            """
-        )
-
-        # Tabla Recibo
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Recibo (
-                recibo_id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                cliente_id       INTEGER NOT NULL,
-                periodo_anyo     INTEGER NOT NULL,
-                periodo_mes      INTEGER NOT NULL, -- 1..12
-                fecha_generacion TEXT NOT NULL,
-                importe          REAL NOT NULL,
-                estado           TEXT NOT NULL CHECK (estado IN ('pendiente', 'pagado')),
-                FOREIGN KEY (cliente_id) REFERENCES Cliente(cliente_id) ON DELETE CASCADE,
-                UNIQUE (cliente_id, periodo_anyo, periodo_mes)
-            );
-            """
-        )
-
-        # Tabla Pago
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS Pago (
-                pago_id     INTEGER PRIMARY KEY AUTOINCREMENT,
-                recibo_id   INTEGER NOT NULL,
-                fecha_pago  TEXT NOT NULL,
-                metodo      TEXT,
-                referencia  TEXT,
-                FOREIGN KEY (recibo_id) REFERENCES Recibo(recibo_id) ON DELETE CASCADE
-            );
-            """
-        )
-
-        # Índices opcionales recomendados
-        cursor.execute(
-            "CREATE UNIQUE INDEX IF NOT EXISTS uq_pago_recibo ON Pago(recibo_id);"
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_sesion_aparato_fecha ON Sesion(aparato_id, fecha, hora_inicio);"
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_recibo_cliente_periodo ON Recibo(cliente_id, periodo_anyo, periodo_mes);"
-        )
-
-        conn.commit()
-        print("Tablas creadas/verificadas correctamente.")
+        conn.close()
     except sqlite3.Error as e:
-        print(f"Error al crear las tablas: {e}")
+        print(f"Error al cerrar conexión: {e}")
+
+
+def cerrar_conexion():
+    """Cierra la conexión persistente del hilo actual (si la hay)."""
+    estado = _estado_hilo()
+    cierre, estado.conn, estado.cierre = estado.cierre, None, None
+    if cierre is not None:
+        cierre()   # Un finalize solo se ejecuta una vez
+
+
+def _conexion_vigente(estado):
+    """La conexión del hilo si sigue abierta (cerrar_conexiones() pudo cerrarla desde otro hilo)."""
+    if estado.cierre is not None and not estado.cierre.alive:
+        estado.conn = estado.cierre = None
+    return estado.conn
+
+
+def cerrar_conexiones():
+    """
+    Cierra todas las conexiones persistentes de todos los hilos.
+    Se llama al cerrar la aplicación (ver main.py).
+    """
+    with _lock_conexiones:
+        cierres = [estado.cierre for estado in _estados if estado.cierre is not None]
+    for cierre in cierres:
+        cierre()   # Cada hilo lo detecta en su próximo obtener_conexion() y reabre
+
+
+@contextmanager
+def transaccion(inmediata: bool = False):
+    """
+    Unidad de trabajo sobre la conexión del hilo actual.
+
+    Todo lo que se ejecute dentro (incluidas llamadas a otros controladores)
+    va en una única transacción y se confirma con un solo COMMIT al salir.
+    Si se produce una excepción se deshace todo.
+
+    Se puede anidar: los niveles internos usan SAVEPOINT, así que un
+    controlador que abre su propia transacción se suma a la del llamante.
+    inmediata=True usa BEGIN IMMEDIATE (toma el bloqueo de escritura al empezar).
+
+        with transaccion():
+            pago = registrar_pago(...)
+            marcar_recibo_como_pagado(...)
+    """
+    conn = obtener_conexion()
+    if conn is None:
+        raise RuntimeError("No se pudo conectar a la base de datos.")
+
+    estado = _estado_hilo()
+    nivel = estado.nivel
+
+    if nivel == 0:
+        conn.execute("BEGIN IMMEDIATE;" if inmediata else "BEGIN;")
+        cambios = conn.total_changes
+    else:
+        conn.execute(f"SAVEPOINT sp_{nivel};")
+
+    estado.nivel = nivel + 1
+    pila = estado.al_confirmar
+    pila.append([])
+    try:
+        yield conn
+    except BaseException:
+        pila.pop()  # Lo registrado en este nivel se descarta con él
+        if nivel == 0:
+            conn.rollback()
+        else:
+            conn.execute(f"ROLLBACK TO sp_{nivel};")
+            conn.execute(f"RELEASE sp_{nivel};")
+        raise
+    else:
+        pendientes = pila.pop()
+        if nivel == 0:
+            conn.commit()
+            if conn.total_changes != cambios:
+                _contar_confirmacion()
+        else:
+            conn.execute(f"RELEASE sp_{nivel};")
+            pila[-1].extend(pendientes)  # Se ejecutarán cuando confirme el nivel exterior
+            pendientes = []
     finally:
-        conn.close()
+        if nivel == 0:
+            estado.nivel = 0
+            estado.al_confirmar = []
+        else:
+            estado.nivel = nivel
+
+    for funcion in pendientes:
+        _ejecutar_al_confirmar(funcion)
+
+
+def _contar_confirmacion():
+    global _confirmaciones
+    with _lock_confirmaciones:
+        _confirmaciones += 1
+
+
+def confirmaciones_propias() -> int:
+    """
+    Número de transacciones con cambios confirmadas por las conexiones de este
+    proceso (con transaccion()). Junto con PRAGMA data_version permite saber si
+    un cambio en la BD vino de otro proceso (ver controller.disponibilidad).
+    """
+    return _confirmaciones
+
+
+def al_confirmar(funcion):
+    """
+    Ejecuta funcion() cuando se confirme la transacción en curso del hilo,
+    después del COMMIT del nivel exterior. Si la transacción (o el SAVEPOINT
+    en el que se registró) se deshace, no se ejecuta.
+    Fuera de una transacción se ejecuta inmediatamente.
+    Sirve para mantener cachés en memoria coherentes con lo confirmado en la BD.
+    """
+    pila = _estado_hilo().al_confirmar
+    if not pila:
+        _ejecutar_al_confirmar(funcion)
+        return
+    pila[-1].append(funcion)
+
+
+def _ejecutar_al_confirmar(funcion):
+    # El COMMIT ya está hecho: un fallo aquí no debe parecer un fallo de la operación
+    try:
+        funcion()
+    except Exception as e:
+        print(f"Error en una acción tras confirmar la transacción: {e}")
+
+
+def iterar_filas(cursor, tamano_lote: int | None = None):
+    """
+    Generador sobre un cursor ya ejecutado: pide las filas en lotes de
+    fetchmany(tamano_lote) en lugar de cargarlas todas con fetchall().
+    Cierra el cursor al terminar o si se deja de iterar (close() / recolección).
+    Mientras no se agota, la conexión mantiene abierta la lectura: conviene
+    consumirlo entero y no intercalar escrituras largas en el mismo hilo.
+    """
+    tamano = tamano_lote or TAMANO_LOTE
+    try:
+        while True:
+            lote = cursor.fetchmany(tamano)
+            if not lote:
+                break
+            yield from lote
+    finally:
+        cursor.close()
+
+
+def en_transaccion() -> bool:
+    """True si el hilo actual está dentro de un bloque transaccion()."""
+    return _estado_hilo().nivel > 0
+
+
+def crear_tablas():
+    """
+    Deja el esquema de la base de datos al día.
+    Se mantiene por compatibilidad: delega en model.migraciones.aplicar_migraciones(),
+    que no hace nada si PRAGMA user_version ya es la versión esperada.
+    """
+    from model.migraciones import aplicar_migraciones  # Import diferido: migraciones importa este módulo
+
+    try:
+        aplicar_migraciones()
+    except RuntimeError as e:
+        print(f"Error al crear las tablas: {e}")
@@ -0,0 +1,282 @@
+# model/instrumentacion.py
+"""
+Instrumentación de las consultas SQL que lanzan los controladores.
+
+Todas las conexiones de model.conexion usan ConexionInstrumentada. Cuando la
+instrumentación está activa se registra, por sentencia (SQL normalizado):
+número de ejecuciones, filas devueltas y latencias (p50/p95/p99/máx). Las
+filas se cuentan tanto con fetchone/fetchmany/fetchall como recorriendo el
+cursor directamente (for fila in conn.execute(...)).
+Las sentencias que superan el umbral se escriben en el log de consultas
+lentas junto con su EXPLAIN QUERY PLAN.
+
+Se activa con la variable de entorno GESTIONGYM_INSTRUMENTACION=1 o con activar().
+Umbral: GESTIONGYM_UMBRAL_LENTA_MS (por defecto 100 ms).
+Log: GESTIONGYM_LOG_LENTAS (por defecto consultas_lentas.log).
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+ACTIVA = os.environ.get("GESTIONGYM_INSTRUMENTACION", "") not in ("", "0")
+UMBRAL_LENTA_MS = float(os.environ.get("GESTIONGYM_UMBRAL_LENTA_MS", "100"))
+RUTA_LOG_LENTAS = os.environ.get("GESTIONGYM_LOG_LENTAS", "consultas_lentas.log")
+
+# Muestras de latencia que se guardan por sentencia para calcular percentiles
+MAX_MUESTRAS = 2000
+
+_estadisticas = {}
+_lock = threading.Lock()
+_espacios = re.compile(r"\s+")
+
+# Sentencias para las que tiene sentido pedir EXPLAIN QUERY PLAN
+_SENTENCIAS_CON_PLAN = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+
+class _Estadistica:
+    """Acumulados de una sentencia SQL."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.ejecuciones = 0
+        self.filas = 0
+        self.tiempo_total = 0.0
+        self.lentas = 0
+        # Cada muestra es una lista [segundos] para poder sumarle el tiempo de fetch
+        self.muestras = deque(maxlen=MAX_MUESTRAS)
+
+
+def activar(umbral_ms: float | None = None, ruta_log: str | None = None):
+    """Activa la instrumentación (opcionalmente cambiando umbral y fichero de log)."""
+    global ACTIVA, UMBRAL_LENTA_MS, RUTA_LOG_LENTAS
+    if umbral_ms is not None:
+        UMBRAL_LENTA_MS = float(umbral_ms)
+    if ruta_log is not None:
+        RUTA_LOG_LENTAS = ruta_log
+    ACTIVA = True
+
+
+def desactivar():
+    """Desactiva la instrumentación (las estadísticas acumuladas se conservan)."""
+    global ACTIVA
+    ACTIVA = False
+
+
+def reiniciar():
+    """Borra todas las estadísticas acumuladas."""
+    with _lock:
+        _estadisticas.clear()
+
+
+def _normalizar(sql: str) -> str:
+    return _espacios.sub(" ", sql).strip()
+
+
+def _percentil(valores_ordenados, p: float) -> float:
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+def informe() -> list[dict]:
+    """
+    Devuelve las estadísticas por sentencia, ordenadas por tiempo total (desc).
+    Tiempos en milisegundos.
+    """
+    with _lock:
+        estadisticas = list(_estadisticas.values())
+        filas = []
+        for e in estadisticas:
+            latencias = sorted(m[0] * 1000 for m in e.muestras)
+            filas.append({
+                "sql": e.sql,
+                "ejecuciones": e.ejecuciones,
+                "filas": e.filas,
+                "total_ms": round(e.tiempo_total * 1000, 3),
+                "p50_ms": round(_percentil(latencias, 50), 3),
+                "p95_ms": round(_percentil(latencias, 95), 3),
+                "p99_ms": round(_percentil(latencias, 99), 3),
+                "max_ms": round(latencias[-1], 3) if latencias else 0.0,
+                "lentas": e.lentas,
+            })
+
+    filas.sort(key=lambda f: f["total_ms"], reverse=True)
+    return filas
+
+
+def volcar_informe(ruta: str | None = None):
+    """
+    Vuelca el informe: a un fichero JSON si se indica ruta, o por pantalla.
+    """
+    datos = informe()
+    if ruta:
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+        print(f"Informe de consultas guardado en {ruta}")
+        return
+
+    print(f"{'n':>7} {'filas':>9} {'total ms':>10} {'p50':>8} {'p95':>8} {'p99':>8}  SQL")
+    for d in datos:
+        print(f"{d['ejecuciones']:>7} {d['filas']:>9} {d['total_ms']:>10.1f} "
+              f"{d['p50_ms']:>8.2f} {d['p95_ms']:>8.2f} {d['p99_ms']:>8.2f}  {d['sql'][:90]}")
+
+
+def _registrar_ejecucion(sql: str, segundos: float):
+    """Registra una ejecución y devuelve (estadística, muestra)."""
+    clave = _normalizar(sql)
+    muestra = [segundos]
+    with _lock:
+        e = _estadisticas.get(clave)
+        if e is None:
+            e = _estadisticas[clave] = _Estadistica(clave)
+        e.ejecuciones += 1
+        e.tiempo_total += segundos
+        e.muestras.append(muestra)
+    return e, muestra
+
+
+def _registrar_fetch(e: _Estadistica, muestra, filas: int, segundos: float):
+    with _lock:
+        e.filas += filas
+        e.tiempo_total += segundos
+        muestra[0] += segundos
+
+
+def _escribir_lenta(conn, e: _Estadistica, sql: str, parametros, segundos: float):
+    """Escribe una consulta lenta en el log, con su plan de ejecución."""
+    with _lock:
+        e.lentas += 1
+
+    plan = []
+    if sql.lstrip().upper().startswith(_SENTENCIAS_CON_PLAN):
+        try:
+            # Cursor normal (no instrumentado) para no registrar el propio EXPLAIN
+            cur = sqlite3.Connection.cursor(conn, sqlite3.Cursor)
+            sqlite3.Cursor.execute(cur, "EXPLAIN QUERY PLAN " + sql, parametros)
+            plan = [fila[-1] for fila in sqlite3.Cursor.fetchall(cur)]
+        except sqlite3.Error as ex:
+            plan = [f"(no disponible: {ex})"]
+
+    try:
+        with open(RUTA_LOG_LENTAS, "a", encoding="utf-8") as f:
+            f.write(f"[{datetime.now().isoformat(timespec='seconds')}] "
+                    f"{segundos * 1000:.1f} ms | {e.sql}\n")
+            if parametros:
+                f.write(f"    parámetros: {parametros!r}\n")
+            for linea in plan:
+                f.write(f"    plan: {linea}\n")
+    except OSError as ex:
+        print(f"No se pudo escribir el log de consultas lentas: {ex}")
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide execute/fetch cuando la instrumentación está activa."""
+
+    _estadistica = None
+    _muestra = None
+    _sql = None
+    _parametros = None
+    _registrada_lenta = False
+
+    def execute(self, sql, parametros=()):
+        if not ACTIVA:
+            self._estadistica = None
+            return super().execute(sql, parametros)
+
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._estadistica, self._muestra = _registrar_ejecucion(sql, segundos)
+            self._sql, self._parametros = sql, parametros
+            self._registrada_lenta = False
+            if self.description is None:
+                # Sentencia sin resultados (INSERT/UPDATE/DELETE): cuenta las filas afectadas
+                _registrar_fetch(self._estadistica, self._muestra, max(self.rowcount, 0), 0.0)
+            self._comprobar_lenta()
+
+    def executemany(self, sql, secuencia_parametros):
+        if not ACTIVA:
+            self._estadistica = None
+            return super().executemany(sql, secuencia_parametros)
+
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, secuencia_parametros)
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._estadistica, self._muestra = _registrar_ejecucion(sql, segundos)
+            self._sql, self._parametros = sql, None
+            self._registrada_lenta = False
+            _registrar_fetch(self._estadistica, self._muestra, max(self.rowcount, 0), 0.0)
+            self._comprobar_lenta()
+
+    def fetchone(self):
+        if self._estadistica is None:
+            return super().fetchone()
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        self._tras_fetch(1 if fila is not None else 0, time.perf_counter() - inicio, fila is None)
+        return fila
+
+    def fetchmany(self, size=None):
+        if self._estadistica is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        tamano = self.arraysize if size is None else size
+        inicio = time.perf_counter()
+        filas = super().fetchmany(tamano)
+        self._tras_fetch(len(filas), time.perf_counter() - inicio, len(filas) < tamano)
+        return filas
+
+    def fetchall(self):
+        if self._estadistica is None:
+            return super().fetchall()
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        self._tras_fetch(len(filas), time.perf_counter() - inicio, True)
+        return filas
+
+    def __next__(self):
+        # Recorrer el cursor directamente (for fila in conn.execute(...)) también cuenta
+        if self._estadistica is None:
+            return super().__next__()
+        inicio = time.perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            self._tras_fetch(0, time.perf_counter() - inicio, True)
+            raise
+        self._tras_fetch(1, time.perf_counter() - inicio, False)
+        return fila
+
+    def _tras_fetch(self, filas: int, segundos: float, agotado: bool):
+        _registrar_fetch(self._estadistica, self._muestra, filas, segundos)
+        if agotado:
+            self._comprobar_lenta()
+
+    def _comprobar_lenta(self):
+        if self._registrada_lenta or self._muestra[0] * 1000 < UMBRAL_LENTA_MS:
+            return
+        self._registrada_lenta = True
+        _escribir_lenta(self.connection, self._estadistica, self._sql,
+                        self._parametros, self._muestra[0])
+
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión cuyos cursores (incluidos los de conn.execute) son CursorInstrumentado."""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia_parametros):
+        return self.cursor().executemany(sql, secuencia_parametros)
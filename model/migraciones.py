@@ -0,0 +1,290 @@
+# model/migraciones.py
+"""
+Migraciones versionadas del esquema de la base de datos.
+
+La versión aplicada se guarda en PRAGMA user_version. Cada migración es
+(version, descripcion, pasos), donde cada paso es una sentencia SQL o una
+función que recibe la conexión (para cambios que no caben en una sentencia,
+p. ej. reconstruir una tabla para cambiar un CHECK).
+Cada migración se aplica en su propia transacción junto con el cambio de versión.
+
+Uso por consola:
+    python -m model.migraciones             # muestra versión y migraciones pendientes
+    python -m model.migraciones --aplicar   # aplica las pendientes
+"""
+import argparse
+import sqlite3
+
+from model import conexion
+
+
+MIGRACIONES = [
+    (1, "Esquema inicial (Cliente, Aparato, Usuario, Sesion, Recibo, Pago)", [
+        # Tabla Cliente
+        """
+        CREATE TABLE IF NOT EXISTS Cliente (
+            cliente_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+            dni          TEXT UNIQUE NOT NULL,
+            nombre       TEXT NOT NULL,
+            apellido     TEXT NOT NULL,
+            email        TEXT,
+            telefono     TEXT,
+            fecha_alta   TEXT NOT NULL
+        );
+        """,
+        # Tabla Aparato
+        """
+        CREATE TABLE IF NOT EXISTS Aparato (
+            aparato_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo       TEXT UNIQUE,
+            tipo         TEXT NOT NULL,
+            descripcion  TEXT
+        );
+        """,
+        # Tabla Usuario (admin)
+        """
+        CREATE TABLE IF NOT EXISTS Usuario (
+            usuario_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+            username      TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            rol           TEXT NOT NULL CHECK (rol IN ('admin'))
+        );
+        """,
+        # Tabla Sesion
+        """
+        CREATE TABLE IF NOT EXISTS Sesion (
+            sesion_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+            aparato_id   INTEGER NOT NULL,
+            cliente_id   INTEGER NOT NULL,
+            fecha        TEXT NOT NULL,     -- 'YYYY-MM-DD'
+            hora_inicio  TEXT NOT NULL,     -- 'HH:MM'
+            duracion     INTEGER NOT NULL DEFAULT 30,
+            created_by   INTEGER,
+            FOREIGN KEY (aparato_id) REFERENCES Aparato(aparato_id) ON DELETE CASCADE,
+            FOREIGN KEY (cliente_id) REFERENCES Cliente(cliente_id) ON DELETE CASCADE,
+            FOREIGN KEY (created_by) REFERENCES Usuario(usuario_id) ON DELETE SET NULL,
+            UNIQUE (aparato_id, fecha, hora_inicio),
+            CHECK (substr(hora_inicio, 4, 2) IN ('00', '30')),
+            CHECK (CAST(substr(hora_inicio, 1, 2) AS INTEGER) BETWEEN 0 AND 23),
+            CHECK (duracion = 30)
+        );
+        """,
+        # Tabla Recibo
+        """
+        CREATE TABLE IF NOT EXISTS Recibo (
+            recibo_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id       INTEGER NOT NULL,
+            periodo_anyo     INTEGER NOT NULL,
+            periodo_mes      INTEGER NOT NULL, -- 1..12
+            fecha_generacion TEXT NOT NULL,
+            importe          REAL NOT NULL,
+            estado           TEXT NOT NULL CHECK (estado IN ('pendiente', 'pagado')),
+            FOREIGN KEY (cliente_id) REFERENCES Cliente(cliente_id) ON DELETE CASCADE,
+            UNIQUE (cliente_id, periodo_anyo, periodo_mes)
+        );
+        """,
+        # Tabla Pago
+        """
+        CREATE TABLE IF NOT EXISTS Pago (
+            pago_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+            recibo_id   INTEGER NOT NULL,
+            fecha_pago  TEXT NOT NULL,
+            metodo      TEXT,
+            referencia  TEXT,
+            FOREIGN KEY (recibo_id) REFERENCES Recibo(recibo_id) ON DELETE CASCADE
+        );
+        """,
+        # Índices opcionales recomendados
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_pago_recibo ON Pago(recibo_id);",
+        "CREATE INDEX IF NOT EXISTS idx_sesion_aparato_fecha ON Sesion(aparato_id, fecha, hora_inicio);",
+        "CREATE INDEX IF NOT EXISTS idx_recibo_cliente_periodo ON Recibo(cliente_id, periodo_anyo, periodo_mes);",
+    ]),
+    (2, "Índice de sesiones por fecha y hora (agenda diaria y slots libres)", [
+        # idx_sesion_aparato_fecha empieza por aparato_id y no sirve para filtrar solo por fecha
+        "CREATE INDEX IF NOT EXISTS idx_sesion_fecha_hora ON Sesion(fecha, hora_inicio);",
+    ]),
+    (3, "Registro de ejecuciones de facturación mensual", [
+        """
+        CREATE TABLE IF NOT EXISTS EjecucionFacturacion (
+            ejecucion_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+            periodo_anyo     INTEGER NOT NULL,
+            periodo_mes      INTEGER NOT NULL,
+            importe          REAL NOT NULL,
+            fecha_ejecucion  TEXT NOT NULL,   -- ISO 'YYYY-MM-DDTHH:MM:SS'
+            creados          INTEGER NOT NULL,
+            omitidos         INTEGER NOT NULL,
+            duracion_ms      REAL NOT NULL
+        );
+        """,
+    ]),
+    (4, "Índice de texto completo de clientes (ClienteFTS, si SQLite tiene FTS5)", [
+        lambda conn: _crear_indice_clientes(conn),
+    ]),
+    (5, "Índices para la paginación por clave de clientes y recibos", [
+        # Cada índice lleva implícito el rowid (cliente_id / recibo_id), que desempata
+        "CREATE INDEX IF NOT EXISTS idx_cliente_apellido_nombre ON Cliente(apellido, nombre);",
+        "CREATE INDEX IF NOT EXISTS idx_recibo_periodo ON Recibo(periodo_anyo, periodo_mes);",
+        # Sesion ya tiene idx_sesion_fecha_hora (fecha, hora_inicio) de la migración 2
+    ]),
+]
+
+# Versión del esquema que espera el código
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+# Aumenta cada vez que este proceso aplica alguna migración: quien guarde
+# datos del esquema (p. ej. si existe ClienteFTS) sabe que debe releerlos
+generacion = 0
+
+
+def fts5_disponible(conn) -> bool:
+    """True si la versión de SQLite enlazada incluye FTS5."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._prueba_fts5 USING fts5(x);")
+        conn.execute("DROP TABLE temp._prueba_fts5;")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _crear_indice_clientes(conn):
+    """
+    Tabla FTS5 de contenido externo sobre Cliente, mantenida por triggers.
+    remove_diacritics: 'garcia' encuentra 'García'. prefix: índices para
+    búsquedas por prefijo de 2 y 3 letras.
+    Sin FTS5 no se crea nada y buscar_clientes usa LIKE.
+    """
+    if not fts5_disponible(conn):
+        print("SQLite sin FTS5: la búsqueda de clientes usará LIKE.")
+        return
+
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS ClienteFTS USING fts5(
+            nombre, apellido, dni, email, telefono,
+            content='Cliente', content_rowid='cliente_id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cliente_fts_ai AFTER INSERT ON Cliente BEGIN
+            INSERT INTO ClienteFTS (rowid, nombre, apellido, dni, email, telefono)
+            VALUES (new.cliente_id, new.nombre, new.apellido, new.dni, new.email, new.telefono);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cliente_fts_ad AFTER DELETE ON Cliente BEGIN
+            INSERT INTO ClienteFTS (ClienteFTS, rowid, nombre, apellido, dni, email, telefono)
+            VALUES ('delete', old.cliente_id, old.nombre, old.apellido, old.dni, old.email, old.telefono);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cliente_fts_au AFTER UPDATE ON Cliente BEGIN
+            INSERT INTO ClienteFTS (ClienteFTS, rowid, nombre, apellido, dni, email, telefono)
+            VALUES ('delete', old.cliente_id, old.nombre, old.apellido, old.dni, old.email, old.telefono);
+            INSERT INTO ClienteFTS (rowid, nombre, apellido, dni, email, telefono)
+            VALUES (new.cliente_id, new.nombre, new.apellido, new.dni, new.email, new.telefono);
+        END;
+        """
+    )
+    # Indexar los clientes que ya existían
+    conn.execute("INSERT INTO ClienteFTS (ClienteFTS) VALUES ('rebuild');")
+
+
+def version_actual(conn) -> int:
+    """Devuelve la versión de esquema guardada en la BD (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migraciones_pendientes(conn=None) -> list:
+    """Devuelve la lista de migraciones (version, descripcion, pasos) sin aplicar."""
+    if conn is None:
+        conn = conexion.obtener_conexion()
+    version = version_actual(conn)
+    return [m for m in MIGRACIONES if m[0] > version]
+
+
+def aplicar_migraciones() -> int:
+    """
+    Aplica en orden las migraciones pendientes.
+    Si la BD ya está en VERSION_ESQUEMA no hace nada más que leer user_version.
+    Devuelve el número de migraciones aplicadas.
+    """
+    global generacion
+    conn = conexion.obtener_conexion()
+    if conn is None:
+        raise RuntimeError("No se pudo conectar a la base de datos.")
+
+    # Camino rápido: esquema al día
+    if version_actual(conn) >= VERSION_ESQUEMA:
+        return 0
+
+    aplicadas = 0
+    for version, descripcion, pasos in MIGRACIONES:
+        # IMMEDIATE: si dos puestos arrancan a la vez, solo uno migra
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            # Se vuelve a comprobar dentro de la transacción (otro proceso pudo migrar antes)
+            if version_actual(conn) >= version:
+                conn.rollback()
+                continue
+
+            for paso in pasos:
+                if callable(paso):
+                    paso(conn)
+                else:
+                    conn.execute(paso)
+            conn.execute(f"PRAGMA user_version = {int(version)};")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise RuntimeError(f"Error en la migración {version} ({descripcion}): {e}") from e
+        except Exception:
+            # Un paso en Python que falla no debe dejar la BD bloqueada
+            conn.rollback()
+            raise
+
+        aplicadas += 1
+        print(f"Migración {version} aplicada: {descripcion}")
+
+    if aplicadas:
+        generacion += 1
+    return aplicadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de GestiónGym")
+    parser.add_argument("--db", help="Ruta del fichero de base de datos")
+    parser.add_argument("--aplicar", action="store_true", help="Aplica las migraciones pendientes")
+    args = parser.parse_args()
+
+    if args.db:
+        conexion.configurar(db_path=args.db)
+
+    try:
+        conn = conexion.obtener_conexion()
+        print(f"Versión actual: {version_actual(conn)} / esperada: {VERSION_ESQUEMA}")
+
+        pendientes = migraciones_pendientes(conn)
+        if not pendientes:
+            print("No hay migraciones pendientes.")
+            return
+
+        print("Migraciones pendientes:")
+        for version, descripcion, _ in pendientes:
+            print(f"  [{version}] {descripcion}")
+
+        if args.aplicar:
+            aplicar_migraciones()
+    finally:
+        conexion.cerrar_conexiones()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 # model/pago.py
 
-class Pago:
+from .registro import Registro
+
+
+class Pago(Registro):
+    __slots__ = ("pago_id", "recibo_id", "fecha_pago", "metodo", "referencia")
+
     def __init__(self, pago_id, recibo_id, fecha_pago, metodo=None, referencia=None):
         self.pago_id = pago_id
         self.recibo_id = recibo_id
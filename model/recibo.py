@@ -1,6 +1,13 @@
 # model/recibo.py
 
-class Recibo:
+from .registro import Registro
+
+
+class Recibo(Registro):
+    __slots__ = (
+        "recibo_id", "cliente_id", "periodo_anyo", "periodo_mes", "fecha_generacion", "importe", "estado",
+    )
+
     def __init__(self, recibo_id, cliente_id, periodo_anyo, periodo_mes,
                  fecha_generacion, importe, estado="pendiente"):
         self.recibo_id = recibo_id
@@ -0,0 +1,31 @@
+# model/registro.py
+"""
+Base de las clases del modelo.
+
+Cada clase declara sus atributos en __slots__ (en el orden de las columnas de
+su tabla), así las instancias no llevan un __dict__ propio y ocupan menos en
+listados grandes. desde_fila tiene la firma de un row_factory de sqlite3, de
+modo que el cursor construye directamente el objeto sin pasar por sqlite3.Row:
+
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.desde_fila
+    cursor.execute("SELECT cliente_id, dni, nombre, ... FROM Cliente;")
+    clientes = cursor.fetchall()   # lista de Cliente
+
+La SELECT debe devolver las columnas en el orden de __slots__.
+"""
+
+
+class Registro:
+    __slots__ = ()
+
+    @classmethod
+    def desde_fila(cls, cursor, fila):
+        """row_factory: construye la instancia a partir de la tupla de la fila."""
+        return cls(*fila)
+
+    def como_tupla(self) -> tuple:
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def como_dict(self) -> dict:
+        return {campo: getattr(self, campo) for campo in self.__slots__}
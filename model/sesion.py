@@ -1,6 +1,13 @@
 # model/sesion.py
 
-class Sesion:
+from .registro import Registro
+
+
+class Sesion(Registro):
+    __slots__ = (
+        "sesion_id", "aparato_id", "cliente_id", "fecha", "hora_inicio", "duracion", "created_by",
+    )
+
     def __init__(self, sesion_id, aparato_id, cliente_id, fecha, hora_inicio,
                  duracion=30, created_by=None):
         self.sesion_id = sesion_id
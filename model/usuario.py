@@ -1,6 +1,11 @@
 # model/usuario.py
 
-class Usuario:
+from .registro import Registro
+
+
+class Usuario(Registro):
+    __slots__ = ("usuario_id", "username", "password_hash", "rol")
+
     def __init__(self, usuario_id, username, password_hash, rol="admin"):
         self.usuario_id = usuario_id
         self.username = username
@@ -0,0 +1 @@
+# servicio/__init__.py
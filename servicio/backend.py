@@ -0,0 +1,40 @@
+# servicio/backend.py
+"""
+Origen de las operaciones que usa la interfaz gráfica.
+
+Sin GESTIONGYM_SERVIDOR, cada nombre es la función del controlador (la App
+abre la BD como siempre). Con GESTIONGYM_SERVIDOR=http://equipo:8765, es una
+función del mismo nombre que llama al servicio (servicio.servidor), que es el
+único que abre la BD. La vista importa de aquí en lugar de los controladores:
+
+    from servicio.backend import listar_aparatos, reservar
+"""
+import os
+
+from .protocolo import OPERACIONES, resolver
+
+URL_SERVIDOR = os.environ.get("GESTIONGYM_SERVIDOR", "").strip()
+TOKEN = os.environ.get("GESTIONGYM_TOKEN") or None
+
+_servicio = None
+if URL_SERVIDOR:
+    from .cliente import ClienteServicio
+    _servicio = ClienteServicio(URL_SERVIDOR, TOKEN)
+
+
+def remoto() -> bool:
+    """True si las operaciones van al servicio y no a la BD local."""
+    return _servicio is not None
+
+
+def servicio():
+    """ClienteServicio en uso (None en modo local)."""
+    return _servicio
+
+
+def __getattr__(nombre: str):
+    if nombre not in OPERACIONES:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    funcion = _servicio.funcion(nombre) if _servicio is not None else resolver(nombre)[0]
+    globals()[nombre] = funcion
+    return funcion
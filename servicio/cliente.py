@@ -0,0 +1,125 @@
+# servicio/cliente.py
+"""
+Cliente del servicio HTTP/JSON (servicio.servidor).
+
+ClienteServicio.llamar("listar_aparatos") hace lo mismo que llamar a la
+función del controlador, pero en el servidor: devuelve los mismos objetos
+del modelo y lanza el mismo tipo de excepción (ValueError, IntegrityError...)
+cuando el servidor la conoce, o RuntimeError si no.
+
+    servicio = ClienteServicio("http://127.0.0.1:8765")
+    reservar = servicio.funcion("reservar")
+    resultado = reservar("Cinta", "2026-03-02", "10:00", cliente_id)
+"""
+import gzip
+import http.client
+import json
+import shutil
+import sqlite3
+import time
+from urllib.parse import urlencode, urlsplit
+
+from .protocolo import CABECERA_TOKEN, a_json, desde_json
+
+# Excepciones que se vuelven a lanzar con su tipo original en el cliente
+_EXCEPCIONES = {
+    "ValueError": ValueError,
+    "TypeError": TypeError,
+    "KeyError": LookupError,
+    "IndexError": LookupError,
+    "LookupError": LookupError,
+    "PermissionError": PermissionError,
+    "IntegrityError": sqlite3.IntegrityError,
+}
+
+
+class ClienteServicio:
+    """Llamadas a las operaciones del servicio (una conexión HTTP por llamada)."""
+
+    def __init__(self, url: str, token: str | None = None, timeout: float = 30.0):
+        partes = urlsplit(url if "://" in url else f"http://{url}")
+        if partes.scheme != "http" or not partes.hostname:
+            raise ValueError(f"URL del servidor no válida: {url}")
+        self.url = f"http://{partes.netloc}"
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.token = token
+        self.timeout = timeout
+
+    def llamar(self, operacion: str, *args, **kwargs):
+        cuerpo = json.dumps({"args": args, "kwargs": kwargs}, default=a_json).encode("utf-8")
+        return self._json("POST", f"/api/{operacion}", cuerpo)
+
+    def funcion(self, operacion: str):
+        """Función con el nombre de la operación que la ejecuta en el servidor."""
+        def remota(*args, **kwargs):
+            return self.llamar(operacion, *args, **kwargs)
+        remota.__name__ = remota.__qualname__ = operacion
+        return remota
+
+    def salud(self) -> dict:
+        return self._json("GET", "/api/salud")
+
+    def exportar(self, nombre: str, ruta: str, formato: str | None = None,
+                 desde: str | None = None, hasta: str | None = None,
+                 comprimir: bool | None = None) -> dict:
+        """
+        Descarga una exportación (ver controller.exportacion.exportar) a un
+        fichero local, sin cargarla en memoria. Devuelve ruta, bytes y duracion_ms.
+        """
+        base = ruta[:-3] if ruta.endswith(".gz") else ruta
+        if formato is None:
+            formato = "jsonl" if base.endswith((".jsonl", ".json")) else "csv"
+        if comprimir is None:
+            comprimir = ruta.endswith(".gz")
+        consulta = urlencode({k: v for k, v in
+                              (("formato", formato), ("desde", desde), ("hasta", hasta)) if v})
+
+        inicio = time.perf_counter()
+        conn, respuesta = self._peticion("GET", f"/api/exportar/{nombre}?{consulta}")
+        try:
+            if respuesta.status != 200:
+                self._lanzar(respuesta.status, respuesta.read())
+            abrir = gzip.open if comprimir else open
+            with abrir(ruta, "wb") as fichero:
+                shutil.copyfileobj(respuesta, fichero, 64 * 1024)
+                total = fichero.tell()
+        finally:
+            conn.close()
+        return {
+            "ruta": ruta,
+            "bytes": total,
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+        }
+
+    # ---------- HTTP ----------
+
+    def _peticion(self, metodo: str, ruta: str, cuerpo: bytes | None = None):
+        cabeceras = {"Content-Type": "application/json"}
+        if self.token:
+            cabeceras[CABECERA_TOKEN] = self.token
+        conn = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+        try:
+            conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+            return conn, conn.getresponse()
+        except OSError as e:
+            conn.close()
+            raise RuntimeError(f"No se pudo conectar con el servidor {self.url}: {e}") from e
+
+    def _json(self, metodo: str, ruta: str, cuerpo: bytes | None = None):
+        conn, respuesta = self._peticion(metodo, ruta, cuerpo)
+        try:
+            datos = respuesta.read()
+        finally:
+            conn.close()
+        if respuesta.status != 200:
+            self._lanzar(respuesta.status, datos)
+        return json.loads(datos, object_hook=desde_json)["resultado"]
+
+    @staticmethod
+    def _lanzar(estado: int, datos: bytes):
+        try:
+            error = json.loads(datos)["error"]
+        except (ValueError, KeyError, TypeError):
+            raise RuntimeError(f"Respuesta no válida del servidor (HTTP {estado}).")
+        raise _EXCEPCIONES.get(error["tipo"], RuntimeError)(error["mensaje"])
@@ -0,0 +1,110 @@
+# servicio/protocolo.py
+"""
+Lo que comparten servidor y cliente: qué operaciones se publican y cómo
+viajan los valores en JSON.
+
+Cada operación es una función pública de un controlador y se llama con
+POST /api/<operacion> y el cuerpo {"args": [...], "kwargs": {...}}. La
+respuesta es {"resultado": ...} o, si falla, {"error": {"tipo", "mensaje"}}.
+
+Los objetos del modelo, los conjuntos y los resultados de reservar() no
+existen en JSON; se envían marcados ({"__modelo__": "Cliente", "campos": {...}},
+{"__conjunto__": [...]}, {"__reserva__": {...}}) y el otro extremo los
+reconstruye. Las tuplas llegan como listas.
+"""
+import importlib
+from enum import Enum
+
+from model import Aparato, Cliente, Pago, Recibo, Sesion
+from model.registro import Registro
+
+# Cabecera con el token compartido (GESTIONGYM_TOKEN), si el servidor lo exige
+CABECERA_TOKEN = "X-GestionGym-Token"
+
+# nombre -> (módulo del controlador, escribe en la BD)
+# No se publican las operaciones que leen o escriben ficheros por ruta
+# (exportar_*_pdf, importar_clientes_csv): la ruta sería del equipo del
+# servicio, no del puesto, y daría acceso a cualquier fichero del servidor
+OPERACIONES = {
+    # Clientes
+    "crear_cliente": ("controller.cliente_controller", True),
+    "crear_cliente_con_recibo": ("controller.cliente_controller", True),
+    "actualizar_cliente": ("controller.cliente_controller", True),
+    "eliminar_cliente": ("controller.cliente_controller", True),
+    "listar_clientes": ("controller.cliente_controller", False),
+    "contar_clientes": ("controller.cliente_controller", False),
+    "listar_clientes_rango": ("controller.cliente_controller", False),
+    "listar_clientes_pagina": ("controller.cliente_controller", False),
+    "buscar_clientes": ("controller.cliente_controller", False),
+    "ids_clientes_coincidentes": ("controller.cliente_controller", False),
+    "obtener_cliente_por_id": ("controller.cliente_controller", False),
+    "obtener_cliente_por_dni": ("controller.cliente_controller", False),
+    # Aparatos
+    "crear_aparato": ("controller.aparato_controller", True),
+    "actualizar_aparato": ("controller.aparato_controller", True),
+    "eliminar_aparato": ("controller.aparato_controller", True),
+    "listar_aparatos": ("controller.aparato_controller", False),
+    "contar_aparatos": ("controller.aparato_controller", False),
+    "listar_aparatos_rango": ("controller.aparato_controller", False),
+    "obtener_aparato_por_id": ("controller.aparato_controller", False),
+    # Sesiones y reservas
+    "reservar": ("controller.sesion_controller", True),
+    "crear_sesion": ("controller.sesion_controller", True),
+    "cancelar_sesion": ("controller.sesion_controller", True),
+    "listar_sesiones_dia": ("controller.sesion_controller", False),
+    "listar_sesiones_pagina": ("controller.sesion_controller", False),
+    "obtener_ocupacion_diaria": ("controller.sesion_controller", False),
+    "obtener_tipos_aparatos": ("controller.sesion_controller", False),
+    "obtener_slots_disponibles": ("controller.sesion_controller", False),
+    # Recibos y cobros
+    "ejecutar_facturacion_mes": ("controller.recibo_controller", True),
+    "generar_recibos_mes": ("controller.recibo_controller", True),
+    "generar_recibo_individual": ("controller.recibo_controller", True),
+    "marcar_recibo_como_pagado": ("controller.recibo_controller", True),
+    "listar_ejecuciones_facturacion": ("controller.recibo_controller", False),
+    "obtener_estado_pagos_mes": ("controller.recibo_controller", False),
+    "listar_estado_pagos_rango": ("controller.recibo_controller", False),
+    "obtener_estado_pago_cliente": ("controller.recibo_controller", False),
+    "obtener_morosos_mes": ("controller.recibo_controller", False),
+    "listar_recibos_mes": ("controller.recibo_controller", False),
+    "listar_recibos_pagina": ("controller.recibo_controller", False),
+    "registrar_pago": ("controller.pago_controller", True),
+    "cobrar_recibo_mes": ("controller.pago_controller", True),
+    "listar_pagos_cliente": ("controller.pago_controller", False),
+}
+
+MODELOS = {clase.__name__: clase for clase in (Aparato, Cliente, Pago, Recibo, Sesion)}
+
+
+def resolver(nombre: str):
+    """Devuelve (función del controlador, escribe) o lanza KeyError si no se publica."""
+    modulo, escribe = OPERACIONES[nombre]
+    return getattr(importlib.import_module(modulo), nombre), escribe
+
+
+def a_json(valor):
+    """'default' de json.dumps para los valores que JSON no conoce."""
+    if isinstance(valor, Registro):
+        return {"__modelo__": type(valor).__name__, "campos": valor.como_dict()}
+    if isinstance(valor, (set, frozenset)):
+        return {"__conjunto__": list(valor)}
+    if isinstance(valor, Enum):
+        return valor.value
+    if type(valor).__name__ == "ResultadoReserva":
+        return {"__reserva__": {"estado": valor.estado.value, "sesion": valor.sesion,
+                                "mensaje": valor.mensaje}}
+    raise TypeError(f"No se puede enviar un {type(valor).__name__} por la API")
+
+
+def desde_json(objeto: dict):
+    """'object_hook' de json.loads: reconstruye lo que marcó a_json."""
+    if "__modelo__" in objeto:
+        return MODELOS[objeto["__modelo__"]](**objeto["campos"])
+    if "__conjunto__" in objeto:
+        return set(objeto["__conjunto__"])
+    if "__reserva__" in objeto:
+        # Import diferido: el cliente no necesita cargar los controladores
+        from controller.sesion_controller import EstadoReserva, ResultadoReserva
+        datos = objeto["__reserva__"]
+        return ResultadoReserva(EstadoReserva(datos["estado"]), datos["sesion"], datos["mensaje"])
+    return objeto
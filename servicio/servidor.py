@@ -0,0 +1,279 @@
+# servicio/servidor.py
+"""
+Servicio HTTP/JSON que es el único que abre la base de datos.
+
+Con varios puestos de recepción sobre el mismo gestiongym.db en una carpeta
+compartida, cada App bloqueaba el fichero por su cuenta. Con el servicio,
+los puestos arrancan con GESTIONGYM_SERVIDOR=http://equipo:8765 (ver
+servicio.backend) y solo este proceso toca SQLite:
+
+- Las lecturas se atienden en un pool de hilos, cada uno con su conexión
+  persistente (model.conexion.obtener_conexion).
+- Las escrituras (las operaciones marcadas en servicio.protocolo) pasan todas
+  por la cola de escritura (model.cola_escritura): un único hilo escritor que
+  las confirma por lotes, así que nunca compiten por el bloqueo de la BD.
+- La caché de clientes, el catálogo de aparatos y la matriz de disponibilidad
+  son de este proceso y se mantienen calientes para todos los puestos.
+
+Rutas:
+    GET  /api/salud                     estado, versión de esquema y operaciones
+    POST /api/<operacion>               {"args": [...], "kwargs": {...}}
+    GET  /api/exportar/<nombre>?desde=&hasta=&formato=csv|jsonl
+                                        exportación (controller.exportacion) en streaming
+
+Si se define GESTIONGYM_TOKEN (o --token), cada petición debe llevarlo en la
+cabecera X-GestionGym-Token. Sin token, escucha solo en 127.0.0.1 salvo que
+se indique otra dirección con --host.
+
+    python -m servicio.servidor --db gestiongym.db [--host 0.0.0.0] [--puerto 8765]
+"""
+import argparse
+import hmac
+import inspect
+import io
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from model import conexion
+from model.cola_escritura import activar_cola_escritura, desactivar_cola_escritura
+from .protocolo import OPERACIONES, CABECERA_TOKEN, resolver, a_json, desde_json
+
+PUERTO_POR_DEFECTO = 8765
+
+# Hilos que atienden peticiones (y conexiones de lectura abiertas)
+HILOS_POR_DEFECTO = 8
+
+# Tamaño máximo del cuerpo de una petición
+MAX_CUERPO = 1024 * 1024
+
+# Errores de la operación que se deben a la petición (400) y no al servidor (500).
+# TypeError no está: el cuerpo mal formado se rechaza en _leer_peticion, los
+# argumentos que no encajan con la función en comprobar_argumentos, y un
+# TypeError dentro del controlador es un fallo del servidor
+_ERRORES_CLIENTE = (ValueError, LookupError, sqlite3.IntegrityError)
+
+
+class ServidorGestionGym(HTTPServer):
+    """HTTPServer que atiende en un pool fijo de hilos y serializa las escrituras."""
+
+    def __init__(self, direccion, hilos: int = HILOS_POR_DEFECTO, token: str | None = None,
+                 registrar: bool = False):
+        super().__init__(direccion, _Manejador)
+        self.token = token
+        self.registrar = registrar
+        # Pool fijo (no un hilo por petición): cada hilo reutiliza su conexión a la BD
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="peticion")
+        self._cola = activar_cola_escritura()
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def comprobar_argumentos(self, nombre: str, args: list, kwargs: dict):
+        """Lanza TypeError si args/kwargs no encajan con la firma de la operación."""
+        funcion, _ = resolver(nombre)
+        try:
+            inspect.signature(funcion).bind(*args, **kwargs)
+        except TypeError as e:
+            raise TypeError(f"{nombre}(): {e}") from None
+
+    def ejecutar(self, nombre: str, args: list, kwargs: dict):
+        """Llama a la operación; las que escriben, en el hilo escritor."""
+        funcion, escribe = resolver(nombre)
+        if escribe:
+            return self._cola.ejecutar(funcion, *args, **kwargs)
+        return funcion(*args, **kwargs)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        desactivar_cola_escritura()
+        conexion.cerrar_conexiones()
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    # HTTP/1.0: una petición por conexión, así ningún hilo del pool queda
+    # esperando a un puesto que mantiene la conexión abierta sin pedir nada
+    protocol_version = "HTTP/1.0"
+    server_version = "GestionGym"
+
+    def log_message(self, formato, *args):
+        if self.server.registrar:
+            super().log_message(formato, *args)
+
+    # ---------- Rutas ----------
+
+    def do_GET(self):
+        if not self._autorizado():
+            return
+        ruta = urlsplit(self.path)
+        if ruta.path == "/api/salud":
+            self._salud()
+        elif ruta.path.startswith("/api/exportar/"):
+            self._exportar(ruta.path[len("/api/exportar/"):], parse_qs(ruta.query))
+        else:
+            self._responder(404, {"error": {"tipo": "NotFound", "mensaje": f"Ruta desconocida: {ruta.path}"}})
+
+    def do_POST(self):
+        if not self._autorizado():
+            return
+        nombre = urlsplit(self.path).path.removeprefix("/api/")
+        if nombre not in OPERACIONES:
+            self._responder(404, {"error": {"tipo": "NotFound", "mensaje": f"Operación desconocida: {nombre}"}})
+            return
+
+        try:
+            args, kwargs = self._leer_peticion()
+        except ValueError as e:
+            self._responder(400, {"error": {"tipo": "ValueError", "mensaje": f"Petición no válida: {e}"}})
+            return
+        try:
+            # Número o nombre de argumentos equivocado: error de la petición, no del servidor
+            self.server.comprobar_argumentos(nombre, args, kwargs)
+        except TypeError as e:
+            self._responder(400, _error(e))
+            return
+
+        try:
+            resultado = self.server.ejecutar(nombre, args, kwargs)
+        except _ERRORES_CLIENTE as e:
+            self._responder(400, _error(e))
+        except Exception as e:
+            self._responder(500, _error(e))
+        else:
+            self._responder(200, {"resultado": resultado})
+
+    # ---------- Auxiliares ----------
+
+    def _autorizado(self) -> bool:
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get(CABECERA_TOKEN, ""), token):
+            self._responder(401, {"error": {"tipo": "PermissionError", "mensaje": "Token no válido."}})
+            return False
+        return True
+
+    def _leer_peticion(self) -> tuple[list, dict]:
+        """(args, kwargs) del cuerpo; ValueError si no tiene la forma de la API."""
+        longitud = int(self.headers.get("Content-Length") or 0)
+        if longitud > MAX_CUERPO:
+            raise ValueError("cuerpo demasiado grande")
+        if not longitud:
+            return [], {}
+        try:
+            peticion = json.loads(self.rfile.read(longitud), object_hook=desde_json)
+        except (LookupError, TypeError) as e:
+            # Marcas de desde_json desconocidas (__modelo__ inexistente) o con campos que no encajan
+            raise ValueError(f"valor marcado no válido ({type(e).__name__}: {e})") from e
+        if not isinstance(peticion, dict):
+            raise ValueError("el cuerpo debe ser un objeto JSON")
+        args = peticion.get("args", [])
+        kwargs = peticion.get("kwargs", {})
+        if not isinstance(args, list):
+            raise ValueError("'args' debe ser una lista")
+        if not isinstance(kwargs, dict):
+            raise ValueError("'kwargs' debe ser un objeto")
+        return args, kwargs
+
+    def _responder(self, estado: int, datos: dict):
+        cuerpo = json.dumps(datos, default=a_json, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _salud(self):
+        from model.migraciones import version_actual
+        conn = conexion.obtener_conexion()
+        self._responder(200, {"resultado": {
+            "ok": conn is not None,
+            "version_esquema": version_actual(conn) if conn is not None else None,
+            "operaciones": sorted(OPERACIONES),
+            "cola_escritura": self.server._cola.estadisticas(),
+        }})
+
+    def _exportar(self, nombre: str, parametros: dict):
+        from controller.exportacion import FORMATOS, iter_exportacion, escribir_filas
+
+        def parametro(clave):
+            return parametros.get(clave, [None])[0]
+
+        formato = parametro("formato") or "csv"
+        try:
+            if formato not in FORMATOS:
+                raise ValueError(f"Formato no válido: {formato} (csv o jsonl)")
+            filas = iter_exportacion(nombre, parametro("desde"), parametro("hasta"))
+            columnas = next(filas)   # Errores de nombre o filtro antes de enviar cabeceras
+        except ValueError as e:
+            self._responder(400, _error(e))
+            return
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8" if formato == "csv"
+                             else "application/x-ndjson; charset=utf-8")
+            self.end_headers()
+            # Sin Content-Length: el final del cuerpo es el cierre de la conexión
+            salida = io.TextIOWrapper(self.wfile, encoding="utf-8", newline="", write_through=False)
+            escribir_filas(salida, formato, columnas, filas)
+            salida.flush()
+            salida.detach()
+        finally:
+            filas.close()
+
+
+def _error(excepcion: Exception) -> dict:
+    return {"error": {"tipo": type(excepcion).__name__, "mensaje": str(excepcion)}}
+
+
+def crear_servidor(host: str = "127.0.0.1", puerto: int = PUERTO_POR_DEFECTO,
+                   hilos: int = HILOS_POR_DEFECTO, token: str | None = None,
+                   registrar: bool = False) -> ServidorGestionGym:
+    """Crea el servidor (puerto 0 = uno libre, útil en pruebas). Se arranca con serve_forever()."""
+    return ServidorGestionGym((host, puerto), hilos, token, registrar)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON de GestiónGym")
+    parser.add_argument("--db", help="ruta de la base de datos (por defecto la de la aplicación)")
+    parser.add_argument("--host", default="127.0.0.1", help="dirección en la que escuchar")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument("--hilos", type=int, default=HILOS_POR_DEFECTO, help="peticiones atendidas a la vez")
+    parser.add_argument("--token", default=os.environ.get("GESTIONGYM_TOKEN"),
+                        help="token que deben enviar los puestos (por defecto GESTIONGYM_TOKEN)")
+    parser.add_argument("--registrar", action="store_true", help="muestra cada petición por consola")
+    args = parser.parse_args(argv)
+
+    if args.host not in ("127.0.0.1", "localhost") and not args.token:
+        print("Aviso: el servicio escucha en la red sin token (GESTIONGYM_TOKEN).")
+
+    from model.migraciones import aplicar_migraciones
+    from controller.aparato_controller import inicializar_aparatos_por_defecto
+    if args.db:
+        conexion.configurar(db_path=args.db)
+    aplicar_migraciones()
+    inicializar_aparatos_por_defecto()
+
+    servidor = crear_servidor(args.host, args.puerto, args.hilos, args.token, args.registrar)
+    print(f"Servicio GestiónGym en http://{args.host}:{servidor.server_address[1]} (Ctrl+C para parar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nParando el servicio...")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,23 @@
 # view/app.py
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import re
 import customtkinter as ctk
-from tkcalendar import DateEntry
-from PIL import Image, ImageTk
-
-from controller.aparato_controller import listar_aparatos
-from controller.cliente_controller import crear_cliente, listar_clientes, obtener_cliente_por_dni
-from controller.sesion_controller import (
-    crear_sesion,
-    listar_sesiones_dia,
-    obtener_ocupacion_diaria,
-    cancelar_sesion,
-    exportar_sesiones_pdf,
-    obtener_tipos_aparatos,
-    obtener_slots_disponibles,
-    asignar_aparato_disponible
-)
-from controller.recibo_controller import (
-    generar_recibo_individual,
-    exportar_morosos_pdf,
-    obtener_estado_pagos_mes
-)
-from controller.pago_controller import registrar_pago
+
+# Las funciones de los controladores (en local o a través del servicio,
+# GESTIONGYM_SERVIDOR) se importan en cada vista al usarlas: así el arranque no
+# carga todos los controladores antes de pintar la ventana
+from servicio.backend import remoto
 from datetime import date
+from functools import partial
+from view.lista_virtual import ListaVirtual, FuenteLista, FuenteConsulta
+from view.tabla_incremental import TablaIncremental
+from view.indice_busqueda import Antirrebote
+from view.tareas import EjecutorTareas, indicador_carga
+
+# Clientes que muestra como mucho el buscador del asistente de reserva
+MAX_RESULTADOS_WIZARD = 200
 
 # Configuración global
 ctk.set_appearance_mode("System")
@@ -41,9 +33,13 @@ class App(ctk.CTk):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
         
-        # --- Configurar Icono Ventana ---
+        # --- Logo (se decodifica una sola vez para el icono y la barra lateral) ---
+        pil_img = None
         try:
-            self.icon_photo = ImageTk.PhotoImage(file="resources/logo.png")
+            from PIL import Image, ImageTk
+            pil_img = Image.open("resources/logo.png")
+            pil_img.load()
+            self.icon_photo = ImageTk.PhotoImage(pil_img)
             self.iconphoto(False, self.icon_photo)
         except Exception as e:
             print(f"No se pudo cargar icono de ventana: {e}")
@@ -55,13 +51,13 @@ class App(ctk.CTk):
 
         # --- Logo Sidebar ---
         self.logo_img = None
-        try:
-            pil_img = Image.open("resources/logo.png")
-            self.logo_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=(100, 100))
-            self.lbl_logo_img = ctk.CTkLabel(self.sidebar_frame, text="", image=self.logo_img)
-            self.lbl_logo_img.grid(row=0, column=0, padx=20, pady=(20, 0))
-        except Exception as e:
-            print(f"Error cargando logo sidebar: {e}")
+        if pil_img is not None:
+            try:
+                self.logo_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=(100, 100))
+                self.lbl_logo_img = ctk.CTkLabel(self.sidebar_frame, text="", image=self.logo_img)
+                self.lbl_logo_img.grid(row=0, column=0, padx=20, pady=(20, 0))
+            except Exception as e:
+                print(f"Error cargando logo sidebar: {e}")
 
         self.lbl_logo = ctk.CTkLabel(self.sidebar_frame, text="GymForTheMoment", 
                                      font=ctk.CTkFont(size=20, weight="bold"))
@@ -101,20 +97,28 @@ class App(ctk.CTk):
         self.main_container.grid_rowconfigure(0, weight=1)
         self.main_container.grid_columnconfigure(0, weight=1)
 
-        # Diccionario de vistas
+        # Consultas en segundo plano (las vistas lo obtienen con winfo_toplevel().tareas)
+        self.tareas = EjecutorTareas(self)
+        self.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+        # Vistas: se construyen (y consultan la BD) la primera vez que se muestran
         self.frames = {}
+        self.clases_vista = {
+            "aparatos": AparatosView,
+            "clientes": ClientesView,
+            "reservas": ReservasView,
+            "cobros": CobrosView,
+        }
         
         # Treeview Style Init
         self.update_treeview_style("System") # Default init
 
-        # Inicializar vistas
-        self.frames["aparatos"] = AparatosView(self.main_container)
-        self.frames["clientes"] = ClientesView(self.main_container)
-        self.frames["reservas"] = ReservasView(self.main_container)
-        self.frames["cobros"] = CobrosView(self.main_container)
-
         self.select_frame("aparatos")
 
+    def cerrar(self):
+        self.tareas.cerrar()
+        self.destroy()
+
     def select_frame(self, name):
         # Reset buttons Style
         buttons = [self.btn_aparatos, self.btn_clientes, self.btn_reservas, self.btn_cobros]
@@ -126,7 +130,9 @@ class App(ctk.CTk):
         if name == "reservas": self.btn_reservas.configure(fg_color=("gray75", "gray25"))
         if name == "cobros": self.btn_cobros.configure(fg_color=("gray75", "gray25"))
 
-        frame = self.frames[name]
+        frame = self.frames.get(name)
+        if frame is None:
+            frame = self.frames[name] = self.clases_vista[name](self.main_container)
         frame.grid(row=0, column=0, sticky="nsew")
         frame.tkraise()
 
@@ -224,29 +230,26 @@ class AparatosView(ctk.CTkFrame):
 
         header = ctk.CTkFrame(self.right_col, fg_color="transparent")
         header.pack(fill="x", padx=20, pady=15)
-        ctk.CTkLabel(header, text="Inventario Actual", font=ctk.CTkFont(size=18, weight="bold")).pack(side="left")
+        self.lbl_titulo = ctk.CTkLabel(header, text="Inventario Actual", font=ctk.CTkFont(size=18, weight="bold"))
+        self.lbl_titulo.pack(side="left")
         ctk.CTkButton(header, text="⟳", width=40, command=self.cargar).pack(side="right")
 
-        # Treeview
-        columns = ("id", "codigo", "tipo", "descripcion")
-        self.tree = ttk.Treeview(self.right_col, columns=columns, show="headings", height=20)
-        
-        self.tree.heading("id", text="ID")
-        self.tree.heading("codigo", text="Código")
-        self.tree.heading("tipo", text="Tipo")
-        self.tree.heading("descripcion", text="Descripción")
-        
-        self.tree.column("id", width=50, anchor="center")
-        self.tree.column("codigo", width=100)
-        self.tree.column("tipo", width=150)
-        self.tree.column("descripcion", width=400)
-        
-        self.tree.pack(fill="both", expand=True, padx=20, pady=(0, 20))
-
+        # Lista (solo se pintan las filas visibles)
+        self.lista = ListaVirtual(
+            self.right_col, ("id", "codigo", "tipo", "descripcion"),
+            encabezados={"id": "ID", "codigo": "Código", "tipo": "Tipo", "descripcion": "Descripción"},
+            anchos={"id": 50, "codigo": 100, "tipo": 150, "descripcion": 400},
+            alineaciones={"id": "center"},
+            tareas=self.winfo_toplevel().tareas,
+        )
+        self.lista.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+
+        self.tareas = self.winfo_toplevel().tareas
+        self.cargando = indicador_carga(self.lbl_titulo)
         self.cargar()
 
     def add_aparato(self):
-        from controller.aparato_controller import crear_aparato # Late import to avoid circular if any
+        from servicio.backend import crear_aparato
         
         c = self.ent_codigo.get().strip()
         t = self.ent_tipo.get().strip()
@@ -256,19 +259,20 @@ class AparatosView(ctk.CTkFrame):
             messagebox.showerror("Error", "Todos los campos (Código, Tipo, Descripción) son obligatorios.")
             return
 
-        try:
-            crear_aparato(c, t, d)
-            messagebox.showinfo("Éxito", "Aparato añadido correctamente")
-            self.ent_codigo.delete(0, 'end')
-            self.ent_tipo.delete(0, 'end')
-            self.ent_desc.delete(0, 'end')
-            self.cargar()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        if self.tareas.ocupado("alta_aparato"):
+            return
+        self.tareas.ejecutar("alta_aparato", crear_aparato, c, t, d, al_terminar=self.aparato_creado)
+
+    def aparato_creado(self, _aparato):
+        messagebox.showinfo("Éxito", "Aparato añadido correctamente")
+        self.ent_codigo.delete(0, 'end')
+        self.ent_tipo.delete(0, 'end')
+        self.ent_desc.delete(0, 'end')
+        self.cargar()
 
     def del_aparato(self):
-        from controller.aparato_controller import eliminar_aparato
-        sel = self.tree.selection()
+        from servicio.backend import eliminar_aparato
+        sel = self.lista.valores_seleccionados()
         if not sel:
             messagebox.showwarning("Selección", "Selecciona un aparato de la lista.")
             return
@@ -276,19 +280,29 @@ class AparatosView(ctk.CTkFrame):
         if not messagebox.askyesno("Confirmar", "¿Eliminar aparato seleccionado? Esto borrará sus sesiones."):
             return
 
-        try:
-            item = self.tree.item(sel[0])
-            id_aparato = item['values'][0]
-            eliminar_aparato(id_aparato)
-            self.cargar()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.tareas.ejecutar("baja_aparato", eliminar_aparato, sel[0], al_terminar=lambda _: self.cargar())
 
     def cargar(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        for a in listar_aparatos():
-            self.tree.insert("", "end", values=(a.aparato_id, a.codigo, a.tipo, a.descripcion))
+        from servicio.backend import contar_aparatos
+        # Como en ClientesView: el total y la página visible en segundo plano
+        inicio, visibles = self.lista.ventana()
+        orden = self.lista.orden_actual()
+
+        def preparar():
+            fuente = FuenteConsulta(contar_aparatos, self.pagina_aparatos)
+            if orden[0] is not None:
+                fuente.ordenar(*orden)
+            fuente.rango(inicio, visibles)
+            return fuente
+
+        self.tareas.ejecutar("aparatos", preparar, cargando=self.cargando,
+                             al_terminar=lambda f: self.lista.cambiar_fuente(f, conservar_posicion=True))
+
+    def pagina_aparatos(self, offset, limite, orden, descendente):
+        from servicio.backend import listar_aparatos_rango
+        columna = {"id": "aparato_id"}.get(orden, orden)
+        return [(a.aparato_id, (a.aparato_id, a.codigo, a.tipo, a.descripcion))
+                for a in listar_aparatos_rango(offset, limite, columna, descendente)]
 
 
 class ClientesView(ctk.CTkFrame):
@@ -327,7 +341,8 @@ class ClientesView(ctk.CTkFrame):
         self.entry_tel.grid(row=3, column=1, padx=5, pady=(0, 10), sticky="ew")
 
         ctk.CTkLabel(frame_grid, text="Fecha Alta").grid(row=2, column=2, padx=5, pady=2, sticky="w")
-        # CALENDARIO MÁS GRANDE
+        # CALENDARIO MÁS GRANDE (tkcalendar se importa al construir la vista)
+        from tkcalendar import DateEntry
         self.entry_fecha = DateEntry(frame_grid, width=12, background='darkblue', 
                                      foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd',
                                      font=("Roboto", 12)) 
@@ -342,15 +357,22 @@ class ClientesView(ctk.CTkFrame):
 
         header_frame = ctk.CTkFrame(self.card_list, fg_color="transparent")
         header_frame.pack(fill="x", padx=20, pady=10)
-        ctk.CTkLabel(header_frame, text="Directorio de Clientes", font=ctk.CTkFont(size=18, weight="bold")).pack(side="left")
+        self.lbl_titulo = ctk.CTkLabel(header_frame, text="Directorio de Clientes", font=ctk.CTkFont(size=18, weight="bold"))
+        self.lbl_titulo.pack(side="left")
         
         btn_refresh = ctk.CTkButton(header_frame, text="⟳", width=40, command=self.load_clientes)
         btn_refresh.pack(side="right")
+        btn_importar = ctk.CTkButton(header_frame, text="Importar CSV", width=110, command=self.importar_csv,
+                                     state="disabled" if remoto() else "normal")
+        btn_importar.pack(side="right", padx=10)
 
+        # Los clientes se piden por páginas al controlador según se desplaza la lista
         cols = ("id", "dni", "nombre", "apellido", "email", "telefono", "fecha")
-        self.tree = ttk.Treeview(self.card_list, columns=cols, show="headings", height=10)
-        for c in cols: self.tree.heading(c, text=c.capitalize())
-        self.tree.pack(fill="both", expand=True, padx=20, pady=10)
+        self.lista = ListaVirtual(self.card_list, cols, tareas=self.winfo_toplevel().tareas)
+        self.lista.pack(fill="both", expand=True, padx=20, pady=10)
+
+        self.tareas = self.winfo_toplevel().tareas
+        self.cargando = indicador_carga(self.lbl_titulo)
         self.load_clientes()
 
     def add_cliente(self):
@@ -362,11 +384,7 @@ class ClientesView(ctk.CTkFrame):
         fecha = self.entry_fecha.get_date().strftime("%Y-%m-%d")
 
         # --- VALIDACIONES ---
-        # 0. DNI Duplicado
-        if obtener_cliente_por_dni(dni):
-            messagebox.showwarning("Cliente ya registrado", f"El cliente con DNI {dni} ya existe en la base de datos.")
-            return
-
+        # (el DNI duplicado se comprueba al dar el alta, en segundo plano)
         # 1. DNI: 8 números + 1 letra
         if not re.match(r"^\d{8}[A-Za-z]$", dni):
             messagebox.showerror("Error de Validación", "El DNI debe tener 8 números seguidos de una letra (Ej: 12345678X).")
@@ -390,27 +408,94 @@ class ClientesView(ctk.CTkFrame):
             messagebox.showerror("Error de Validación", "El Teléfono solo debe contener números.")
             return
 
-        try:
-            cli = crear_cliente(dni, nombre, apellido, email, tel, fecha)
-            
-            # Generar primer recibo (mes actual)
-            hoy = date.today()
-            generar_recibo_individual(cli.cliente_id, hoy.year, hoy.month, 30.0)
-            
-            messagebox.showinfo("Éxito", f"Cliente creado y recibo generado para {hoy.month}/{hoy.year}.")
-            self.load_clientes()
-            self.entry_dni.delete(0, 'end')
-            self.entry_nombre.delete(0, 'end')
-            self.entry_apellido.delete(0, 'end')
-            self.entry_email.delete(0, 'end')
-            self.entry_tel.delete(0, 'end')
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        if self.tareas.ocupado("alta_cliente"):
+            return
+        hoy = date.today()
+        self.tareas.ejecutar("alta_cliente", self.dar_alta, dni, nombre, apellido, email, tel, fecha, hoy,
+                             al_terminar=lambda creado: self.alta_terminada(creado, dni, hoy))
+
+    @staticmethod
+    def dar_alta(dni, nombre, apellido, email, tel, fecha, hoy):
+        """En segundo plano: False si el DNI ya existe; si no, alta + primer recibo (mes actual)."""
+        from servicio.backend import crear_cliente_con_recibo, obtener_cliente_por_dni
+        if obtener_cliente_por_dni(dni):
+            return False
+        crear_cliente_con_recibo(dni, nombre, apellido, email, tel, fecha,
+                                 hoy.year, hoy.month, 30.0)
+        return True
+
+    def alta_terminada(self, creado, dni, hoy):
+        if not creado:
+            messagebox.showwarning("Cliente ya registrado", f"El cliente con DNI {dni} ya existe en la base de datos.")
+            return
+        messagebox.showinfo("Éxito", f"Cliente creado y recibo generado para {hoy.month}/{hoy.year}.")
+        self.load_clientes()
+        self.entry_dni.delete(0, 'end')
+        self.entry_nombre.delete(0, 'end')
+        self.entry_apellido.delete(0, 'end')
+        self.entry_email.delete(0, 'end')
+        self.entry_tel.delete(0, 'end')
+
+    def importar_csv(self):
+        # Lee el fichero en este equipo: siempre el controlador local (ver servicio.protocolo)
+        from controller.importacion_clientes import importar_clientes_csv
+        ruta = filedialog.askopenfilename(
+            title="Importar clientes",
+            filetypes=[("CSV", "*.csv"), ("Todos los ficheros", "*.*")],
+        )
+        if not ruta:
+            return
+        # Miles de filas: se importa en segundo plano y se recarga la lista al terminar
+        self.tareas.ejecutar("importar_clientes", importar_clientes_csv, ruta,
+                             al_terminar=self.importacion_terminada,
+                             cargando=indicador_carga(self.lbl_titulo, "Importando clientes..."))
+
+    def importacion_terminada(self, resumen):
+        texto = (f"{resumen['importados']} clientes importados de {resumen['leidas']} filas.\n"
+                 f"Recibos generados: {resumen['recibos']}.")
+        if resumen["rechazados"]:
+            texto += (f"\n\n{resumen['rechazados']} filas rechazadas. "
+                      f"Motivos en:\n{resumen['ruta_rechazos']}")
+            messagebox.showwarning("Importación", texto)
+        else:
+            messagebox.showinfo("Importación", texto)
+        self.load_clientes()
 
     def load_clientes(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        for c in listar_clientes():
-            self.tree.insert("", "end", values=(c.cliente_id, c.dni, c.nombre, c.apellido, c.email, c.telefono, c.fecha_alta))
+        from servicio.backend import contar_clientes
+        # El total y la página visible se leen en segundo plano; el resto de
+        # páginas se piden al desplazarse
+        inicio, visibles = self.lista.ventana()
+        orden = self.lista.orden_actual()
+
+        def preparar():
+            fuente = FuenteConsulta(contar_clientes, self.pagina_clientes,
+                                    obtener_siguientes=self.siguientes_clientes)
+            if orden[0] is not None:
+                fuente.ordenar(*orden)
+            fuente.rango(inicio, visibles)
+            return fuente
+
+        self.tareas.ejecutar("clientes", preparar, cargando=self.cargando,
+                             al_terminar=lambda f: self.lista.cambiar_fuente(f, conservar_posicion=True))
+
+    def pagina_clientes(self, offset, limite, orden, descendente):
+        from servicio.backend import listar_clientes_rango
+        columna = {"id": "cliente_id", "fecha": "fecha_alta"}.get(orden, orden)
+        return [self.fila_cliente(c) for c in listar_clientes_rango(offset, limite, columna, descendente)]
+
+    def siguientes_clientes(self, ultima, limite, orden, descendente):
+        from servicio.backend import listar_clientes_pagina
+        # Solo el orden por defecto (apellido, nombre, id) tiene paginación por clave
+        if orden is not None:
+            return None
+        cliente_id, valores = ultima
+        clientes, _ = listar_clientes_pagina((valores[3], valores[2], cliente_id), limite)
+        return [self.fila_cliente(c) for c in clientes]
+
+    @staticmethod
+    def fila_cliente(c):
+        return (c.cliente_id, (c.cliente_id, c.dni, c.nombre, c.apellido, c.email, c.telefono, c.fecha_alta))
 
 
 class ReservasView(ctk.CTkFrame):
@@ -448,13 +533,15 @@ class ReservasView(ctk.CTkFrame):
         top_bar.pack(fill="x", padx=20, pady=20)
         
         ctk.CTkLabel(top_bar, text="Agenda del Día:").pack(side="left", padx=5)
+        from tkcalendar import DateEntry
         self.filter_date = DateEntry(top_bar, width=12, background='darkblue', 
                                      foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd',
                                      font=("Roboto", 12))
         self.filter_date.pack(side="left", padx=5)
         
         ctk.CTkButton(top_bar, text="Buscar", width=60, command=self.load_sesiones).pack(side="left", padx=5)
-        ctk.CTkButton(top_bar, text="Exportar PDF", width=100, fg_color="green", command=self.export_pdf).pack(side="right")
+        ctk.CTkButton(top_bar, text="Exportar PDF", width=100, fg_color="green", command=self.export_pdf,
+                      state="disabled" if remoto() else "normal").pack(side="right")
 
         # Treeview
         cols = ("id", "hora", "aparato", "cliente")
@@ -466,22 +553,28 @@ class ReservasView(ctk.CTkFrame):
         self.tree.column("id", width=40, anchor="center")
         self.tree.column("hora", width=60, anchor="center")
         self.tree.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        self.tabla = TablaIncremental(self.tree)  # Solo repinta las sesiones que cambian
 
         # Texto detalle
         self.txt_detail = ctk.CTkTextbox(self.right_col, height=100)
         self.txt_detail.pack(fill="x", padx=20, pady=10)
 
         # Cargar sesiones del día al iniciar
+        self.tareas = self.winfo_toplevel().tareas
         self.load_sesiones()
 
     def load_sesiones(self):
+        from servicio.backend import obtener_ocupacion_diaria
         date = self.filter_date.get_date().strftime("%Y-%m-%d")
-        for i in self.tree.get_children(): self.tree.delete(i)
-        
-        ocupacion = obtener_ocupacion_diaria(date)
-        
-        for o in ocupacion:
-            self.tree.insert("", "end", values=(o['sesion_id'], o['hora_inicio'], f"{o['aparato_codigo']} ({o['aparato_tipo']})", f"{o['cliente_id']} - {o['cliente_nombre']}"))
+        self.txt_detail.delete("1.0", "end")
+        self.txt_detail.insert("end", "Cargando...")
+        self.tareas.ejecutar("sesiones", obtener_ocupacion_diaria, date, al_terminar=self.pintar_sesiones)
+
+    def pintar_sesiones(self, ocupacion):
+        self.tabla.actualizar(
+            (o['sesion_id'], (o['sesion_id'], o['hora_inicio'], f"{o['aparato_codigo']} ({o['aparato_tipo']})", f"{o['cliente_id']} - {o['cliente_nombre']}"))
+            for o in ocupacion
+        )
             
         self.txt_detail.delete("1.0", "end")
         if not ocupacion:
@@ -490,18 +583,26 @@ class ReservasView(ctk.CTkFrame):
             self.txt_detail.insert("end", f"Total sesiones: {len(ocupacion)}")
 
     def cancel_reserva(self):
-        if cancelar_sesion(int(self.ent_cancel_id.get() or 0)):
+        from servicio.backend import cancelar_sesion
+        try:
+            sesion_id = int(self.ent_cancel_id.get())
+        except ValueError:
+            messagebox.showerror("Error", "El ID de sesión debe ser un número.")
+            return
+        self.tareas.ejecutar("cancelar_sesion", cancelar_sesion, sesion_id, al_terminar=self.cancelacion_terminada)
+
+    def cancelacion_terminada(self, cancelada):
+        if cancelada:
             messagebox.showinfo("Éxito", "Sesión cancelada")
             self.load_sesiones()
         else:
             messagebox.showerror("Error", "No se encontró la sesión")
 
     def export_pdf(self):
-        try:
-            date = self.filter_date.get_date().strftime("%Y-%m-%d")
-            f = exportar_sesiones_pdf(date)
-            messagebox.showinfo("PDF", f"Archivo generado: {f}")
-        except Exception as e: messagebox.showerror("Error", str(e))
+        from controller.sesion_controller import exportar_sesiones_pdf  # Fichero local: solo en modo local
+        date = self.filter_date.get_date().strftime("%Y-%m-%d")
+        self.tareas.ejecutar("pdf_sesiones", exportar_sesiones_pdf, date,
+                             al_terminar=lambda f: messagebox.showinfo("PDF", f"Archivo generado: {f}"))
 
     # --- WIZARD POPUPS ---
 
@@ -512,53 +613,49 @@ class ReservasView(ctk.CTkFrame):
         self.win_step1.geometry("500x400")
         self.win_step1.grab_set()
 
-        ctk.CTkLabel(self.win_step1, text="Buscar Cliente", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=(20, 10))
+        lbl_buscar = ctk.CTkLabel(self.win_step1, text="Buscar Cliente", font=ctk.CTkFont(size=16, weight="bold"))
+        lbl_buscar.pack(pady=(20, 10))
 
         # Buscador
         self.ent_search = ctk.CTkEntry(self.win_step1, placeholder_text="Escribe nombre o DNI...", width=300)
         self.ent_search.pack(pady=5)
-        self.ent_search.bind("<KeyRelease>", self.filtrar_clientes)
+        # Se filtra al dejar de teclear, no en cada pulsación
+        self.ent_search.bind("<KeyRelease>", Antirrebote(self.win_step1, 150, self.filtrar_clientes))
 
         # Lista Resultados
-        cols = ("id", "nombre", "dni")
-        self.tree_clients = ttk.Treeview(self.win_step1, columns=cols, show="headings", height=10)
-        self.tree_clients.heading("id", text="ID")
-        self.tree_clients.heading("nombre", text="Nombre")
-        self.tree_clients.heading("dni", text="DNI")
-        self.tree_clients.column("id", width=50, anchor="center")
-        self.tree_clients.column("nombre", width=200)
-        self.tree_clients.column("dni", width=100)
-        self.tree_clients.pack(pady=10, padx=20, fill="both", expand=True)
+        self.lista_clients = ListaVirtual(
+            self.win_step1, ("id", "nombre", "dni"),
+            encabezados={"id": "ID", "nombre": "Nombre", "dni": "DNI"},
+            anchos={"id": 50, "nombre": 200, "dni": 100},
+            alineaciones={"id": "center"},
+        )
+        self.lista_clients.pack(pady=10, padx=20, fill="both", expand=True)
 
         ctk.CTkButton(self.win_step1, text="Siguiente >>", command=self.ir_paso_2).pack(pady=20)
         
-        # Cargar todos inicial
-        self.todos_clientes = []
-        try:
-            self.todos_clientes = listar_clientes()
-            self.filtrar_clientes()
-        except: pass
+        # Primeros clientes al abrir; después, cada búsqueda consulta el índice de texto completo
+        self.cargando_wiz = indicador_carga(lbl_buscar, "Buscando...")
+        self.filtrar_clientes()
 
     def filtrar_clientes(self, event=None):
-        query = self.ent_search.get().lower()
-        
-        for item in self.tree_clients.get_children():
-            self.tree_clients.delete(item)
-            
-        for c in self.todos_clientes:
-            full_str = f"{c.nombre} {c.apellido} {c.dni}".lower()
-            if query in full_str:
-                self.tree_clients.insert("", "end", values=(c.cliente_id, f"{c.apellido}, {c.nombre}", c.dni))
+        from servicio.backend import buscar_clientes
+        if not self.win_step1.winfo_exists():
+            return
+        self.tareas.ejecutar("wizard_clientes", buscar_clientes, self.ent_search.get(), MAX_RESULTADOS_WIZARD,
+                             al_terminar=self.pintar_clientes_wiz, cargando=self.cargando_wiz)
+
+    def pintar_clientes_wiz(self, clientes):
+        if not self.win_step1.winfo_exists():
+            return
+        filas = [(c.cliente_id, f"{c.apellido}, {c.nombre}", c.dni) for c in clientes]
+        self.lista_clients.cambiar_fuente(FuenteLista(filas, self.lista_clients.columnas))
 
     def ir_paso_2(self):
-        sel = self.tree_clients.selection()
-        if not sel:
+        vals = self.lista_clients.valores_seleccionados()
+        if not vals:
             messagebox.showwarning("Atención", "Selecciona un cliente de la lista.")
             return
         
-        item = self.tree_clients.item(sel[0])
-        vals = item['values']
-        
         cli_id = int(vals[0])
         cli_nombre = vals[1]
         
@@ -568,6 +665,7 @@ class ReservasView(ctk.CTkFrame):
         self.abrir_wizard_detalles(cli_id, cli_nombre)
 
     def abrir_wizard_detalles(self, cli_id, cli_nombre):
+        from servicio.backend import obtener_tipos_aparatos
         self.win_step2 = ctk.CTkToplevel(self)
         self.win_step2.title("Paso 2: Detalles Reserva")
         self.win_step2.geometry("400x400")
@@ -582,15 +680,14 @@ class ReservasView(ctk.CTkFrame):
         self.cmb_tipo_wiz = ctk.CTkComboBox(self.win_step2, width=250, command=self.actualizar_slots_wiz)
         self.cmb_tipo_wiz.pack(pady=5)
         
-        # Cargar Tipos
-        try:
-            tipos = obtener_tipos_aparatos()
-            self.cmb_tipo_wiz.configure(values=tipos)
-            if tipos: self.cmb_tipo_wiz.set(tipos[0])
-        except: pass
+        # Los tipos y los slots se cargan en segundo plano
+        self.tipos_wiz = []
+        self.slots_wiz = {}       # {tipo: [horas]} de la fecha self.slots_wiz_fecha
+        self.slots_wiz_fecha = None
 
         # Fecha
         ctk.CTkLabel(self.win_step2, text="Fecha:").pack(pady=(10,0))
+        from tkcalendar import DateEntry
         self.ent_fecha_wiz = DateEntry(self.win_step2, width=12, background='darkblue', 
                                        foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd')
         self.ent_fecha_wiz.pack(pady=5)
@@ -604,47 +701,78 @@ class ReservasView(ctk.CTkFrame):
 
         ctk.CTkButton(self.win_step2, text="Confirmar Reserva", fg_color="green", command=self.finalizar_reserva).pack(pady=30)
         
-        # Init slots
+        self.tareas.ejecutar("tipos_wiz", obtener_tipos_aparatos, al_terminar=self.pintar_tipos_wiz,
+                             al_error=lambda e: print(f"Error cargando tipos de aparato: {e}"))
+
+    def pintar_tipos_wiz(self, tipos):
+        if not self.win_step2.winfo_exists():
+            return
+        self.tipos_wiz = tipos
+        self.cmb_tipo_wiz.configure(values=tipos)
+        if tipos:
+            self.cmb_tipo_wiz.set(tipos[0])
         self.actualizar_slots_wiz()
 
     def actualizar_slots_wiz(self, event=None):
-        try:
-            tipo = self.cmb_tipo_wiz.get()
-            fecha = self.ent_fecha_wiz.get_date().strftime("%Y-%m-%d")
-            
-            if not tipo: return
+        from servicio.backend import obtener_slots_disponibles
+        tipo = self.cmb_tipo_wiz.get()
+        fecha = self.ent_fecha_wiz.get_date().strftime("%Y-%m-%d")
+        if not tipo or not self.tipos_wiz:
+            return  # Aún no han llegado los tipos
+
+        # Al cambiar de fecha se cargan los slots de todos los tipos de una vez
+        # (en segundo plano); cambiar de tipo ya no consulta la BD
+        if fecha != self.slots_wiz_fecha:
+            self.cmb_hora_wiz.set("Cargando...")
+            self.tareas.ejecutar("slots_wiz", obtener_slots_disponibles, fecha, self.tipos_wiz,
+                                 al_terminar=lambda slots: self.slots_cargados_wiz(fecha, slots),
+                                 al_error=lambda e: print(f"Error cargando horas libres: {e}"))
+            return
+        self.pintar_slots_wiz()
 
-            slots = obtener_slots_disponibles(fecha, tipo)
-            self.cmb_hora_wiz.configure(values=slots)
-            if slots: 
-                self.cmb_hora_wiz.set(slots[0])
-            else:
-                self.cmb_hora_wiz.set("No disponible")
-        except: pass
+    def slots_cargados_wiz(self, fecha, slots):
+        if not self.win_step2.winfo_exists():
+            return
+        self.slots_wiz = slots
+        self.slots_wiz_fecha = fecha
+        self.pintar_slots_wiz()
+
+    def pintar_slots_wiz(self):
+        slots = self.slots_wiz.get(self.cmb_tipo_wiz.get(), [])
+        self.cmb_hora_wiz.configure(values=slots)
+        if slots:
+            self.cmb_hora_wiz.set(slots[0])
+        else:
+            self.cmb_hora_wiz.set("No disponible")
 
     def finalizar_reserva(self):
-        try:
-            tipo = self.cmb_tipo_wiz.get()
-            fecha = self.ent_fecha_wiz.get_date().strftime("%Y-%m-%d")
-            hora = self.cmb_hora_wiz.get()
-            
-            if not hora or hora == "No disponible":
-                messagebox.showerror("Error", "Hora no disponible")
-                return
-            
-            aparato_id = asignar_aparato_disponible(tipo, fecha, hora)
-            if not aparato_id:
-                messagebox.showerror("Error", "No se encontró aparato libre.")
-                return
-                
-            crear_sesion(aparato_id, self.wiz_cli_id, fecha, hora)
-            
-            messagebox.showinfo("Éxito", "Reserva completada.")
+        from servicio.backend import reservar
+        tipo = self.cmb_tipo_wiz.get()
+        fecha = self.ent_fecha_wiz.get_date().strftime("%Y-%m-%d")
+        hora = self.cmb_hora_wiz.get()
+
+        if not hora or hora in ("No disponible", "Cargando..."):
+            messagebox.showerror("Error", "Hora no disponible")
+            return
+        if self.tareas.ocupado("reservar"):
+            return
+
+        self.tareas.ejecutar("reservar", reservar, tipo, fecha, hora, self.wiz_cli_id,
+                             al_terminar=self.reserva_terminada)
+
+    def reserva_terminada(self, resultado):
+        if not resultado.ok:
+            messagebox.showerror("Error", resultado.mensaje)
+            # La franja pudo llenarse desde que se abrió el asistente
+            if self.win_step2.winfo_exists():
+                self.slots_wiz_fecha = None
+                self.actualizar_slots_wiz()
+            return
+
+        messagebox.showinfo("Éxito", "Reserva completada.")
+        if self.win_step2.winfo_exists():
             self.win_step2.destroy()
-            self.load_sesiones() 
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.load_sesiones()
 
 
 class CobrosView(ctk.CTkFrame):
@@ -675,72 +803,104 @@ class CobrosView(ctk.CTkFrame):
         # Buscador
         self.ent_search = ctk.CTkEntry(top, placeholder_text="Buscar cliente...", width=200)
         self.ent_search.pack(side="left", padx=10)
-        self.ent_search.bind("<KeyRelease>", self.filtrar_tabla)
+        self.ent_search.bind("<KeyRelease>", Antirrebote(self, 150, self.filtrar_tabla))
 
-        ctk.CTkButton(top, text="Exportar Pendientes PDF", fg_color="#D32F2F", command=self.export_morosos).pack(side="right", padx=10)
+        ctk.CTkButton(top, text="Exportar Pendientes PDF", fg_color="#D32F2F", command=self.export_morosos,
+                      state="disabled" if remoto() else "normal").pack(side="right", padx=10)
 
-        # --- Tree ---
-        cols = ("id", "nombre", "dni", "importe", "estado", "recibo_id") 
-        self.tree = ttk.Treeview(self.card, columns=cols, show="headings", height=20)
-        
-        self.tree.heading("id", text="ID")
-        self.tree.heading("nombre", text="Cliente")
-        self.tree.heading("dni", text="DNI")
-        self.tree.heading("importe", text="Importe (€)")
-        self.tree.heading("estado", text="Estado")
-        
-        self.tree.column("id", width=40, anchor="center")
-        self.tree.column("nombre", width=200)
-        self.tree.column("dni", width=100)
-        self.tree.column("importe", width=80, anchor="e")
-        self.tree.column("estado", width=100, anchor="center")
-        self.tree.column("recibo_id", width=0, stretch=False) 
+        # --- Lista ---
+        self.lista = ListaVirtual(
+            self.card, ("id", "nombre", "dni", "importe", "estado", "recibo_id"),
+            encabezados={"id": "ID", "nombre": "Cliente", "dni": "DNI",
+                         "importe": "Importe (€)", "estado": "Estado", "recibo_id": ""},
+            anchos={"id": 40, "nombre": 200, "dni": 100, "importe": 80, "estado": 100},
+            alineaciones={"id": "center", "importe": "e", "estado": "center"},
+            ocultas=("recibo_id",),
+            formatos={"importe": "{:.2f}".format},
+            tareas=self.winfo_toplevel().tareas,
+        )
+        self.lista.pack(fill="both", expand=True, padx=20, pady=20)
         
-        self.tree.pack(fill="both", expand=True, padx=20, pady=20)
+        self.lista.tree.bind("<Double-1>", self.on_double_click)
         
-        self.tree.bind("<Double-1>", self.on_double_click)
-        
-        ctk.CTkLabel(self.card, text="* Doble click en un cliente para gestionar el pago.", text_color="gray").pack(pady=10)
+        self.lbl_ayuda = ctk.CTkLabel(self.card, text="* Doble click en un cliente para gestionar el pago.", text_color="gray")
+        self.lbl_ayuda.pack(pady=10)
+
+        self.periodo = None  # (año, mes) cargado; las filas se piden por páginas
 
-        self.datos_pagos_cache = [] # Cache para filtrado
+        self.tareas = self.winfo_toplevel().tareas
+        self.cargando = indicador_carga(self.lbl_ayuda, "Cargando datos del periodo...")
         self.cargar_estado()
 
     def cargar_estado(self):
         try:
             y = int(self.ent_y.get())
             m = int(self.ent_m.get())
-            
-            self.datos_pagos_cache = obtener_estado_pagos_mes(y, m)
-            self.filtrar_tabla()
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error cargando datos: {e}")
+        except ValueError:
+            messagebox.showerror("Error", "Año y mes deben ser números.")
+            return
+
+        self.periodo = (y, m)
+        self.filtrar_tabla()
 
     def filtrar_tabla(self, event=None):
-        query = self.ent_search.get().lower()
-        
-        # Limpiar tree
-        for i in self.tree.get_children(): self.tree.delete(i)
-        
-        # Filtrar y repoblar
-        for d in self.datos_pagos_cache:
-            full_str = f"{d['nombre']} {d['apellido']} {d['dni']}".lower()
-            
-            if query in full_str:
-                rid = d['recibo_id'] if d['recibo_id'] else 0
-                self.tree.insert("", "end", values=(
-                    d['cliente_id'], 
-                    f"{d['nombre']} {d['apellido']}", 
-                    d['dni'], 
-                    f"{d['importe']:.2f}", 
-                    d['estado'],
-                    rid
-                ))
+        from servicio.backend import contar_clientes
+        # El total y la página visible se leen en segundo plano; el resto de
+        # páginas se piden al desplazarse. El buscador filtra en la consulta
+        # (índice de texto completo de clientes), no en memoria
+        if self.periodo is None:
+            return
+        y, m = self.periodo
+        consulta = self.ent_search.get()
+        visibles = self.lista.ventana()[1]
+        orden = self.lista.orden_actual()
+
+        def preparar():
+            fuente = FuenteConsulta(partial(contar_clientes, consulta),
+                                    partial(self.pagina_cobros, y, m, consulta))
+            if orden[0] is not None:
+                fuente.ordenar(*orden)
+            fuente.rango(0, visibles)
+            return fuente
+
+        self.tareas.ejecutar("estado_pagos", preparar, cargando=self.cargando,
+                             al_terminar=self.lista.cambiar_fuente,
+                             al_error=lambda e: messagebox.showerror("Error", f"Error cargando datos: {e}"))
+
+    def pagina_cobros(self, y, m, consulta, offset, limite, orden, descendente):
+        from servicio.backend import listar_estado_pagos_rango
+        columna = {"id": "cliente_id"}.get(orden, orden)
+        return [(d['cliente_id'], self.fila_cobro(d))
+                for d in listar_estado_pagos_rango(y, m, offset, limite, columna, descendente, consulta)]
+
+    def fila_cobro(self, d):
+        rid = d['recibo_id'] if d['recibo_id'] else 0
+        return (
+            d['cliente_id'], 
+            f"{d['nombre']} {d['apellido']}", 
+            d['dni'], 
+            d['importe'], 
+            d['estado'],
+            rid
+        )
+
+    @staticmethod
+    def cobrar(cliente_id, anyo, mes, importe, recibo_id):
+        """En segundo plano: registra el pago y devuelve el nuevo estado del cliente."""
+        from servicio.backend import cobrar_recibo_mes, obtener_estado_pago_cliente
+        # Genera el recibo si no existe y registra el pago en una sola transacción
+        cobrar_recibo_mes(cliente_id, anyo, mes, importe, recibo_id or None)
+        return obtener_estado_pago_cliente(cliente_id, anyo, mes)
+
+    def actualizar_cliente_cobro(self, cliente_id, anyo, mes, nuevo):
+        """Refresca solo la fila de un cliente (tras cobrar) en lugar de recargar el mes."""
+        if nuevo is None or self.periodo != (anyo, mes):
+            return
+        self.lista.actualizar_fila(cliente_id, self.fila_cobro(nuevo))
 
     def on_double_click(self, event):
-        item = self.tree.selection()
-        if not item: return
-        vals = self.tree.item(item[0], 'values')
+        vals = self.lista.valores_seleccionados()
+        if not vals: return
         
         cliente_id = int(vals[0])
         nombre = vals[1]
@@ -772,28 +932,29 @@ class CobrosView(ctk.CTkFrame):
                 importe = float(ent_imp.get())
                 y = int(self.ent_y.get())
                 m = int(self.ent_m.get())
-                
-                rid = recibo_id
-                if rid == 0:
-                    rid = generar_recibo_individual(cliente_id, y, m, importe)
-                
-                if rid and rid != 0:
-                    registrar_pago(rid)
-                    messagebox.showinfo("Éxito", "Pago registrado correctamente.")
-                    top.destroy()
-                    self.cargar_estado()
-                else:
-                    messagebox.showerror("Error", "No se pudo generar o localizar el recibo.")
-                    
             except ValueError:
                 messagebox.showerror("Error", "Importe inválido.")
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+                return
+            if self.tareas.ocupado("cobro"):
+                return
+
+            def cobrado(nuevo):
+                messagebox.showinfo("Éxito", "Pago registrado correctamente.")
+                if top.winfo_exists():
+                    top.destroy()
+                self.actualizar_cliente_cobro(cliente_id, y, m, nuevo)
+
+            self.tareas.ejecutar("cobro", self.cobrar, cliente_id, y, m, importe, recibo_id,
+                                 al_terminar=cobrado)
         
         ctk.CTkButton(top, text="Confirmar Pago", fg_color="green", command=confirmar).pack(pady=20)
 
     def export_morosos(self):
+        from controller.recibo_controller import exportar_morosos_pdf  # Fichero local: solo en modo local
         try:
-            f = exportar_morosos_pdf(int(self.ent_y.get()), int(self.ent_m.get()))
-            messagebox.showinfo("PDF", f"Archivo generado: {f}")
-        except Exception as e: messagebox.showerror("Error", str(e))
+            y, m = int(self.ent_y.get()), int(self.ent_m.get())
+        except ValueError:
+            messagebox.showerror("Error", "Año y mes deben ser números.")
+            return
+        self.tareas.ejecutar("pdf_morosos", exportar_morosos_pdf, y, m,
+                             al_terminar=lambda f: messagebox.showinfo("PDF", f"Archivo generado: {f}"))
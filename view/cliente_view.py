@@ -2,11 +2,15 @@
 
 from controller.cliente_controller import (
     crear_cliente,
-    listar_clientes,
+    listar_clientes_pagina,
     obtener_cliente_por_id,
     actualizar_cliente,
     eliminar_cliente,
 )
+from controller.importacion_clientes import importar_clientes_csv
+
+# Clientes por página en el listado
+FILAS_POR_PAGINA = 50
 
 
 def menu_clientes():
@@ -16,6 +20,7 @@ def menu_clientes():
         print("2. Listar clientes")
         print("3. Editar cliente")
         print("4. Eliminar cliente")
+        print("5. Importar clientes desde CSV")
         print("0. Volver")
         opcion = input("> ").strip()
 
@@ -27,6 +32,8 @@ def menu_clientes():
             editar_cliente()
         elif opcion == "4":
             borrar_cliente()
+        elif opcion == "5":
+            importar_clientes()
         elif opcion == "0":
             break
         else:
@@ -51,13 +58,40 @@ def alta_cliente():
 
 def mostrar_clientes():
     print("\n[Listado de clientes]")
-    clientes = listar_clientes()
-    if not clientes:
-        print("No hay clientes registrados.")
+    clave = None
+    while True:
+        clientes, clave = listar_clientes_pagina(clave, FILAS_POR_PAGINA)
+        if not clientes and clave is None:
+            print("No hay clientes registrados.")
+            return
+
+        for c in clientes:
+            print(f"[{c.cliente_id}] {c.nombre} {c.apellido} - DNI: {c.dni}")
+
+        if clave is None:
+            return
+        if input("-- Intro: siguiente página, q: salir -- ").strip().lower() == "q":
+            return
+
+
+def importar_clientes():
+    print("\n[Importar clientes desde CSV]")
+    print("Columnas: dni, nombre, apellido y, opcionales, email, telefono, fecha_alta")
+    ruta = input("Fichero CSV: ").strip()
+    if not ruta:
+        print("Operación cancelada.")
+        return
+
+    try:
+        resumen = importar_clientes_csv(ruta)
+    except Exception as e:
+        print(f"❌ Error al importar: {e}")
         return
 
-    for c in clientes:
-        print(f"[{c.cliente_id}] {c.nombre} {c.apellido} - DNI: {c.dni}")
+    print(f"✅ {resumen['importados']} clientes importados de {resumen['leidas']} filas "
+          f"({resumen['recibos']} recibos generados).")
+    if resumen["rechazados"]:
+        print(f"{resumen['rechazados']} filas rechazadas, motivos en: {resumen['ruta_rechazos']}")
 
 
 def editar_cliente():
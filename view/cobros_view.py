@@ -1,12 +1,15 @@
 # view/cobros_view.py
 
 from controller.recibo_controller import (
-    generar_recibos_mes,
-    listar_recibos_mes,
-    obtener_morosos_mes,
+    ejecutar_facturacion_mes,
+    listar_recibos_pagina,
+    iter_morosos_mes,
 )
 from controller.pago_controller import registrar_pago
 
+# Recibos por página en el listado
+FILAS_POR_PAGINA = 50
+
 
 def menu_cobros():
     while True:
@@ -42,8 +45,13 @@ def generar_recibos_view():
         print("Datos numéricos no válidos.")
         return
 
-    creados = generar_recibos_mes(anyo, mes, importe)
-    print(f"✅ Se generaron {creados} recibos nuevos.")
+    try:
+        resultado = ejecutar_facturacion_mes(anyo, mes, importe)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print(f"✅ Se generaron {resultado['creados']} recibos nuevos "
+          f"({resultado['omitidos']} clientes ya lo tenían) en {resultado['duracion_ms']:.0f} ms.")
 
 
 def listar_recibos_view():
@@ -55,16 +63,23 @@ def listar_recibos_view():
         print("Datos no válidos.")
         return
 
-    recibos = listar_recibos_mes(anyo, mes)
-    if not recibos:
-        print("No hay recibos para ese mes.")
-        return
+    clave = None
+    while True:
+        recibos, clave = listar_recibos_pagina((anyo, mes), (anyo, mes), clave, FILAS_POR_PAGINA)
+        if not recibos and clave is None:
+            print("No hay recibos para ese mes.")
+            return
 
-    for r in recibos:
-        print(
-            f"[{r.recibo_id}] Cliente {r.cliente_id} | "
-            f"{r.periodo_mes}/{r.periodo_anyo} | {r.importe}€ | {r.estado}"
-        )
+        for r in recibos:
+            print(
+                f"[{r.recibo_id}] Cliente {r.cliente_id} | "
+                f"{r.periodo_mes}/{r.periodo_anyo} | {r.importe}€ | {r.estado}"
+            )
+
+        if clave is None:
+            return
+        if input("-- Intro: siguiente página, q: salir -- ").strip().lower() == "q":
+            return
 
 
 def registrar_pago_view():
@@ -94,13 +109,14 @@ def listar_morosos_view():
         print("Datos no válidos.")
         return
 
-    morosos = obtener_morosos_mes(anyo, mes)
-    if not morosos:
-        print("No hay morosos para ese mes. 🎉")
-        return
-
-    print("\nClientes morosos:")
-    for m in morosos:
+    total = 0
+    for m in iter_morosos_mes(anyo, mes):
+        if not total:
+            print("\nClientes morosos:")
         print(
             f"[{m['cliente_id']}] {m['nombre']} {m['apellido']} - DNI: {m['dni']}"
         )
+        total += 1
+
+    if not total:
+        print("No hay morosos para ese mes. 🎉")
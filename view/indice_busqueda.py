@@ -0,0 +1,37 @@
+# view/indice_busqueda.py
+"""
+Utilidades para los buscadores de las vistas.
+
+La búsqueda en sí la hace la BD (controller.cliente_controller.buscar_clientes,
+sobre el índice FTS5 de clientes). Antirrebote agrupa las pulsaciones rápidas
+para lanzar una sola consulta cuando el usuario deja de teclear.
+"""
+
+
+class Antirrebote:
+    """
+    Retrasa la llamada a 'funcion' hasta que pasen 'retraso_ms' sin nuevas
+    llamadas (p. ej. para filtrar al dejar de teclear, no en cada tecla).
+
+        self.filtro = Antirrebote(self, 150, self.filtrar_tabla)
+        entry.bind("<KeyRelease>", self.filtro)
+    """
+
+    def __init__(self, widget, retraso_ms: int, funcion):
+        self.widget = widget
+        self.retraso_ms = retraso_ms
+        self.funcion = funcion
+        self._pendiente = None
+
+    def __call__(self, event=None):
+        self.cancelar()
+        self._pendiente = self.widget.after(self.retraso_ms, self._ejecutar)
+
+    def cancelar(self):
+        if self._pendiente is not None:
+            self.widget.after_cancel(self._pendiente)
+            self._pendiente = None
+
+    def _ejecutar(self):
+        self._pendiente = None
+        self.funcion()
@@ -0,0 +1,466 @@
+# view/lista_virtual.py
+"""
+Lista virtual basada en ttk.Treeview.
+
+El Treeview solo contiene las filas que caben en pantalla; al desplazarse se
+reescriben sus valores con la ventana de datos correspondiente, así que pintar
+50.000 clientes cuesta lo mismo que pintar 20. Los datos vienen de una
+"fuente" con este protocolo:
+
+    total() -> int
+    rango(inicio, cantidad) -> [(id, valores), ...]
+    ordenar(columna, descendente)
+    orden -> (columna, descendente) aplicado
+
+FuenteLista trabaja sobre una lista en memoria; FuenteConsulta pide páginas
+a una función del controlador (p. ej. listar_clientes_rango). Si la lista
+tiene un EjecutorTareas, esas páginas se leen en segundo plano y por delante
+del desplazamiento, nunca en el hilo de la interfaz.
+La selección se guarda por id de fila, de modo que se mantiene al desplazarse,
+ordenar o recargar.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+
+class FuenteLista:
+    """Fuente sobre una lista de tuplas de valores ya cargada en memoria."""
+
+    def __init__(self, filas, columnas, clave=0):
+        self._filas = list(filas)
+        self._columnas = list(columnas)
+        self._clave = clave  # índice de la columna que identifica la fila
+        self.orden = (None, False)
+
+    def total(self) -> int:
+        return len(self._filas)
+
+    def rango(self, inicio: int, cantidad: int):
+        return [(f[self._clave], f) for f in self._filas[inicio:inicio + cantidad]]
+
+    def ordenar(self, columna: str, descendente: bool):
+        self.orden = (columna, descendente)
+        i = self._columnas.index(columna)
+        # Los None van siempre al final, en cualquier sentido
+        con_valor = [f for f in self._filas if f[i] is not None]
+        nulos = [f for f in self._filas if f[i] is None]
+        con_valor.sort(key=lambda f: f[i], reverse=descendente)
+        self._filas = con_valor + nulos
+
+    def actualizar_fila(self, id_fila, valores) -> bool:
+        """Sustituye los valores de una fila (por id). Devuelve False si no está."""
+        for i, f in enumerate(self._filas):
+            if f[self._clave] == id_fila:
+                self._filas[i] = tuple(valores)
+                return True
+        return False
+
+
+class FuenteConsulta:
+    """
+    Fuente que pide los datos por páginas a funciones del controlador:
+        contar() -> int
+        obtener_rango(offset, limite, orden, descendente) -> [(id, valores), ...]
+    Guarda las últimas páginas leídas para no repetir consultas al desplazarse.
+
+    Opcionalmente obtener_siguientes(ultima_fila, limite, orden, descendente)
+    pide la página que sigue a una fila ya leída (paginación por clave, sin
+    OFFSET). Se usa al bajar página a página; si devuelve None (p. ej. ese
+    orden no tiene índice) o se salta a una página lejana, se usa obtener_rango.
+
+    Sin más, rango() lee en el momento las páginas que faltan (sirve en un
+    hilo de trabajo, p. ej. para leer la primera ventana). Tras
+    en_segundo_plano(), rango() devuelve solo lo ya leído y pide lo que falta
+    (y una página más por cada lado) con el EjecutorTareas; al llegar se
+    llama a al_cargar() para repintar.
+    """
+
+    MAX_PAGINAS = 8
+
+    def __init__(self, contar, obtener_rango, tamano_pagina: int = 200, obtener_siguientes=None):
+        self._contar = contar
+        self._obtener_rango = obtener_rango
+        self._obtener_siguientes = obtener_siguientes
+        self.tamano_pagina = tamano_pagina
+        self.orden = (None, False)
+        self._total = None
+        self._paginas = {}
+        self._tareas = None
+        self._al_cargar = None
+        self._pedidas = set()   # Páginas de la lectura en segundo plano en curso
+        self._generacion = 0    # Cambia al ordenar o invalidar: descarta lecturas anteriores
+
+    def en_segundo_plano(self, tareas, al_cargar):
+        """Desde ahora las páginas que faltan se leen con tareas (ver la clase)."""
+        self._tareas = tareas
+        self._al_cargar = al_cargar
+
+    def total(self) -> int:
+        if self._total is None:
+            self._total = self._contar()
+        return self._total
+
+    def rango(self, inicio: int, cantidad: int):
+        filas = []
+        fin = min(inicio + cantidad, self.total())
+        if self._tareas is not None:
+            self._pedir(inicio, fin)
+        while inicio < fin:
+            n, desplazamiento = divmod(inicio, self.tamano_pagina)
+            pagina = self._pagina(n)
+            if pagina is None:
+                break  # Se está leyendo en segundo plano
+            trozo = pagina[desplazamiento:desplazamiento + (fin - inicio)]
+            if not trozo:
+                break
+            filas.extend(trozo)
+            inicio += len(trozo)
+        return filas
+
+    def _pagina(self, n: int):
+        pagina = self._paginas.pop(n, None)
+        if pagina is None:
+            if self._tareas is not None:
+                return None
+            anterior = self._paginas.get(n - 1)
+            pagina = self._leer_paginas([n], {n - 1: anterior} if anterior else {}, self.orden)[n]
+        self._guardar(n, pagina)
+        return pagina
+
+    def _guardar(self, n: int, pagina):
+        self._paginas[n] = pagina  # Al final: la más reciente
+        while len(self._paginas) > self.MAX_PAGINAS:
+            del self._paginas[next(iter(self._paginas))]
+
+    def _leer_paginas(self, numeros, anteriores: dict, orden) -> dict:
+        """Lee las páginas indicadas (en orden); no toca el estado de la fuente."""
+        paginas = {}
+        for n in numeros:
+            pagina = None
+            anterior = paginas.get(n - 1) or anteriores.get(n - 1)
+            if self._obtener_siguientes is not None and anterior and len(anterior) == self.tamano_pagina:
+                pagina = self._obtener_siguientes(anterior[-1], self.tamano_pagina, *orden)
+            if pagina is None:
+                pagina = self._obtener_rango(n * self.tamano_pagina, self.tamano_pagina, *orden)
+            paginas[n] = pagina
+        return paginas
+
+    def _pedir(self, inicio: int, fin: int):
+        """Pide en segundo plano las páginas de [inicio, fin) y las vecinas que falten."""
+        if fin <= inicio:
+            return
+        primera, ultima = inicio // self.tamano_pagina, (fin - 1) // self.tamano_pagina
+        ultima_total = max(0, self.total() - 1) // self.tamano_pagina
+        visibles = [n for n in range(primera, ultima + 1) if n not in self._paginas]
+        if visibles and set(visibles) <= self._pedidas:
+            return  # Ya están en camino
+        vecinas = [n for n in (primera - 1, ultima + 1)
+                   if 0 <= n <= ultima_total and n not in self._paginas]
+        if not visibles and (not vecinas or self._pedidas):
+            return
+        numeros = sorted(visibles + vecinas)
+        anteriores = {n - 1: self._paginas[n - 1] for n in numeros if n - 1 in self._paginas}
+        generacion = self._generacion
+        self._pedidas = set(numeros)
+        # Una sola clave por fuente: si se sigue desplazando, solo cuenta la última petición
+        self._tareas.ejecutar(f"paginas_{id(self)}", self._leer_paginas, numeros, anteriores, self.orden,
+                              al_terminar=lambda paginas: self._paginas_leidas(generacion, paginas),
+                              al_error=lambda e: self._paginas_fallidas(generacion, e))
+
+    def _paginas_leidas(self, generacion: int, paginas: dict):
+        if generacion != self._generacion:
+            return  # Se ordenó o invalidó mientras se leía
+        self._pedidas = set()
+        for n, pagina in paginas.items():
+            self._guardar(n, pagina)
+        if self._al_cargar is not None:
+            self._al_cargar()
+
+    def _paginas_fallidas(self, generacion: int, error):
+        if generacion == self._generacion:
+            self._pedidas = set()
+        print(f"Error al leer una página de la lista: {error}")
+
+    def ordenar(self, columna: str, descendente: bool):
+        # El total no cambia al ordenar: solo se descartan las páginas
+        self.orden = (columna, descendente)
+        self._paginas.clear()
+        self._pedidas = set()
+        self._generacion += 1
+
+    def actualizar_fila(self, id_fila, valores) -> bool:
+        """Sustituye los valores de una fila en las páginas leídas (sin consultar)."""
+        for pagina in self._paginas.values():
+            for i, (id_actual, _) in enumerate(pagina):
+                if id_actual == id_fila:
+                    pagina[i] = (id_fila, valores)
+                    return True
+        return False
+
+    def invalidar(self):
+        """Olvida el total y las páginas leídas (p. ej. tras un alta)."""
+        self._total = None
+        self._paginas.clear()
+        self._pedidas = set()
+        self._generacion += 1
+
+
+class ListaVirtual(ttk.Frame):
+    """
+    Treeview + barra de desplazamiento que solo materializa las filas visibles.
+
+        lista = ListaVirtual(padre, ("id", "dni", "nombre"), encabezados={"id": "ID"},
+                             tareas=app.tareas)
+        lista.cambiar_fuente(FuenteLista(filas, lista.columnas))
+
+    Con tareas (un EjecutorTareas), las FuenteConsulta leen sus páginas en
+    segundo plano en lugar de en el hilo de la interfaz.
+        lista.tree.bind("<Double-1>", ...)
+        lista.valores_seleccionados()
+    """
+
+    def __init__(self, master, columnas, encabezados=None, anchos=None,
+                 alineaciones=None, ocultas=(), formatos=None, ordenable=True, tareas=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self._tareas = tareas
+        self.columnas = tuple(columnas)
+        # Función de presentación por columna: se ordena por el valor original
+        self._formatos = [(formatos or {}).get(c) for c in self.columnas]
+        self._encabezados = {c: (encabezados or {}).get(c, c.capitalize()) for c in self.columnas}
+        self._fuente = None
+        self._total = 0
+        self._inicio = 0
+        self._visibles = 1
+        self._ids = []              # id de la fila que muestra cada elemento del Treeview
+        self._valores = []
+        self._pintados = []         # valores ya formateados de cada elemento del Treeview
+        self._seleccion = None      # (id, valores) de la fila seleccionada
+        self._seleccion_pintada = ()
+        self._orden = None
+        self._descendente = False
+
+        self.tree = ttk.Treeview(self, columns=self.columnas, show="headings", selectmode="browse")
+        self.barra = ttk.Scrollbar(self, orient="vertical", command=self._on_barra)
+        self.barra.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        for c in self.columnas:
+            if ordenable:
+                self.tree.heading(c, text=self._encabezados[c], command=lambda c=c: self.ordenar(c))
+            else:
+                self.tree.heading(c, text=self._encabezados[c])
+            if anchos and c in anchos:
+                self.tree.column(c, width=anchos[c])
+            if alineaciones and c in alineaciones:
+                self.tree.column(c, anchor=alineaciones[c])
+            if c in ocultas:
+                self.tree.column(c, width=0, minwidth=0, stretch=False)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_seleccion)
+        self.tree.bind("<MouseWheel>", self._on_rueda)
+        self.tree.bind("<Button-4>", lambda e: self.desplazar(-3))
+        self.tree.bind("<Button-5>", lambda e: self.desplazar(3))
+        for tecla, paso in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-pagina"),
+                            ("<Next>", "pagina"), ("<Home>", "inicio"), ("<End>", "fin")):
+            self.tree.bind(tecla, lambda e, p=paso: self._on_tecla(p))
+
+    # ---------- Datos ----------
+
+    def cambiar_fuente(self, fuente, conservar_posicion: bool = False):
+        """
+        Muestra otra fuente conservando el orden y, si sigue existiendo, la selección.
+        Con conservar_posicion=True (p. ej. al pulsar ⟳) no vuelve al principio.
+        """
+        self._fuente = fuente
+        if self._tareas is not None and hasattr(fuente, "en_segundo_plano"):
+            fuente.en_segundo_plano(self._tareas, self._pintar)
+        if self._orden is not None and fuente.orden != (self._orden, self._descendente):
+            fuente.ordenar(self._orden, self._descendente)
+        if not conservar_posicion:
+            self._inicio = 0
+        self._recargar()
+
+    def actualizar_fila(self, id_fila, valores) -> bool:
+        """
+        Cambia una sola fila (p. ej. tras cobrar un recibo) sin recargar la fuente.
+        Solo toca el Treeview si la fila está a la vista.
+        """
+        if self._fuente is None or not self._fuente.actualizar_fila(id_fila, valores):
+            return False
+        if id_fila in self._ids:
+            self._pintar()
+        return True
+
+    def refrescar(self):
+        """Vuelve a leer el total y la ventana visible de la fuente actual."""
+        if self._fuente is None:
+            return
+        if hasattr(self._fuente, "invalidar"):
+            self._fuente.invalidar()
+        self._recargar()
+
+    def _recargar(self):
+        self._total = self._fuente.total()
+        self._inicio = max(0, min(self._inicio, self._total - self._visibles))
+        self._pintar()
+
+    def ventana(self) -> tuple[int, int]:
+        """(primera fila visible, número de filas visibles)"""
+        return self._inicio, self._visibles
+
+    def orden_actual(self) -> tuple:
+        """(columna, descendente) por la que está ordenada la lista, o (None, False)."""
+        return self._orden, self._descendente
+
+    def ordenar(self, columna: str):
+        """Ordena por columna; un segundo clic en la misma invierte el orden."""
+        if self._fuente is None:
+            return
+        self._descendente = not self._descendente if columna == self._orden else False
+        self._orden = columna
+        for c in self.columnas:
+            flecha = (" ▼" if self._descendente else " ▲") if c == columna else ""
+            self.tree.heading(c, text=self._encabezados[c] + flecha)
+        self._fuente.ordenar(columna, self._descendente)
+        self._inicio = 0
+        self._pintar()
+
+    # ---------- Selección ----------
+
+    def ids_seleccionados(self) -> list:
+        return [self._seleccion[0]] if self._seleccion else []
+
+    def valores_seleccionados(self):
+        """Valores (tal como los dio la fuente) de la fila seleccionada, o None."""
+        return self._seleccion[1] if self._seleccion else None
+
+    def limpiar_seleccion(self):
+        self._seleccion = None
+        self._pintar()
+
+    def _on_seleccion(self, event=None):
+        actual = self.tree.selection()
+        if actual == self._seleccion_pintada:
+            return  # Evento generado por _pintar()
+        self._seleccion_pintada = actual
+        if actual:
+            i = self.tree.index(actual[0])
+            self._seleccion = (self._ids[i], self._valores[i])
+        else:
+            self._seleccion = None
+
+    # ---------- Desplazamiento ----------
+
+    def desplazar(self, filas: int):
+        self._ir_a(self._inicio + filas)
+
+    def _ir_a(self, inicio: int):
+        inicio = max(0, min(inicio, self._total - self._visibles))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._pintar()
+
+    def _on_barra(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self._ir_a(int(float(cantidad) * self._total))
+        elif accion == "scroll":
+            paso = self._visibles if unidad == "pages" else 1
+            self.desplazar(int(cantidad) * paso)
+
+    def _on_rueda(self, event):
+        self.desplazar(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_tecla(self, paso):
+        if not self._total:
+            return "break"
+        # Posición absoluta de la fila seleccionada (o de la primera visible)
+        actual = self._inicio
+        if self._seleccion is not None and self._seleccion[0] in self._ids:
+            actual = self._inicio + self._ids.index(self._seleccion[0])
+
+        if paso == "inicio":
+            destino = 0
+        elif paso == "fin":
+            destino = self._total - 1
+        elif paso == "pagina":
+            destino = actual + self._visibles
+        elif paso == "-pagina":
+            destino = actual - self._visibles
+        else:
+            destino = actual + paso
+        destino = max(0, min(destino, self._total - 1))
+
+        if destino < self._inicio:
+            self._inicio = destino
+        elif destino >= self._inicio + self._visibles:
+            self._inicio = destino - self._visibles + 1
+        filas = self._fuente.rango(destino, 1)
+        if filas:
+            self._seleccion = filas[0]
+        self._pintar()
+        return "break"
+
+    def _on_configure(self, event=None):
+        alto_fila = self._alto_fila()
+        cabecera = alto_fila  # Estimación hasta que haya una fila con la que medir
+        if self.tree.get_children():
+            caja = self.tree.bbox(self.tree.get_children()[0])
+            cabecera = caja[1] if caja else cabecera
+        visibles = max(1, (self.tree.winfo_height() - cabecera) // alto_fila)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._inicio = max(0, min(self._inicio, self._total - self._visibles))
+            self._pintar()
+
+    def _alto_fila(self) -> int:
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight")) or 20
+        except (ValueError, tk.TclError):
+            return 20
+
+    # ---------- Pintado ----------
+
+    def _pintar(self):
+        filas = self._fuente.rango(self._inicio, self._visibles) if self._fuente else []
+        elementos = self.tree.get_children()
+
+        # Se reutilizan los elementos existentes; solo se crean o borran los que
+        # sobran/faltan y solo se reescriben los que muestran otros valores
+        for iid in elementos[len(filas):]:
+            self.tree.delete(iid)
+        pintados = []
+        for i, (_, valores) in enumerate(filas):
+            valores = self._formatear(valores)
+            if i >= len(elementos):
+                self.tree.insert("", "end", values=valores)
+            elif i >= len(self._pintados) or self._pintados[i] != valores:
+                self.tree.item(elementos[i], values=valores)
+            pintados.append(valores)
+        self._pintados = pintados
+
+        self._ids = [fila[0] for fila in filas]
+        self._valores = [fila[1] for fila in filas]
+
+        seleccion = ()
+        if self._seleccion is not None and self._seleccion[0] in self._ids:
+            i = self._ids.index(self._seleccion[0])
+            self._seleccion = (self._seleccion[0], self._valores[i])
+            seleccion = (self.tree.get_children()[i],)
+        self._seleccion_pintada = seleccion
+        if seleccion:
+            self.tree.selection_set(seleccion)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        if self._total:
+            self.barra.set(self._inicio / self._total,
+                           min(1.0, (self._inicio + self._visibles) / self._total))
+        else:
+            self.barra.set(0.0, 1.0)
+
+    def _formatear(self, valores):
+        if not any(self._formatos):
+            return tuple(valores)
+        return tuple(v if f is None or v is None else f(v) for v, f in zip(valores, self._formatos))
@@ -1,10 +1,11 @@
 # view/sesion_view.py
 
 from controller.sesion_controller import (
-    crear_sesion,
-    listar_sesiones_dia,
+    reservar,
+    obtener_tipos_aparatos,
+    iter_sesiones_dia,
     cancelar_sesion,
-    obtener_ocupacion_diaria,
+    iter_ocupacion_diaria,
 )
 
 
@@ -34,51 +35,62 @@ def menu_reservas(usuario):
 
 def alta_sesion(usuario):
     print("\n[Crear sesión / reserva]")
+    tipos = obtener_tipos_aparatos()
+    if not tipos:
+        print("No hay aparatos dados de alta.")
+        return
+    for i, tipo in enumerate(tipos, start=1):
+        print(f"{i}. {tipo}")
+
     try:
-        aparato_id = int(input("ID aparato: ").strip())
+        tipo = tipos[int(input("Tipo de aparato (número): ").strip()) - 1]
         cliente_id = int(input("ID cliente: ").strip())
-    except ValueError:
-        print("ID no válido.")
+    except (ValueError, IndexError):
+        print("Dato no válido.")
         return
 
     fecha = input("Fecha (YYYY-MM-DD): ").strip()
     hora = input("Hora (HH:MM, minutos 00 o 30): ").strip()
 
     try:
-        sesion = crear_sesion(aparato_id, cliente_id, fecha, hora, usuario.usuario_id)
-        print(f"✅ Sesión creada con ID {sesion.sesion_id}")
+        resultado = reservar(tipo, fecha, hora, cliente_id, usuario.usuario_id)
     except Exception as e:
         print(f"❌ No se pudo crear la sesión: {e}")
+        return
+
+    if resultado.ok:
+        s = resultado.sesion
+        print(f"✅ Sesión creada con ID {s.sesion_id} (aparato {s.aparato_id})")
+    else:
+        print(f"❌ No se pudo crear la sesión: {resultado.mensaje}")
 
 
 def listar_sesiones():
     print("\n[Listar sesiones de un día]")
     fecha = input("Fecha (YYYY-MM-DD): ").strip()
-    sesiones = listar_sesiones_dia(fecha)
+    total = 0
+    for s in iter_sesiones_dia(fecha):
+        print(f"[{s.sesion_id}] Aparato {s.aparato_id} - Cliente {s.cliente_id} - {s.fecha} {s.hora_inicio}")
+        total += 1
 
-    if not sesiones:
+    if not total:
         print("No hay sesiones para esa fecha.")
-        return
-
-    for s in sesiones:
-        print(f"[{s.sesion_id}] Aparato {s.aparato_id} - Cliente {s.cliente_id} - {s.fecha} {s.hora_inicio}")
 
 
 def ver_ocupacion_diaria():
     print("\n[Ocupación diaria detallada]")
     fecha = input("Fecha (YYYY-MM-DD): ").strip()
-    ocupacion = obtener_ocupacion_diaria(fecha)
-
-    if not ocupacion:
-        print("No hay sesiones para esa fecha.")
-        return
-
-    for o in ocupacion:
+    total = 0
+    for o in iter_ocupacion_diaria(fecha):
         print(
             f"[{o['sesion_id']}] {o['fecha']} {o['hora_inicio']} | "
             f"Aparato {o['aparato_codigo']} ({o['aparato_tipo']}) | "
             f"Cliente {o['cliente_id']} - {o['cliente_nombre']} {o['cliente_apellido']}"
         )
+        total += 1
+
+    if not total:
+        print("No hay sesiones para esa fecha.")
 
 
 def cancelar_sesion_view():
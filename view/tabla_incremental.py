@@ -0,0 +1,92 @@
+# view/tabla_incremental.py
+"""
+Refresco incremental de un ttk.Treeview.
+
+En lugar de borrar todas las filas y volver a insertarlas, TablaIncremental
+guarda qué elemento del Treeview corresponde a cada id de fila y, al recibir
+los datos nuevos, solo inserta, modifica, mueve o borra las filas que han
+cambiado. La selección y la posición de desplazamiento se conservan.
+
+    tabla = TablaIncremental(tree)
+    tabla.actualizar((o["sesion_id"], (o["sesion_id"], o["hora_inicio"], ...)) for o in ocupacion)
+    tabla.actualizar_fila(sesion_id, valores)   # una sola fila
+"""
+
+
+class TablaIncremental:
+    """Mantiene un Treeview sincronizado con una secuencia de (id, valores)."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._elementos = {}   # id de fila -> iid del Treeview
+        self._ids = {}         # iid del Treeview -> id de fila
+        self._valores = {}     # id de fila -> valores pintados
+        self._orden = []       # ids en el orden en que están pintados
+
+    def actualizar(self, filas) -> dict:
+        """
+        Sincroniza el Treeview con 'filas' (iterable de (id, valores) en el
+        orden deseado). Devuelve cuántas filas se insertaron, modificaron y borraron.
+        """
+        filas = [(id_fila, tuple(valores)) for id_fila, valores in filas]
+        nuevos = {id_fila for id_fila, _ in filas}
+        cambios = {"insertadas": 0, "modificadas": 0, "borradas": 0}
+
+        for id_fila in [i for i in self._elementos if i not in nuevos]:
+            iid = self._elementos.pop(id_fila)
+            self.tree.delete(iid)
+            del self._ids[iid]
+            del self._valores[id_fila]
+            cambios["borradas"] += 1
+
+        mismo_orden = [i for i in self._orden if i in nuevos] == [i for i, _ in filas if i in self._elementos]
+        for posicion, (id_fila, valores) in enumerate(filas):
+            iid = self._elementos.get(id_fila)
+            if iid is None:
+                iid = self.tree.insert("", posicion, values=valores)
+                self._elementos[id_fila] = iid
+                self._ids[iid] = id_fila
+                self._valores[id_fila] = valores
+                cambios["insertadas"] += 1
+                continue
+            if self._valores[id_fila] != valores:
+                self.tree.item(iid, values=valores)
+                self._valores[id_fila] = valores
+                cambios["modificadas"] += 1
+            if not mismo_orden:
+                self.tree.move(iid, "", posicion)
+
+        self._orden = [id_fila for id_fila, _ in filas]
+        return cambios
+
+    def actualizar_fila(self, id_fila, valores) -> bool:
+        """Cambia los valores de una fila ya pintada. Devuelve False si no está."""
+        iid = self._elementos.get(id_fila)
+        if iid is None:
+            return False
+        valores = tuple(valores)
+        if self._valores[id_fila] != valores:
+            self.tree.item(iid, values=valores)
+            self._valores[id_fila] = valores
+        return True
+
+    def eliminar_fila(self, id_fila) -> bool:
+        iid = self._elementos.pop(id_fila, None)
+        if iid is None:
+            return False
+        self.tree.delete(iid)
+        del self._ids[iid]
+        del self._valores[id_fila]
+        self._orden.remove(id_fila)
+        return True
+
+    def id_de(self, iid):
+        """id de fila que corresponde a un elemento del Treeview (o None)."""
+        return self._ids.get(iid)
+
+    def vaciar(self):
+        self.tree.delete(*self._elementos.values())
+        self._elementos.clear()
+        self._ids.clear()
+        self._valores.clear()
+        self._orden = []
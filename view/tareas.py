@@ -0,0 +1,140 @@
+# view/tareas.py
+"""
+Ejecución de consultas en segundo plano para que la interfaz no se congele.
+
+Tkinter solo se puede tocar desde el hilo principal, así que las funciones
+del controlador se ejecutan en un pool de hilos y sus resultados vuelven al
+hilo de la interfaz mediante una cola que se vacía con after(). Cada hilo
+usa su propia conexión SQLite (ver model.conexion.obtener_conexion).
+
+Cada petición lleva una clave ("sesiones", "estado_pagos"...). Si se lanza
+otra con la misma clave antes de que termine la anterior, la anterior se
+cancela (o, si ya estaba en marcha, su resultado se descarta), así que al
+cambiar rápido de fecha o de mes solo se pinta la última.
+
+    self.tareas.ejecutar("sesiones", obtener_ocupacion_diaria, fecha,
+                         al_terminar=self.pintar_sesiones,
+                         cargando=indicador_carga(self.lbl_titulo))
+"""
+import itertools
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+
+class EjecutorTareas:
+    """Pool de hilos + bombeo de resultados al hilo de Tk con after()."""
+
+    INTERVALO_MS = 30
+
+    def __init__(self, widget, max_hilos: int = 2):
+        self.widget = widget
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="tarea")
+        self._resultados = queue.SimpleQueue()
+        self._contador = itertools.count(1)
+        self._vigentes = {}    # clave -> número de la última petición
+        self._futuros = {}     # clave -> (Future, cargando) de la última petición
+        self._pendientes = 0
+        self._bombeo = None
+
+    def ejecutar(self, clave: str, funcion, *args, al_terminar=None, al_error=None, cargando=None) -> int:
+        """
+        Ejecuta funcion(*args) en segundo plano. En el hilo de la interfaz se
+        llamará a al_terminar(resultado) o al_error(excepción), y a
+        cargando(True/False) al empezar y al terminar la última petición de la clave.
+        """
+        anterior = self._futuros.get(clave)
+        if anterior is not None:
+            anterior[0].cancel()  # Si aún no ha empezado, ya no se ejecuta
+
+        numero = next(self._contador)
+        self._vigentes[clave] = numero
+        if cargando is not None:
+            cargando(True)
+
+        futuro = self._pool.submit(funcion, *args)
+        self._futuros[clave] = (futuro, cargando)
+        self._pendientes += 1
+        # add_done_callback se ejecuta en el hilo de trabajo: solo encola
+        futuro.add_done_callback(
+            lambda f: self._resultados.put((clave, numero, f, al_terminar, al_error, cargando))
+        )
+        self._programar_bombeo()
+        return numero
+
+    def cancelar(self, clave: str):
+        """Descarta la petición en curso de una clave (su resultado no se pintará)."""
+        anterior = self._futuros.pop(clave, None)
+        self._vigentes.pop(clave, None)
+        if anterior is not None:
+            futuro, cargando = anterior
+            futuro.cancel()
+            if cargando is not None:
+                cargando(False)
+
+    def ocupado(self, clave: str | None = None) -> bool:
+        if clave is None:
+            return self._pendientes > 0
+        return clave in self._futuros
+
+    def cerrar(self):
+        """Cancela lo pendiente y no admite más tareas (al cerrar la ventana)."""
+        if self._bombeo is not None:
+            self.widget.after_cancel(self._bombeo)
+            self._bombeo = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _programar_bombeo(self):
+        if self._bombeo is None:
+            self._bombeo = self.widget.after(self.INTERVALO_MS, self._bombear)
+
+    def _bombear(self):
+        self._bombeo = None
+        try:
+            while True:
+                try:
+                    clave, numero, futuro, al_terminar, al_error, cargando = self._resultados.get_nowait()
+                except queue.Empty:
+                    break
+                self._pendientes -= 1
+                try:
+                    self._entregar(clave, numero, futuro, al_terminar, al_error, cargando)
+                except Exception:
+                    # Un callback que falla no debe parar el bombeo del resto
+                    print(f"Error en el callback de la tarea '{clave}':")
+                    traceback.print_exc()
+        finally:
+            if self._pendientes > 0:
+                self._programar_bombeo()
+
+    def _entregar(self, clave, numero, futuro, al_terminar, al_error, cargando):
+        if self._vigentes.get(clave) != numero:
+            return  # Hay una petición más reciente con la misma clave
+        del self._vigentes[clave]
+        del self._futuros[clave]
+        if cargando is not None:
+            cargando(False)
+        if futuro.cancelled():
+            return
+
+        error = futuro.exception()
+        if error is not None:
+            (al_error or _mostrar_error)(error)
+        elif al_terminar is not None:
+            al_terminar(futuro.result())
+
+
+def _mostrar_error(error):
+    messagebox.showerror("Error", str(error))
+
+
+def indicador_carga(etiqueta, texto: str = "Cargando..."):
+    """Devuelve un callback 'cargando' que cambia el texto de una etiqueta mientras carga."""
+    original = etiqueta.cget("text")
+
+    def cargando(activo: bool):
+        if etiqueta.winfo_exists():
+            etiqueta.configure(text=texto if activo else original)
+
+    return cargando